@@ -0,0 +1,90 @@
+"""Bounded fire-and-forget execution of Bot API calls that nobody waits for."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Coroutine, Set
+
+from app.tracing import detached_context
+
+__all__ = ["BackgroundTaskStats", "BackgroundTasks"]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackgroundTaskStats:
+    """Counters of :class:`BackgroundTasks`."""
+
+    started: int = 0
+    finished: int = 0
+    failed: int = 0
+    inline: int = 0
+
+    @property
+    def pending(self) -> int:
+        """Return the number of tasks still running."""
+
+        return self.started - self.finished
+
+
+class BackgroundTasks:
+    """Runs coroutines whose result the handler does not need, such as deletions.
+
+    At most ``limit`` tasks run at a time; when the limit is reached the
+    coroutine is awaited by the caller instead, so a burst of updates slows
+    down rather than piling up unbounded work. Exceptions are logged and
+    counted instead of being lost with the task. Background tasks do not
+    belong to the trace of the update that started them.
+    """
+
+    def __init__(self, limit: int) -> None:
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        self.limit = limit
+        self.stats = BackgroundTaskStats()
+        self._tasks: Set[asyncio.Task[Any]] = set()
+
+    async def spawn(self, coroutine: Coroutine[Any, Any, Any], *, name: str) -> None:
+        """Start ``coroutine`` in the background or run it now if the limit is reached."""
+
+        if len(self._tasks) >= self.limit:
+            self.stats.inline += 1
+            try:
+                await coroutine
+            except Exception:
+                self.stats.failed += 1
+                logger.exception("Фоновая задача %s завершилась с ошибкой", name)
+            return
+
+        task = asyncio.create_task(coroutine, name=name, context=detached_context())
+        self.stats.started += 1
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task[Any]) -> None:
+        self._tasks.discard(task)
+        self.stats.finished += 1
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self.stats.failed += 1
+            logger.error(
+                "Фоновая задача %s завершилась с ошибкой",
+                task.get_name(),
+                exc_info=exc,
+            )
+
+    async def drain(self, timeout: float = 10) -> None:
+        """Wait for running tasks and cancel those not done within ``timeout`` seconds."""
+
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Отменено %s незавершённых фоновых задач", len(pending))
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,129 @@
+"""Preparation of MongoDB before the bot serves updates, with timed startup phases."""
+from __future__ import annotations
+
+import contextlib
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.config import Settings
+from app.database import MongoCollections
+from app.database.images import ImageStore
+from app.database.meta import get_bootstrap_state, get_catalog_version, set_bootstrap_state
+
+__all__ = ["BOOTSTRAP_SCHEMA_VERSION", "BootstrapResult", "StartupTimer", "run_bootstrap"]
+
+logger = logging.getLogger(__name__)
+
+# Увеличивайте при изменении индексов или справочников по умолчанию, иначе уже
+# подготовленные базы пропустят новые шаги
+BOOTSTRAP_SCHEMA_VERSION = 2
+
+
+@dataclass
+class StartupTimer:
+    """Measures and logs the phases of the bot startup."""
+
+    started: float = field(default_factory=time.perf_counter)
+    phases: List[Tuple[str, float]] = field(default_factory=list)
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a phase measured elsewhere."""
+
+        self.phases.append((name, seconds))
+        logger.info("Этап запуска «%s»: %.0f мс", name, seconds * 1000)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as the phase ``name``."""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    @property
+    def elapsed(self) -> float:
+        """Return seconds since the timer was created."""
+
+        return time.perf_counter() - self.started
+
+
+@dataclass
+class BootstrapResult:
+    """Outcome of :func:`run_bootstrap`."""
+
+    skipped: bool = False
+    catalog_changed: bool = False
+
+
+def _expected_state(settings: Settings, catalog_version: int) -> Dict[str, Any]:
+    return {
+        "schema_version": BOOTSTRAP_SCHEMA_VERSION,
+        "catalog_version": catalog_version,
+        "initial_admin_id": settings.initial_admin_id,
+    }
+
+
+def run_bootstrap(
+    collections: MongoCollections,
+    settings: Settings,
+    image_store: ImageStore,
+    *,
+    timer: StartupTimer,
+) -> BootstrapResult:
+    """Create indexes, default brands, categories and admins and import products.
+
+    Index and default document checks are skipped when the state recorded by
+    the previous bootstrap matches the schema version, the catalog version and
+    the initial admin. The product import still runs but skips itself when the
+    file did not change since its last import.
+    """
+
+    # Модули импорта (Pillow, разбор файлов) нужны только здесь
+    from app.database.imaging import create_image_pipeline
+    from app.database.indexes import ensure_indexes
+    from app.database.management import (
+        DEFAULT_BRANDS,
+        DEFAULT_CATEGORIES,
+        DEFAULT_PRODUCTS_FILE,
+        ensure_admins_collection,
+        ensure_brands_collection,
+        ensure_categories_collection,
+        load_products_from_file,
+    )
+
+    result = BootstrapResult()
+    with timer.phase("проверка состояния базы"):
+        catalog_version = get_catalog_version(collections.meta)
+        result.skipped = get_bootstrap_state(collections.meta) == _expected_state(
+            settings, catalog_version
+        )
+
+    if result.skipped:
+        logger.info("База данных уже подготовлена, проверка индексов и справочников пропущена")
+    else:
+        with timer.phase("индексы"):
+            ensure_indexes(collections.database)
+        with timer.phase("справочники"):
+            ensure_brands_collection(collections.brands, DEFAULT_BRANDS)
+            ensure_categories_collection(collections.categories, DEFAULT_CATEGORIES)
+            ensure_admins_collection(collections.admins, settings.initial_admin_id)
+
+    with timer.phase("импорт продуктов"), create_image_pipeline(settings) as image_pipeline:
+        load_products_from_file(
+            collections.products,
+            collections.brands,
+            collections.categories,
+            DEFAULT_PRODUCTS_FILE,
+            image_store=image_store,
+            image_pipeline=image_pipeline,
+        )
+
+    final_version = get_catalog_version(collections.meta)
+    result.catalog_changed = final_version != catalog_version
+    if not result.skipped or result.catalog_changed:
+        set_bootstrap_state(collections.meta, _expected_state(settings, final_version))
+    return result
@@ -0,0 +1,211 @@
+"""Product cards rendered ahead of time for the catalog and inline mode."""
+from __future__ import annotations
+
+import hashlib
+import html
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional, Set, Tuple
+
+from telegram import InlineKeyboardMarkup
+
+from app.keyboards.main import build_product_details_keyboard
+
+__all__ = [
+    "CAPTION_MAX_LENGTH",
+    "ProductCard",
+    "ProductCardStore",
+    "build_product_caption",
+]
+
+# Bot API обрезает не HTML, а видимый текст подписи к фото
+CAPTION_MAX_LENGTH = 1024
+
+_CODE_LABEL = "Артикул: "
+_LINK_TEXT = "подробнее о продукте"
+
+
+def _shorten(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    if limit <= 1:
+        return ""
+    return text[: limit - 1].rstrip() + "…"
+
+
+def build_product_caption(
+    product: Mapping[str, Any], *, max_length: int = CAPTION_MAX_LENGTH
+) -> str:
+    """Return the HTML caption of the product card.
+
+    The description is shortened so that the visible text fits into
+    ``max_length`` characters.
+    """
+
+    name = str(product.get("name", "")).strip()
+    code = str(product.get("code", "")).strip()
+    description = str(product.get("description", "")).strip()
+    link = str(product.get("link", "")).strip()
+
+    if description:
+        # Всё, кроме описания, плюс переводы строк между блоками
+        used = len(name) + 8
+        if code:
+            used += len(_CODE_LABEL) + len(code)
+        if link:
+            used += len(_LINK_TEXT)
+        description = _shorten(description, max_length - used)
+
+    caption_parts: list[str] = []
+    if name:
+        caption_parts.append(f"<b>{html.escape(name)}</b>")
+    if code:
+        caption_parts.extend(["", f"<i>{_CODE_LABEL}{html.escape(code)}</i>"])
+    if description:
+        caption_parts.extend(["", f"<blockquote>{html.escape(description)}</blockquote>"])
+    if link:
+        caption_parts.extend(
+            ["", f'<a href="{html.escape(link, quote=True)}">{_LINK_TEXT}</a>']
+        )
+    return "\n".join(caption_parts)
+
+
+# Поля, от которых зависит отрисованная карточка
+_CARD_FIELDS = (
+    "name",
+    "code",
+    "description",
+    "link",
+    "brand_id",
+    "category_id",
+    "image_ref",
+    "image_hash",
+    "telegram_file_id",
+    "telegram_file_hash",
+)
+
+
+@dataclass(frozen=True)
+class ProductCard:
+    """Ready-to-send product card.
+
+    ``product`` keeps the fields :func:`app.handlers.media.send_product_photo`
+    needs to pick between the cached ``file_id`` and an upload.
+    """
+
+    product_id: int
+    brand_id: int
+    category_id: int
+    name: str
+    caption: str
+    keyboard: InlineKeyboardMarkup
+    product: Mapping[str, Any] = field(repr=False)
+    signature: str = field(repr=False)
+
+
+def _signature(document: Mapping[str, Any]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for name in _CARD_FIELDS:
+        digest.update(str(document.get(name, "")).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ProductCardStore:
+    """Rendered cards of every product keyed by product id.
+
+    Cards are re-rendered only when a field they depend on changes, so
+    opening a product costs a dictionary lookup instead of a database query
+    and HTML assembly. Products sharing a category share one keyboard object.
+    """
+
+    def __init__(self) -> None:
+        self._cards: Dict[int, ProductCard] = {}
+        self._keyboards: Dict[Tuple[int, int], InlineKeyboardMarkup] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def get(self, product_id: int) -> Optional[ProductCard]:
+        """Return the card of the product or ``None`` if it is not rendered yet."""
+
+        card = self._cards.get(product_id)
+        if card is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return card
+
+    def _keyboard(self, brand_id: int, category_id: int) -> InlineKeyboardMarkup:
+        key = (brand_id, category_id)
+        keyboard = self._keyboards.get(key)
+        if keyboard is None:
+            keyboard = self._keyboards[key] = build_product_details_keyboard(
+                brand_id=brand_id, category_id=category_id
+            )
+        return keyboard
+
+    def put(self, document: Mapping[str, Any]) -> Optional[ProductCard]:
+        """Render the card of a product document unless it is already up to date.
+
+        Returns the current card, or ``None`` for a document without a valid
+        id, brand or category.
+        """
+
+        try:
+            product_id = int(document["id"])
+            brand_id = int(document.get("brand_id"))
+            category_id = int(document.get("category_id"))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        signature = _signature(document)
+        current = self._cards.get(product_id)
+        if current is not None and current.signature == signature:
+            return current
+
+        product = {name: document[name] for name in _CARD_FIELDS if name in document}
+        product["id"] = product_id
+        card = ProductCard(
+            product_id=product_id,
+            brand_id=brand_id,
+            category_id=category_id,
+            name=str(document.get("name", "")).strip(),
+            caption=build_product_caption(document),
+            keyboard=self._keyboard(brand_id, category_id),
+            product=product,
+            signature=signature,
+        )
+        self._cards[product_id] = card
+        return card
+
+    def remember_file_id(self, product_id: int, *, file_id: str, image_hash: str) -> None:
+        """Store the ``file_id`` Telegram returned for the uploaded product photo."""
+
+        card = self._cards.get(product_id)
+        if card is None:
+            return
+        document = dict(card.product)
+        # Так же, как в CatalogRepository.remember_photo_file_id: file_id
+        # действителен, пока хэш изображения не изменился
+        document.update(
+            telegram_file_id=file_id, telegram_file_hash=image_hash, image_hash=image_hash
+        )
+        self.put(document)
+
+    def remove(self, product_id: int) -> None:
+        """Drop the card of the product if it is rendered."""
+
+        self._cards.pop(product_id, None)
+
+    def retain(self, product_ids: Set[int]) -> int:
+        """Drop cards of products not in ``product_ids`` and return how many were dropped."""
+
+        stale = [product_id for product_id in self._cards if product_id not in product_ids]
+        for product_id in stale:
+            del self._cards[product_id]
+        live = {(card.brand_id, card.category_id) for card in self._cards.values()}
+        for key in [key for key in self._keyboards if key not in live]:
+            del self._keyboards[key]
+        return len(stale)
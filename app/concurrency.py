@@ -0,0 +1,151 @@
+"""Concurrent processing of updates that keeps the order within every chat."""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Deque, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+__all__ = ["PerChatUpdateProcessor", "UpdateQueueStats"]
+
+
+# Ограничение параллелизма применяется внутри процессора: обновление, которое
+# ждёт своей очереди в чате, не должно занимать слот базового семафора
+_UNBOUNDED = 2**31 - 1
+
+
+@dataclass
+class UpdateQueueStats:
+    """Counters describing the update backlog of :class:`PerChatUpdateProcessor`."""
+
+    received: int = 0
+    started: int = 0
+    finished: int = 0
+    max_queue_depth: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of updates waiting to be processed."""
+
+        return self.received - self.started
+
+    @property
+    def in_progress(self) -> int:
+        """Return the number of updates being processed right now."""
+
+        return self.started - self.finished
+
+    @property
+    def average_wait(self) -> float:
+        """Return the mean time in seconds updates spent waiting."""
+
+        return self.total_wait / self.started if self.started else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters as a JSON-serialisable mapping."""
+
+        return {
+            "received": self.received,
+            "processed": self.finished,
+            "in_progress": self.in_progress,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "average_wait_seconds": round(self.average_wait, 6),
+            "max_wait_seconds": round(self.max_wait, 6),
+        }
+
+
+@dataclass
+class _QueuedUpdate:
+    coroutine: Awaitable[Any]
+    received_at: float
+
+
+def _ordering_key(update: object) -> Optional[Hashable]:
+    """Return the key of the updates that must be processed one after another."""
+
+    if not isinstance(update, Update):
+        return None
+    if update.inline_query is not None:
+        # Каждый новый символ запроса заменяет предыдущий inline-запрос: ждать
+        # ответа на устаревший запрос того же пользователя незачем
+        return None
+    if update.effective_chat is not None:
+        return ("chat", update.effective_chat.id)
+    if update.effective_user is not None:
+        return ("user", update.effective_user.id)
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Process updates of different chats in parallel and of one chat in order.
+
+    At most ``max_concurrent_updates`` chats are served at once. Updates of a
+    chat that is already being served are queued behind it and processed by
+    the same worker, so handlers such as ``_take_stale_messages`` and
+    ``_store_last_message`` never race for one user.
+    """
+
+    def __init__(self, max_concurrent_updates: int) -> None:
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        self._limit = max_concurrent_updates
+        super().__init__(_UNBOUNDED)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        self._chats: Dict[Hashable, Deque[_QueuedUpdate]] = {}
+        self.stats = UpdateQueueStats()
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._limit
+
+    async def initialize(self) -> None:
+        return None
+
+    async def shutdown(self) -> None:
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        queued = _QueuedUpdate(coroutine, time.monotonic())
+        self.stats.received += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+
+        key = _ordering_key(update)
+        backlog: Optional[Deque[_QueuedUpdate]] = None
+        if key is not None:
+            backlog = self._chats.get(key)
+            if backlog is not None:
+                backlog.append(queued)
+                return
+            backlog = self._chats[key] = deque()
+
+        try:
+            async with self._slots:
+                await self._run(queued)
+                while backlog:
+                    await self._run(backlog.popleft())
+        finally:
+            if key is not None:
+                for abandoned in self._chats.pop(key, ()):
+                    # Корутина уже не будет выполнена: закрываем, чтобы не было
+                    # предупреждения «coroutine was never awaited»
+                    close = getattr(abandoned.coroutine, "close", None)
+                    if close is not None:
+                        close()
+                    self.stats.received -= 1
+
+    async def _run(self, queued: _QueuedUpdate) -> None:
+        wait = time.monotonic() - queued.received_at
+        self.stats.started += 1
+        self.stats.total_wait += wait
+        self.stats.max_wait = max(self.stats.max_wait, wait)
+        try:
+            await queued.coroutine
+        finally:
+            self.stats.finished += 1
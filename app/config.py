@@ -4,7 +4,7 @@ from __future__ import annotations
 import logging
 import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Sequence
 
 from dotenv import load_dotenv
 
@@ -12,6 +12,36 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+NAVIGATION_MODE_EDIT = "edit"
+NAVIGATION_MODE_RESEND = "resend"
+_NAVIGATION_MODES = (NAVIGATION_MODE_EDIT, NAVIGATION_MODE_RESEND)
+
+RUN_MODE_POLLING = "polling"
+RUN_MODE_WEBHOOK = "webhook"
+_RUN_MODES = (RUN_MODE_POLLING, RUN_MODE_WEBHOOK)
+
+PERSISTENCE_BACKEND_MONGO = "mongo"
+PERSISTENCE_BACKEND_REDIS = "redis"
+PERSISTENCE_BACKEND_MEMORY = "memory"
+_PERSISTENCE_BACKENDS = (
+    PERSISTENCE_BACKEND_MONGO,
+    PERSISTENCE_BACKEND_REDIS,
+    PERSISTENCE_BACKEND_MEMORY,
+)
+
+IMAGE_STORAGE_GRIDFS = "gridfs"
+IMAGE_STORAGE_FILESYSTEM = "filesystem"
+_IMAGE_STORAGES = (IMAGE_STORAGE_GRIDFS, IMAGE_STORAGE_FILESYSTEM)
+
+BOOTSTRAP_MODE_BLOCKING = "blocking"
+BOOTSTRAP_MODE_DEFERRED = "deferred"
+_BOOTSTRAP_MODES = (BOOTSTRAP_MODE_BLOCKING, BOOTSTRAP_MODE_DEFERRED)
+
+TRACING_EXPORTER_NONE = "none"
+TRACING_EXPORTER_JSONL = "jsonl"
+TRACING_EXPORTER_OTLP = "otlp"
+_TRACING_EXPORTERS = (TRACING_EXPORTER_NONE, TRACING_EXPORTER_JSONL, TRACING_EXPORTER_OTLP)
+
 
 @dataclass(frozen=True)
 class Settings:
@@ -21,6 +51,92 @@ class Settings:
     mongo_uri: str
     mongo_db_name: str
     initial_admin_id: Optional[int]
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_timeout_ms: int = 5000
+    catalog_poll_interval: int = 5
+    catalog_ttl: int = 300
+    catalog_page_size: int = 8
+    keyboard_cache_size: int = 1024
+    inline_cache_time: int = 300
+    navigation_mode: str = NAVIGATION_MODE_EDIT
+    image_storage: str = IMAGE_STORAGE_GRIDFS
+    image_storage_path: str = "data/images"
+    image_max_side: int = 1280
+    image_quality: int = 85
+    image_thumbnail_side: int = 320
+    image_workers: int = 0
+    run_mode: str = RUN_MODE_POLLING
+    bootstrap_mode: str = BOOTSTRAP_MODE_BLOCKING
+    webhook_url: str = ""
+    webhook_listen: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_path: str = "/telegram"
+    webhook_secret_token: str = ""
+    webhook_max_connections: int = 40
+    webhook_register: bool = True
+    persistence_backend: str = PERSISTENCE_BACKEND_MONGO
+    redis_url: str = "redis://localhost:6379/0"
+    user_data_ttl: int = 7 * 24 * 60 * 60
+    persistence_update_interval: int = 1
+    max_concurrent_updates: int = 64
+    background_tasks_limit: int = 256
+    metrics_listen: str = "127.0.0.1"
+    metrics_port: int = 9101
+    tracing_enabled: bool = False
+    tracing_exporter: str = TRACING_EXPORTER_JSONL
+    tracing_file: str = "data/traces.jsonl"
+    tracing_otlp_endpoint: str = "http://127.0.0.1:4318"
+    tracing_slow_update_ms: int = 1000
+    rate_limit_overall: int = 30
+    rate_limit_chat: int = 1
+    rate_limit_group: int = 20
+    rate_limit_max_retries: int = 3
+
+
+def _parse_int(name: str, default: int, *, minimum: int = 0) -> int:
+    """Parse a non-negative integer setting, falling back to ``default``."""
+
+    raw_value = os.getenv(name)
+    if not raw_value:
+        return default
+    try:
+        value = int(raw_value)
+    except ValueError:
+        logger.warning("%s is not a number: %s", name, raw_value)
+        return default
+    if value < minimum:
+        logger.warning("%s must be at least %s, got %s", name, minimum, value)
+        return default
+    return value
+
+
+def _parse_choice(name: str, default: str, choices: Sequence[str]) -> str:
+    """Parse a setting restricted to ``choices``, falling back to ``default``."""
+
+    raw_value = os.getenv(name)
+    if not raw_value:
+        return default
+    value = raw_value.strip().lower()
+    if value not in choices:
+        logger.warning("%s must be one of %s, got %s", name, ", ".join(choices), raw_value)
+        return default
+    return value
+
+
+def _parse_bool(name: str, default: bool) -> bool:
+    """Parse a boolean flag such as ``1``/``0`` or ``true``/``false``."""
+
+    raw_value = os.getenv(name)
+    if not raw_value:
+        return default
+    value = raw_value.strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    logger.warning("%s is not a boolean: %s", name, raw_value)
+    return default
 
 
 def _parse_initial_admin(raw_value: Optional[str]) -> Optional[int]:
@@ -50,10 +166,75 @@ def get_settings() -> Settings:
         )
     mongo_db_name = os.getenv("MONGO_DB_NAME", "tg_cosmetics")
     initial_admin_id = _parse_initial_admin(os.getenv("INITIAL_ADMIN_ID"))
+    run_mode = _parse_choice("RUN_MODE", RUN_MODE_POLLING, _RUN_MODES)
+    webhook_url = os.getenv("WEBHOOK_URL", "").strip()
+    if run_mode == RUN_MODE_WEBHOOK and not webhook_url:
+        raise RuntimeError(
+            "WEBHOOK_URL is not configured. It is required when RUN_MODE=webhook."
+        )
+    webhook_path = os.getenv("WEBHOOK_PATH", "/telegram").strip() or "/telegram"
+    if not webhook_path.startswith("/"):
+        webhook_path = f"/{webhook_path}"
 
     return Settings(
         bot_token=token,
         mongo_uri=mongo_uri,
         mongo_db_name=mongo_db_name,
         initial_admin_id=initial_admin_id,
+        mongo_max_pool_size=_parse_int("MONGO_MAX_POOL_SIZE", 100, minimum=1),
+        mongo_min_pool_size=_parse_int("MONGO_MIN_POOL_SIZE", 0),
+        mongo_timeout_ms=_parse_int("MONGO_TIMEOUT_MS", 5000, minimum=1),
+        catalog_poll_interval=_parse_int("CATALOG_POLL_INTERVAL", 5, minimum=1),
+        catalog_ttl=_parse_int("CATALOG_TTL", 300, minimum=1),
+        # Telegram допускает не больше 100 кнопок в клавиатуре
+        catalog_page_size=min(_parse_int("CATALOG_PAGE_SIZE", 8, minimum=1), 90),
+        keyboard_cache_size=_parse_int("KEYBOARD_CACHE_SIZE", 1024, minimum=1),
+        inline_cache_time=_parse_int("INLINE_CACHE_TIME", 300),
+        navigation_mode=_parse_choice(
+            "NAVIGATION_MODE", NAVIGATION_MODE_EDIT, _NAVIGATION_MODES
+        ),
+        image_storage=_parse_choice(
+            "IMAGE_STORAGE", IMAGE_STORAGE_GRIDFS, _IMAGE_STORAGES
+        ),
+        image_storage_path=os.getenv("IMAGE_STORAGE_PATH") or "data/images",
+        image_max_side=_parse_int("IMAGE_MAX_SIDE", 1280, minimum=1),
+        image_quality=min(_parse_int("IMAGE_QUALITY", 85, minimum=1), 95),
+        image_thumbnail_side=_parse_int("IMAGE_THUMBNAIL_SIDE", 320, minimum=1),
+        image_workers=_parse_int("IMAGE_WORKERS", 0),
+        run_mode=run_mode,
+        bootstrap_mode=_parse_choice(
+            "BOOTSTRAP_MODE", BOOTSTRAP_MODE_BLOCKING, _BOOTSTRAP_MODES
+        ),
+        webhook_url=webhook_url,
+        webhook_listen=os.getenv("WEBHOOK_LISTEN") or "0.0.0.0",
+        webhook_port=_parse_int("WEBHOOK_PORT", 8080, minimum=1),
+        webhook_path=webhook_path,
+        webhook_secret_token=os.getenv("WEBHOOK_SECRET_TOKEN", "").strip(),
+        webhook_max_connections=_parse_int("WEBHOOK_MAX_CONNECTIONS", 40, minimum=1),
+        webhook_register=_parse_bool("WEBHOOK_REGISTER", True),
+        persistence_backend=_parse_choice(
+            "PERSISTENCE_BACKEND", PERSISTENCE_BACKEND_MONGO, _PERSISTENCE_BACKENDS
+        ),
+        redis_url=os.getenv("REDIS_URL") or "redis://localhost:6379/0",
+        user_data_ttl=_parse_int("USER_DATA_TTL", 7 * 24 * 60 * 60, minimum=1),
+        persistence_update_interval=_parse_int(
+            "PERSISTENCE_UPDATE_INTERVAL", 1, minimum=1
+        ),
+        max_concurrent_updates=_parse_int("MAX_CONCURRENT_UPDATES", 64, minimum=1),
+        background_tasks_limit=_parse_int("BACKGROUND_TASKS_LIMIT", 256, minimum=1),
+        metrics_listen=os.getenv("METRICS_LISTEN") or "127.0.0.1",
+        # 0 отключает HTTP-сервер метрик
+        metrics_port=_parse_int("METRICS_PORT", 9101),
+        tracing_enabled=_parse_bool("TRACING_ENABLED", False),
+        tracing_exporter=_parse_choice(
+            "TRACING_EXPORTER", TRACING_EXPORTER_JSONL, _TRACING_EXPORTERS
+        ),
+        tracing_file=os.getenv("TRACING_FILE") or "data/traces.jsonl",
+        tracing_otlp_endpoint=os.getenv("TRACING_OTLP_ENDPOINT") or "http://127.0.0.1:4318",
+        # 0 отключает журнал медленных обновлений
+        tracing_slow_update_ms=_parse_int("TRACING_SLOW_UPDATE_MS", 1000),
+        rate_limit_overall=_parse_int("RATE_LIMIT_OVERALL", 30),
+        rate_limit_chat=_parse_int("RATE_LIMIT_CHAT", 1),
+        rate_limit_group=_parse_int("RATE_LIMIT_GROUP", 20),
+        rate_limit_max_retries=_parse_int("RATE_LIMIT_MAX_RETRIES", 3),
     )
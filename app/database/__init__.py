@@ -2,14 +2,25 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Any, Dict
 
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorDatabase,
+)
 from pymongo import MongoClient
 from pymongo.collection import Collection
 from pymongo.database import Database
 
 from app.config import Settings
 
-__all__ = ["MongoCollections", "create_mongo_collections"]
+__all__ = [
+    "AsyncMongoCollections",
+    "MongoCollections",
+    "create_async_mongo_collections",
+    "create_mongo_collections",
+]
 
 
 @dataclass
@@ -22,12 +33,37 @@ class MongoCollections:
     brands: Collection
     categories: Collection
     products: Collection
+    meta: Collection
+
+
+@dataclass
+class AsyncMongoCollections:
+    """Asynchronous counterpart of :class:`MongoCollections` used by handlers."""
+
+    client: AsyncIOMotorClient
+    database: AsyncIOMotorDatabase
+    admins: AsyncIOMotorCollection
+    brands: AsyncIOMotorCollection
+    categories: AsyncIOMotorCollection
+    products: AsyncIOMotorCollection
+    meta: AsyncIOMotorCollection
+
+
+def _client_options(settings: Settings) -> Dict[str, Any]:
+    """Return connection pool options shared by the sync and async clients."""
+
+    return {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": min(settings.mongo_min_pool_size, settings.mongo_max_pool_size),
+        "serverSelectionTimeoutMS": settings.mongo_timeout_ms,
+        "connectTimeoutMS": settings.mongo_timeout_ms,
+    }
 
 
 def create_mongo_collections(settings: Settings) -> MongoCollections:
     """Create a Mongo client and return commonly used collections."""
 
-    client = MongoClient(settings.mongo_uri)
+    client = MongoClient(settings.mongo_uri, **_client_options(settings))
     database = client[settings.mongo_db_name]
     return MongoCollections(
         client=client,
@@ -36,4 +72,21 @@ def create_mongo_collections(settings: Settings) -> MongoCollections:
         brands=database["brands"],
         categories=database["categories"],
         products=database["products"],
+        meta=database["meta"],
+    )
+
+
+def create_async_mongo_collections(settings: Settings) -> AsyncMongoCollections:
+    """Create a Motor client and return the collections used inside handlers."""
+
+    client = AsyncIOMotorClient(settings.mongo_uri, **_client_options(settings))
+    database = client[settings.mongo_db_name]
+    return AsyncMongoCollections(
+        client=client,
+        database=database,
+        admins=database["admins"],
+        brands=database["brands"],
+        categories=database["categories"],
+        products=database["products"],
+        meta=database["meta"],
     )
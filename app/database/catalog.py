@@ -0,0 +1,401 @@
+"""In-process snapshot of the catalog used on the navigation path."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.cards import ProductCardStore
+from app.database.repository import CatalogSource
+from app.search import SearchIndex
+
+__all__ = ["CatalogCache", "CatalogSnapshot", "Page"]
+
+logger = logging.getLogger(__name__)
+
+
+_WATCHED_COLLECTIONS = ("brands", "categories", "products")
+# Поля, которые бот сам обновляет в продуктах и которые не влияют на навигацию
+_VOLATILE_PRODUCT_FIELDS = frozenset(
+    {"telegram_file_id", "telegram_file_hash", "image_hash"}
+)
+
+
+NamedItem = Tuple[int, str]
+# (id, название, число продуктов)
+CountedItem = Tuple[int, str, int]
+
+
+def _sort_key(item: NamedItem) -> Tuple[str, int]:
+    # Тот же порядок, что у индекса (brand_id, category_id, name, id)
+    return item[1], item[0]
+
+
+@dataclass(frozen=True)
+class Page:
+    """One page of a keyset-paginated list of ``(id, name)`` pairs."""
+
+    items: Tuple[NamedItem, ...]
+    has_previous: bool
+    has_next: bool
+
+    @property
+    def previous_anchor(self) -> Optional[int]:
+        """Return the id to request the previous page before, if there is one."""
+
+        return self.items[0][0] if self.has_previous and self.items else None
+
+    @property
+    def next_anchor(self) -> Optional[int]:
+        """Return the id to request the next page after, if there is one."""
+
+        return self.items[-1][0] if self.has_next and self.items else None
+
+
+def _keyset_page(
+    items: Sequence[NamedItem],
+    names: Mapping[int, str],
+    *,
+    after: Optional[int],
+    before: Optional[int],
+    limit: int,
+) -> Page:
+    """Return the page of ``items`` (sorted by name and id) next to an anchor id.
+
+    Positions are found by binary search on the ``(name, id)`` key, so a page
+    costs the same in any part of a long list. Unknown anchors (for example a
+    product deleted since the keyboard was sent) lead to the first page.
+    """
+
+    if after is not None and after in names:
+        start = bisect_right(items, (names[after], after), key=_sort_key)
+        if start >= len(items):
+            # Якорь был последним: показываем последнюю полную страницу
+            start = max(len(items) - limit, 0)
+        end = start + limit
+    elif before is not None and before in names:
+        end = bisect_left(items, (names[before], before), key=_sort_key)
+        start = max(end - limit, 0)
+        end = start + limit
+    else:
+        start, end = 0, limit
+    return Page(
+        items=tuple(items[start:end]),
+        has_previous=start > 0,
+        has_next=end < len(items),
+    )
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable view of brands, categories and per-category product lists."""
+
+    version: int
+    brands: Tuple[Tuple[int, str], ...]
+    categories: Tuple[Tuple[int, str], ...]
+    brand_names: Mapping[int, str]
+    category_names: Mapping[int, str]
+    products: Mapping[Tuple[int, int], Tuple[Tuple[int, str], ...]] = field(
+        repr=False
+    )
+    product_names: Mapping[int, str] = field(default_factory=dict, repr=False)
+    brand_categories: Mapping[int, Tuple[CountedItem, ...]] = field(
+        default_factory=dict, repr=False
+    )
+
+    def products_for(
+        self, *, brand_id: int, category_id: int
+    ) -> Sequence[Tuple[int, str]]:
+        """Return products of the brand and category sorted by name."""
+
+        return self.products.get((brand_id, category_id), ())
+
+    def categories_for(self, brand_id: int) -> Sequence[CountedItem]:
+        """Return non-empty categories of the brand with their product counts."""
+
+        return self.brand_categories.get(brand_id, ())
+
+    def products_page(
+        self,
+        *,
+        brand_id: int,
+        category_id: int,
+        limit: int,
+        after: Optional[int] = None,
+        before: Optional[int] = None,
+    ) -> Page:
+        """Return a page of products of the brand and category."""
+
+        return _keyset_page(
+            self.products_for(brand_id=brand_id, category_id=category_id),
+            self.product_names,
+            after=after,
+            before=before,
+            limit=limit,
+        )
+
+    def brands_page(
+        self, *, limit: int, after: Optional[int] = None, before: Optional[int] = None
+    ) -> Page:
+        """Return a page of brands."""
+
+        return _keyset_page(
+            self.brands, self.brand_names, after=after, before=before, limit=limit
+        )
+
+
+def _build_snapshot(
+    version: int,
+    brands: Sequence[Tuple[int, str]],
+    categories: Sequence[Tuple[int, str]],
+    products: Sequence[Mapping[str, Any]],
+) -> CatalogSnapshot:
+    grouped: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+    product_names: Dict[int, str] = {}
+    for document in products:
+        try:
+            key = (int(document.get("brand_id")), int(document.get("category_id")))
+            product_id = int(document.get("id"))
+        except (TypeError, ValueError):
+            continue
+        name = str(document.get("name", "")).strip()
+        if not name:
+            continue
+        grouped.setdefault(key, []).append((product_id, name))
+        product_names[product_id] = name
+
+    for items in grouped.values():
+        items.sort(key=_sort_key)
+
+    # Фасет бренд → категории с продуктами, в порядке общего списка категорий
+    brand_categories: Dict[int, List[CountedItem]] = {}
+    for category_id, category_name in categories:
+        for brand_id, _ in brands:
+            count = len(grouped.get((brand_id, category_id), ()))
+            if count:
+                brand_categories.setdefault(brand_id, []).append(
+                    (category_id, category_name, count)
+                )
+
+    return CatalogSnapshot(
+        version=version,
+        brands=tuple(sorted(brands, key=_sort_key)),
+        categories=tuple(categories),
+        brand_names=dict(brands),
+        category_names=dict(categories),
+        products={key: tuple(items) for key, items in grouped.items()},
+        product_names=product_names,
+        brand_categories={
+            brand_id: tuple(items) for brand_id, items in brand_categories.items()
+        },
+    )
+
+
+def _is_relevant_change(change: Mapping[str, Any]) -> bool:
+    """Return ``False`` for product updates that only touch bot-maintained fields."""
+
+    if change.get("operationType") != "update":
+        return True
+    if change.get("ns", {}).get("coll") != "products":
+        return True
+    description = change.get("updateDescription") or {}
+    if description.get("removedFields") or description.get("truncatedArrays"):
+        return True
+    updated = description.get("updatedFields") or {}
+    return not set(updated).issubset(_VOLATILE_PRODUCT_FIELDS)
+
+
+class CatalogCache:
+    """Keep a :class:`CatalogSnapshot` fresh for the lifetime of the bot.
+
+    The snapshot is reloaded when a change stream reports catalog writes. On
+    deployments without change streams (a standalone MongoDB) the cache polls
+    the catalog version counter every ``poll_interval`` seconds and reloads
+    unconditionally once the snapshot is older than ``ttl`` seconds.
+
+    After every reload :attr:`search_index` and the rendered product
+    :attr:`cards` are brought up to date in a background task, so a slow first
+    indexing never delays navigation.
+    """
+
+    def __init__(
+        self,
+        repository: CatalogSource,
+        *,
+        poll_interval: float = 5,
+        ttl: float = 300,
+    ) -> None:
+        self._repository = repository
+        self._poll_interval = poll_interval
+        self._ttl = ttl
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._loaded_at = 0.0
+        self._stored_version = 0
+        self._local_version = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task[None]] = None
+        self.search_index = SearchIndex()
+        self.cards = ProductCardStore()
+        self._search_ready = False
+        self._search_dirty = False
+        self._search_task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Return the current snapshot if it has been loaded."""
+
+        return self._snapshot
+
+    @property
+    def search_ready(self) -> bool:
+        """Return ``True`` once the search index has been filled for the first time."""
+
+        return self._search_ready
+
+    async def get(self) -> CatalogSnapshot:
+        """Return the current snapshot loading it on first use."""
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = await self.refresh()
+        return snapshot
+
+    async def refresh(self) -> CatalogSnapshot:
+        """Reload the snapshot from MongoDB."""
+
+        async with self._lock:
+            stored_version, brands, categories, products = await asyncio.gather(
+                self._repository.get_catalog_version(),
+                self._repository.list_brands(),
+                self._repository.list_categories(),
+                self._repository.list_product_summaries(),
+            )
+            self._local_version += 1
+            snapshot = _build_snapshot(self._local_version, brands, categories, products)
+            self._snapshot = snapshot
+            self._stored_version = stored_version
+            self._loaded_at = time.monotonic()
+        self._schedule_search_sync()
+        logger.info(
+            "Снимок каталога обновлён: версия %s, брендов %s, категорий %s, продуктов %s",
+            snapshot.version,
+            len(snapshot.brands),
+            len(snapshot.categories),
+            len(products),
+        )
+        return snapshot
+
+    def start(self) -> None:
+        """Start keeping the snapshot fresh in a background task."""
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._keep_fresh(), name="CatalogCache")
+
+    async def stop(self) -> None:
+        """Stop the background refresh task."""
+
+        for task in (self._task, self._search_task):
+            if task is None:
+                continue
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._task = None
+        self._search_task = None
+
+    def _schedule_search_sync(self) -> None:
+        self._search_dirty = True
+        if self._search_task is None or self._search_task.done():
+            self._search_task = asyncio.create_task(
+                self._sync_search_index(), name="CatalogSearchIndex"
+            )
+
+    async def _sync_search_index(self) -> None:
+        # Обновления каталога во время индексации не теряются: цикл повторится
+        while self._search_dirty:
+            self._search_dirty = False
+            try:
+                await self._load_product_indexes()
+            except PyMongoError as exc:
+                logger.warning("Не удалось обновить поисковый индекс: %s", exc)
+                return
+
+    async def _load_product_indexes(self) -> None:
+        started = time.monotonic()
+        index = self.search_index
+        seen: Set[int] = set()
+        changed = 0
+        async for document in self._repository.iter_product_documents():
+            if index.upsert(document):
+                changed += 1
+            self.cards.put(document)
+            with contextlib.suppress(KeyError, TypeError, ValueError):
+                seen.add(int(document["id"]))
+            if len(seen) % 200 == 0:
+                # Индексация занимает процессор: даём обработчикам выполниться
+                await asyncio.sleep(0)
+        removed = index.retain(seen)
+        self.cards.retain(seen)
+        self._search_ready = True
+        logger.info(
+            "Поисковый индекс и карточки продуктов обновлены за %.2f с: "
+            "продуктов %s, изменено %s, удалено %s",
+            time.monotonic() - started,
+            len(index),
+            changed,
+            removed,
+        )
+
+    async def _keep_fresh(self) -> None:
+        try:
+            await self._watch_changes()
+        except OperationFailure as exc:
+            logger.info(
+                "Change streams недоступны (%s), каталог будет обновляться опросом", exc
+            )
+        await self._poll()
+
+    async def _watch_changes(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": list(_WATCHED_COLLECTIONS)}}}]
+        while True:
+            try:
+                async with self._repository.watch_catalog(pipeline) as stream:
+                    # Изменения, сделанные до открытия потока, не должны потеряться
+                    await self._safe_refresh()
+                    async for change in stream:
+                        if not _is_relevant_change(change):
+                            continue
+                        # Пакетные записи порождают серию событий: вычитываем уже
+                        # пришедшие, чтобы перезагрузить каталог один раз
+                        while await stream.try_next() is not None:
+                            pass
+                        await self._safe_refresh()
+            except OperationFailure:
+                raise
+            except PyMongoError as exc:
+                logger.warning("Поток изменений каталога прерван: %s", exc)
+                await asyncio.sleep(self._poll_interval)
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            try:
+                stored_version = await self._repository.get_catalog_version()
+            except PyMongoError as exc:
+                logger.warning("Не удалось проверить версию каталога: %s", exc)
+                continue
+            expired = time.monotonic() - self._loaded_at >= self._ttl
+            if expired or stored_version != self._stored_version:
+                await self._safe_refresh()
+
+    async def _safe_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except PyMongoError as exc:
+            logger.warning("Не удалось обновить снимок каталога: %s", exc)
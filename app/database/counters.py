@@ -0,0 +1,73 @@
+"""Atomic allocation of the numeric ``id`` field of catalog documents."""
+from __future__ import annotations
+
+from typing import Dict, Iterable
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+__all__ = [
+    "COUNTERS_COLLECTION",
+    "SEQUENCED_COLLECTIONS",
+    "allocate_ids",
+    "reseed_counter",
+    "reseed_counters",
+]
+
+
+COUNTERS_COLLECTION = "counters"
+SEQUENCED_COLLECTIONS = ("admins", "brands", "categories", "products")
+
+
+def _counters(collection: Collection) -> Collection:
+    return collection.database[COUNTERS_COLLECTION]
+
+
+def reseed_counter(collection: Collection) -> int:
+    """Raise the counter of ``collection`` to its largest ``id`` and return it.
+
+    The counter is never lowered, so identifiers of deleted documents are not
+    reused.
+    """
+
+    last = collection.find_one(sort=[("id", -1)], projection={"id": 1})
+    last_id = int(last.get("id", 0)) if last else 0
+    document = _counters(collection).find_one_and_update(
+        {"_id": collection.name},
+        {"$max": {"seq": last_id}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(document["seq"])
+
+
+def allocate_ids(collection: Collection, count: int = 1) -> int:
+    """Reserve ``count`` consecutive ids for ``collection`` and return the first one."""
+
+    if count < 1:
+        raise ValueError("count must be positive")
+    counters = _counters(collection)
+    document = counters.find_one_and_update(
+        {"_id": collection.name},
+        {"$inc": {"seq": count}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if document is None:
+        # Счётчика ещё нет: продолжаем нумерацию с уже существующих документов
+        reseed_counter(collection)
+        document = counters.find_one_and_update(
+            {"_id": collection.name},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    return int(document["seq"]) - count + 1
+
+
+def reseed_counters(
+    database: Database, names: Iterable[str] = SEQUENCED_COLLECTIONS
+) -> Dict[str, int]:
+    """Reseed counters of the given collections and return their values."""
+
+    return {name: reseed_counter(database[name]) for name in names}
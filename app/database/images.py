@@ -0,0 +1,142 @@
+"""Content-addressed storage of product images outside product documents."""
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+from gridfs import GridFSBucket, NoFile
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+from pymongo.database import Database
+
+from app.config import IMAGE_STORAGE_FILESYSTEM, Settings
+from app.database.products import image_hash
+
+__all__ = [
+    "FileSystemImageStore",
+    "GridFSImageStore",
+    "ImageStore",
+    "create_image_store",
+]
+
+
+class ImageStore(ABC):
+    """Storage of image blobs addressed by the SHA-256 hash of their contents.
+
+    Writes are synchronous because they happen in import and migration
+    scripts; reads are asynchronous because they happen inside handlers.
+    Reads are buffered: Bot API uploads need the whole image in memory anyway,
+    so stores return it as one ``bytes`` object without intermediate copies.
+    """
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` if it is not stored yet and return its reference."""
+
+        reference = image_hash(data)
+        if not self.exists(reference):
+            self._write(reference, data)
+        return reference
+
+    @abstractmethod
+    def exists(self, reference: str) -> bool:
+        """Return ``True`` if the image is already stored."""
+
+    @abstractmethod
+    def _write(self, reference: str, data: bytes) -> None:
+        """Persist ``data`` under ``reference``."""
+
+    @abstractmethod
+    async def read(self, reference: str) -> Optional[bytes]:
+        """Return the image contents or ``None`` if the image is missing."""
+
+
+class GridFSImageStore(ImageStore):
+    """Images stored in a GridFS bucket with the hash as the file name."""
+
+    def __init__(
+        self,
+        database: Database,
+        async_database: Optional[AsyncIOMotorDatabase] = None,
+        *,
+        bucket_name: str = "images",
+    ) -> None:
+        self._bucket = GridFSBucket(database, bucket_name=bucket_name)
+        self._files = database[f"{bucket_name}.files"]
+        self._async_bucket = (
+            AsyncIOMotorGridFSBucket(async_database, bucket_name=bucket_name)
+            if async_database is not None
+            else None
+        )
+
+    def exists(self, reference: str) -> bool:
+        return self._files.find_one({"filename": reference}, {"_id": 1}) is not None
+
+    def _write(self, reference: str, data: bytes) -> None:
+        self._bucket.upload_from_stream(
+            reference, io.BytesIO(data), metadata={"sha256": reference}
+        )
+
+    async def read(self, reference: str) -> Optional[bytes]:
+        if self._async_bucket is None:
+            raise RuntimeError("GridFSImageStore был создан без асинхронной базы данных")
+        try:
+            grid_out = await self._async_bucket.open_download_stream_by_name(reference)
+        except NoFile:
+            return None
+        buffer = io.BytesIO()
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            buffer.write(chunk)
+        # getvalue() отдаёт внутренний буфер BytesIO без копирования, в отличие от read()
+        return buffer.getvalue()
+
+
+class FileSystemImageStore(ImageStore):
+    """Images stored as files in a local directory sharded by hash prefix."""
+
+    def __init__(self, root: Path | str) -> None:
+        self._root = Path(root)
+
+    def _path(self, reference: str) -> Path:
+        return self._root / reference[:2] / reference
+
+    def exists(self, reference: str) -> bool:
+        return self._path(reference).is_file()
+
+    def _write(self, reference: str, data: bytes) -> None:
+        path = self._path(reference)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Пишем во временный файл и переименовываем, чтобы читатели не увидели
+        # недописанное изображение
+        descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(descriptor, "wb") as handle:
+                handle.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+
+    async def read(self, reference: str) -> Optional[bytes]:
+        try:
+            return await asyncio.to_thread(self._path(reference).read_bytes)
+        except FileNotFoundError:
+            return None
+
+
+def create_image_store(
+    settings: Settings,
+    database: Database,
+    async_database: Optional[AsyncIOMotorDatabase] = None,
+) -> ImageStore:
+    """Return the image store selected by the ``IMAGE_STORAGE`` setting."""
+
+    if settings.image_storage == IMAGE_STORAGE_FILESYSTEM:
+        return FileSystemImageStore(settings.image_storage_path)
+    return GridFSImageStore(database, async_database)
@@ -0,0 +1,204 @@
+"""Preparation of catalog images for Telegram: validation, resizing and thumbnails."""
+from __future__ import annotations
+
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, Optional, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.config import Settings
+
+__all__ = [
+    "ImageOptions",
+    "ImagePipeline",
+    "InvalidImageError",
+    "ProcessedImage",
+    "create_image_pipeline",
+    "process_image",
+]
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED_FORMATS = frozenset({"JPEG", "PNG", "WEBP", "GIF", "BMP", "TIFF"})
+
+# Ограничения Bot API для sendPhoto
+_MAX_SIDES_SUM = 10000
+_MAX_ASPECT_RATIO = 20
+
+
+class InvalidImageError(ValueError):
+    """Raised when image bytes cannot be used as a product photo."""
+
+
+@dataclass(frozen=True)
+class ImageOptions:
+    """Target parameters of processed images."""
+
+    max_side: int = 1280
+    quality: int = 85
+    thumbnail_side: int = 320
+
+
+@dataclass(frozen=True)
+class ProcessedImage:
+    """Photo ready to be stored and sent, with its thumbnail."""
+
+    data: bytes
+    thumbnail: bytes
+    width: int
+    height: int
+    source_format: str
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # JPEG не поддерживает прозрачность: кладём изображение на белый фон
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def _encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def process_image(data: bytes, options: ImageOptions = ImageOptions()) -> ProcessedImage:
+    """Validate ``data`` and return it downscaled and recompressed as JPEG.
+
+    The original bytes are kept when they are already a JPEG within the size
+    limit and recompression would not make them smaller.
+    """
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format or ""
+        if source_format not in ACCEPTED_FORMATS:
+            raise InvalidImageError(f"неподдерживаемый формат изображения: {source_format}")
+        # Исходный размер: draft() ниже меняет image.size
+        width, height = image.size
+        # Для JPEG декодер сразу уменьшает изображение в 2–8 раз, это намного быстрее
+        image.draft("RGB", (options.max_side, options.max_side))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as exc:
+        raise InvalidImageError(f"не удалось прочитать изображение: {exc}") from exc
+
+    if min(width, height) < 1 or max(width, height) / min(width, height) > _MAX_ASPECT_RATIO:
+        raise InvalidImageError(f"недопустимые пропорции изображения {width}x{height}")
+
+    image = _to_rgb(image)
+    resized = max(width, height) > options.max_side
+    if max(image.size) > options.max_side:
+        image.thumbnail((options.max_side, options.max_side), Image.Resampling.LANCZOS)
+    encoded = _encode_jpeg(image, options.quality)
+    if (
+        source_format == "JPEG"
+        and not resized
+        and width + height <= _MAX_SIDES_SUM
+        and len(data) <= len(encoded)
+    ):
+        encoded = data
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail(
+        (options.thumbnail_side, options.thumbnail_side), Image.Resampling.LANCZOS
+    )
+    return ProcessedImage(
+        data=encoded,
+        thumbnail=_encode_jpeg(thumbnail, options.quality),
+        width=image.width,
+        height=image.height,
+        source_format=source_format,
+    )
+
+
+class ImagePipeline:
+    """Runs image jobs in a process pool, keeping a bounded number in flight.
+
+    The pool is started on the first job, so creating a pipeline that is not
+    used (for example when the import is skipped) costs nothing. Workers are
+    spawned rather than forked because the bot starts the pool from a thread
+    while other threads are running.
+    """
+
+    def __init__(self, options: ImageOptions = ImageOptions(), *, workers: int = 0) -> None:
+        self.options = options
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # fork из процесса с потоками может унаследовать захваченные блокировки
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def imap_unordered(
+        self,
+        function: Callable[..., Any],
+        jobs: Iterable[Tuple[Hashable, Tuple[Any, ...]]],
+    ) -> Iterator[Tuple[Hashable, Any]]:
+        """Yield ``(key, result)`` pairs as jobs complete.
+
+        ``function(*args)`` runs in a worker process; if it raises, the
+        exception object is yielded in place of the result.
+        """
+
+        executor = self._get_executor()
+        window = self.workers * 2
+        pending: Dict[Future[Any], Hashable] = {}
+        job_iterator = iter(jobs)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    key, args = next(job_iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(function, *args)] = key
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                exception = future.exception()
+                yield key, exception if exception is not None else future.result()
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> "ImagePipeline":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def create_image_pipeline(settings: Settings) -> ImagePipeline:
+    """Return the pipeline configured by the ``IMAGE_*`` settings."""
+
+    return ImagePipeline(
+        ImageOptions(
+            max_side=settings.image_max_side,
+            quality=settings.image_quality,
+            thumbnail_side=settings.image_thumbnail_side,
+        ),
+        workers=settings.image_workers,
+    )
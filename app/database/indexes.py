@@ -0,0 +1,192 @@
+"""Declarations of the MongoDB indexes required by the bot queries."""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.database import Database
+from pymongo.errors import OperationFailure
+
+__all__ = [
+    "CODE_COLLATION",
+    "IndexDrift",
+    "IndexSpec",
+    "REQUIRED_INDEXES",
+    "ensure_indexes",
+    "find_index_drift",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# Сравнение артикулов без учёта регистра: ART119 и art119 — один продукт
+CODE_COLLATION: Mapping[str, Any] = {"locale": "en", "strength": 2}
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """Description of a single index of a collection."""
+
+    collection: str
+    name: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    collation: Optional[Mapping[str, Any]] = None
+    partial_filter: Optional[Mapping[str, Any]] = None
+
+    def to_model(self) -> IndexModel:
+        """Return the pymongo model used to create the index."""
+
+        options: Dict[str, Any] = {"name": self.name}
+        if self.unique:
+            options["unique"] = True
+        if self.collation is not None:
+            options["collation"] = dict(self.collation)
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = dict(self.partial_filter)
+        return IndexModel(list(self.keys), **options)
+
+    def matches(self, info: Mapping[str, Any]) -> bool:
+        """Return ``True`` if the existing index ``info`` satisfies the spec."""
+
+        if [tuple(item) for item in info.get("key", [])] != list(self.keys):
+            return False
+        if bool(info.get("unique", False)) != self.unique:
+            return False
+        existing_collation = info.get("collation")
+        if self.collation is None:
+            if existing_collation and existing_collation.get("locale") != "simple":
+                return False
+        else:
+            if not existing_collation:
+                return False
+            for option, value in self.collation.items():
+                if existing_collation.get(option) != value:
+                    return False
+        partial_filter = info.get("partialFilterExpression")
+        expected_filter = dict(self.partial_filter) if self.partial_filter else None
+        return (dict(partial_filter) if partial_filter else None) == expected_filter
+
+
+REQUIRED_INDEXES: Tuple[IndexSpec, ...] = (
+    IndexSpec("admins", "id_unique", (("id", ASCENDING),), unique=True),
+    IndexSpec(
+        "admins",
+        "telegram_id_unique",
+        (("telegram_id", ASCENDING),),
+        unique=True,
+        partial_filter={"telegram_id": {"$exists": True}},
+    ),
+    IndexSpec("brands", "id_unique", (("id", ASCENDING),), unique=True),
+    # Уникальные имена не дают параллельным запускам добавить один справочник дважды
+    IndexSpec("brands", "name_unique", (("name", ASCENDING),), unique=True),
+    IndexSpec("categories", "id_unique", (("id", ASCENDING),), unique=True),
+    IndexSpec("categories", "name_unique", (("name", ASCENDING),), unique=True),
+    IndexSpec("products", "id_unique", (("id", ASCENDING),), unique=True),
+    IndexSpec(
+        "products",
+        "code_unique_ci",
+        (("code", ASCENDING),),
+        unique=True,
+        collation=CODE_COLLATION,
+    ),
+    # Покрывающий индекс для списка продуктов бренда и категории с сортировкой по имени
+    IndexSpec(
+        "products",
+        "brand_category_name_id",
+        (
+            ("brand_id", ASCENDING),
+            ("category_id", ASCENDING),
+            ("name", ASCENDING),
+            ("id", ASCENDING),
+        ),
+    ),
+)
+
+
+@dataclass
+class IndexDrift:
+    """Difference between the declared and the existing indexes."""
+
+    missing: List[IndexSpec] = field(default_factory=list)
+    conflicting: List[Tuple[IndexSpec, str]] = field(default_factory=list)
+    unexpected: List[Tuple[str, str]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.missing or self.conflicting or self.unexpected)
+
+
+def _group_by_collection(
+    specs: Sequence[IndexSpec],
+) -> Dict[str, List[IndexSpec]]:
+    grouped: Dict[str, List[IndexSpec]] = {}
+    for spec in specs:
+        grouped.setdefault(spec.collection, []).append(spec)
+    return grouped
+
+
+def find_index_drift(
+    database: Database, specs: Sequence[IndexSpec] = REQUIRED_INDEXES
+) -> IndexDrift:
+    """Compare the declared indexes with the ones present in the database."""
+
+    drift = IndexDrift()
+    for collection_name, collection_specs in _group_by_collection(specs).items():
+        existing = database[collection_name].index_information()
+        matched: set[str] = {"_id_"}
+        for spec in collection_specs:
+            match = next(
+                (name for name, info in existing.items() if spec.matches(info)), None
+            )
+            if match is not None:
+                matched.add(match)
+            elif spec.name in existing:
+                matched.add(spec.name)
+                drift.conflicting.append((spec, spec.name))
+            else:
+                drift.missing.append(spec)
+        drift.unexpected.extend(
+            (collection_name, name) for name in existing if name not in matched
+        )
+    return drift
+
+
+def ensure_indexes(
+    database: Database, specs: Sequence[IndexSpec] = REQUIRED_INDEXES
+) -> IndexDrift:
+    """Create missing indexes and log the drift that cannot be fixed automatically.
+
+    Existing indexes are never dropped: conflicting definitions and indexes
+    that are not declared in ``specs`` are only reported. Returns the drift
+    that remains after creating the missing indexes.
+    """
+
+    drift = find_index_drift(database, specs)
+    for collection_name, missing in _group_by_collection(drift.missing).items():
+        for spec in missing:
+            try:
+                database[collection_name].create_indexes([spec.to_model()])
+            except OperationFailure as exc:
+                logger.error(
+                    "Не удалось создать индекс %s.%s: %s",
+                    collection_name,
+                    spec.name,
+                    exc,
+                )
+            else:
+                logger.info("Создан индекс %s.%s", collection_name, spec.name)
+
+    remaining = find_index_drift(database, specs)
+    for spec in remaining.missing:
+        logger.warning("Отсутствует индекс %s.%s", spec.collection, spec.name)
+    for spec, name in remaining.conflicting:
+        logger.warning(
+            "Индекс %s.%s отличается от ожидаемого описания", spec.collection, name
+        )
+    for collection_name, name in remaining.unexpected:
+        logger.info("Необъявленный индекс %s.%s", collection_name, name)
+    if not remaining:
+        logger.info("Индексы MongoDB соответствуют описанию")
+    return remaining
@@ -2,20 +2,45 @@
 from __future__ import annotations
 
 import base64
+import binascii
+import hashlib
 import json
 import logging
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Sequence
+from typing import (
+    Any,
+    Hashable,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
 
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from pymongo.collection import Collection
 
 from app.database import MongoCollections
+from app.database.counters import allocate_ids
+from app.database.images import ImageStore
+from app.database.imaging import ImageOptions, ImagePipeline, ProcessedImage, process_image
+from app.database.indexes import CODE_COLLATION
+from app.database.meta import bump_catalog_version, get_import_hash, set_import_hash
 
 __all__ = [
     "ensure_brands_collection",
     "ensure_admins_collection",
     "ensure_categories_collection",
+    "file_sha256",
+    "iter_product_records",
     "load_products_from_file",
+    "migrate_inline_images",
+    "ProductImportResult",
     "DEFAULT_BRANDS",
     "DEFAULT_CATEGORIES",
     "DEFAULT_PRODUCTS_FILE",
@@ -49,23 +74,57 @@ DEFAULT_CATEGORIES = (
 
 DEFAULT_PRODUCTS_FILE = Path(__file__).with_name("default_products.json")
 
+_READ_CHUNK_SIZE = 64 * 1024
+_DUPLICATE_KEY = 11000
+_IMAGE_FIELDS = ("image_base64", "image_path")
+
+
+def _catalog_changed(collection: Collection) -> None:
+    """Signal running bots that the catalog stored next to ``collection`` changed."""
+
+    bump_catalog_version(collection.database["meta"])
+
+
+def _insert_missing_names(collection: Collection, names: Sequence[str]) -> int:
+    """Insert documents for ``names`` missing from ``collection`` and return their count."""
+
+    existing = {doc["name"] for doc in collection.find({}, {"name": 1})}
+    missing = list(dict.fromkeys(name for name in names if name not in existing))
+    if not missing:
+        return 0
+    first_id = allocate_ids(collection, len(missing))
+    # upsert по имени вместе с индексом name_unique: если параллельный запуск
+    # успел вставить то же имя, наш upsert получает DuplicateKeyError
+    try:
+        outcome = collection.bulk_write(
+            [
+                UpdateOne(
+                    {"name": name}, {"$setOnInsert": {"id": first_id + offset}}, upsert=True
+                )
+                for offset, name in enumerate(missing)
+            ],
+            ordered=False,
+        )
+        upserted = outcome.upserted_count
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        if any(error.get("code") != _DUPLICATE_KEY for error in errors):
+            raise
+        upserted = int(exc.details.get("nUpserted", 0))
+        logger.info(
+            "%s имён в %s уже добавлены параллельным запуском", len(errors), collection.name
+        )
+    if upserted:
+        _catalog_changed(collection)
+    return upserted
+
+
 def ensure_brands_collection(brands: Collection, brand_names: Sequence[str]) -> None:
     """Populate the brands collection with default brand names."""
 
-    existing = {
-        doc["name"]: int(doc.get("id", 0))
-        for doc in brands.find({}, {"name": 1, "id": 1})
-    }
-    next_id = (max(existing.values()) if existing else 0) + 1
-    new_docs = []
-    for name in brand_names:
-        if name in existing:
-            continue
-        new_docs.append({"id": next_id, "name": name})
-        next_id += 1
-    if new_docs:
-        brands.insert_many(new_docs)
-        logger.info("Добавлено %s брендов", len(new_docs))
+    added = _insert_missing_names(brands, brand_names)
+    if added:
+        logger.info("Добавлено %s брендов", added)
     else:
         logger.info("Коллекция брендов уже инициализирована")
 
@@ -75,20 +134,9 @@ def ensure_categories_collection(
 ) -> None:
     """Populate the categories collection with default category names."""
 
-    existing = {
-        doc["name"]: int(doc.get("id", 0))
-        for doc in categories.find({}, {"name": 1, "id": 1})
-    }
-    next_id = (max(existing.values()) if existing else 0) + 1
-    new_docs = []
-    for name in category_names:
-        if name in existing:
-            continue
-        new_docs.append({"id": next_id, "name": name})
-        next_id += 1
-    if new_docs:
-        categories.insert_many(new_docs)
-        logger.info("Добавлено %s категорий", len(new_docs))
+    added = _insert_missing_names(categories, category_names)
+    if added:
+        logger.info("Добавлено %s категорий", added)
     else:
         logger.info("Коллекция категорий уже инициализирована")
 
@@ -112,37 +160,447 @@ def ensure_admins_collection(
         )
         return
 
-    last = admins.find_one(sort=[("id", -1)], projection={"id": 1})
-    next_id = int(last.get("id", 0)) + 1 if last else 1
-
-    admins.insert_one({"id": next_id, "telegram_id": initial_admin_id})
+    next_id = allocate_ids(admins)
+    admins.update_one(
+        {"telegram_id": initial_admin_id},
+        {"$setOnInsert": {"id": next_id}},
+        upsert=True,
+    )
     logger.info(
         "Добавлен администратор с id=%s и telegram_id=%s", next_id, initial_admin_id
     )
 
 
+def _decode_base64_image(image_base64: str) -> bytes:
+    try:
+        return base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        return b""
+
+
+def _resolve_image_path(value: Any, base_dir: Path) -> Path:
+    image_path = Path(str(value))
+    if not image_path.is_absolute():
+        if image_path.exists():
+            return image_path.resolve()
+        return (base_dir / image_path).resolve()
+    return image_path
+
+
+def _image_source(
+    raw: Mapping[str, Any], *, base_dir: Path, options: Optional[ImageOptions]
+) -> str:
+    """Return a fingerprint of the image source of a record and the processing options.
+
+    Files are identified by path, size and modification time, so an unchanged
+    image is recognised without reading it.
+    """
+
+    digest = hashlib.sha256(repr(options).encode("utf-8"))
+    image_base64 = str(raw.get("image_base64", "")).strip()
+    if image_base64:
+        digest.update(b"base64:" + image_base64.encode("utf-8"))
+        return digest.hexdigest()
+    image_path_value = raw.get("image_path")
+    if not image_path_value:
+        return ""
+    image_path = _resolve_image_path(image_path_value, base_dir)
+    try:
+        stat = image_path.stat()
+    except OSError:
+        return ""
+    digest.update(f"path:{image_path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _read_product_image(
+    raw: Mapping[str, Any], *, base_dir: Path, label: str
+) -> bytes:
+    """Return image bytes given inline as ``image_base64`` or via ``image_path``."""
+
+    image_base64 = str(raw.get("image_base64", "")).strip()
+    if image_base64:
+        return _decode_base64_image(image_base64)
+
+    image_path_value = raw.get("image_path")
+    if not image_path_value:
+        return b""
+    image_path = _resolve_image_path(image_path_value, base_dir)
+    try:
+        return image_path.read_bytes()
+    except OSError as exc:
+        logger.warning("Не удалось прочитать изображение для продукта %s: %s", label, exc)
+        return b""
+
+
+@dataclass
+class ProductImportResult:
+    """Outcome of :func:`load_products_from_file`."""
+
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: int = 0
+    failed: int = 0
+    up_to_date: bool = False
+
+    @property
+    def changed(self) -> bool:
+        """Return ``True`` if the import modified the catalog."""
+
+        return bool(self.inserted or self.updated)
+
+
+def file_sha256(path: Path) -> str:
+    """Return the SHA-256 of the file contents read in chunks."""
+
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(_READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _iter_json_array(handle: TextIO, label: str) -> Iterator[Any]:
+    """Yield items of a top-level JSON array without reading it whole."""
+
+    decoder = json.JSONDecoder()
+    buffer = handle.read(_READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError(f"{label}: ожидался JSON-массив")
+    position = 1
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                buffer, position = buffer[end:], 0
+                continue
+        elif eof:
+            raise ValueError(f"{label}: JSON-массив не закрыт")
+        # Элемент не поместился в буфер целиком: дочитываем файл
+        chunk = handle.read(_READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _iter_json_lines(handle: TextIO, label: str) -> Iterator[Any]:
+    """Yield objects of a JSON Lines file, skipping malformed lines."""
+
+    for line_number, line in enumerate(handle, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            logger.warning("%s:%s: некорректная строка JSON: %s", label, line_number, exc)
+
+
+def iter_product_records(path: Path) -> Iterator[Any]:
+    """Yield raw product records of a JSON array or JSON Lines file one by one."""
+
+    with path.open("r", encoding="utf-8") as handle:
+        head = handle.read(_READ_CHUNK_SIZE).lstrip()
+        handle.seek(0)
+        if head.startswith("["):
+            yield from _iter_json_array(handle, str(path))
+        else:
+            yield from _iter_json_lines(handle, str(path))
+
+
+def _product_fields(
+    raw: Mapping[str, Any],
+    *,
+    brand_map: Mapping[str, int],
+    category_map: Mapping[str, int],
+) -> Optional[dict[str, Any]]:
+    """Return validated product fields of a record or ``None`` if it is rejected."""
+
+    code = str(raw.get("code", "")).strip()
+    name = str(raw.get("name", "")).strip()
+    brand_name = str(raw.get("brand", "")).strip().lower()
+    category_name = str(raw.get("category", "")).strip().lower()
+
+    if not code:
+        return None
+    if not name:
+        logger.warning("Пропущен продукт без названия с кодом %s", code)
+        return None
+
+    brand_id = brand_map.get(brand_name)
+    if brand_id is None:
+        logger.warning("Для продукта %s не найдена запись бренда '%s'", code, brand_name)
+        return None
+
+    category_id = category_map.get(category_name)
+    if category_id is None:
+        logger.warning(
+            "Для продукта %s не найдена запись категории '%s'", code, category_name
+        )
+        return None
+
+    return {
+        "code": code,
+        "name": name,
+        "description": str(raw.get("description", "")).strip(),
+        "link": str(raw.get("link", "")).strip(),
+        "brand_id": brand_id,
+        "category_id": category_id,
+    }
+
+
+def _prepare_product_image(
+    image_fields: Mapping[str, Any],
+    base_dir: Path,
+    label: str,
+    options: Optional[ImageOptions],
+) -> Union[ProcessedImage, bytes, None]:
+    """Read the image of a record and process it; runs in a worker process."""
+
+    image_bytes = _read_product_image(image_fields, base_dir=base_dir, label=label)
+    if not image_bytes:
+        return None
+    if options is None:
+        return image_bytes
+    return process_image(image_bytes, options)
+
+
+def _run_inline(
+    jobs: Iterable[Tuple[Hashable, Tuple[Any, ...]]]
+) -> Iterator[Tuple[Hashable, Any]]:
+    for key, args in jobs:
+        try:
+            yield key, _prepare_product_image(*args)
+        except Exception as exc:  # noqa: BLE001 - как и в пуле, ошибка возвращается вместо результата
+            yield key, exc
+
+
+def _store_product_images(
+    batch: Mapping[str, tuple[Mapping[str, Any], dict[str, Any]]],
+    *,
+    base_dir: Path,
+    image_store: ImageStore,
+    pipeline: Optional[ImagePipeline],
+) -> dict[Hashable, dict[str, Any]]:
+    """Store images of a batch and return the image fields of every product."""
+
+    options = pipeline.options if pipeline is not None else None
+    jobs = (
+        (
+            key,
+            (
+                {name: raw[name] for name in _IMAGE_FIELDS if name in raw},
+                base_dir,
+                fields["code"],
+                options,
+            ),
+        )
+        for key, (raw, fields) in batch.items()
+    )
+    results = (
+        pipeline.imap_unordered(_prepare_product_image, jobs)
+        if pipeline is not None
+        else _run_inline(jobs)
+    )
+
+    images: dict[Hashable, dict[str, Any]] = {}
+    for key, result in results:
+        if isinstance(result, Exception):
+            logger.warning(
+                "Изображение продукта %s отклонено: %s", batch[key][1]["code"], result
+            )
+            continue
+        if isinstance(result, ProcessedImage):
+            image_ref = image_store.put(result.data)
+            images[key] = {
+                "image_ref": image_ref,
+                "image_hash": image_ref,
+                "image_width": result.width,
+                "image_height": result.height,
+                "thumbnail_ref": image_store.put(result.thumbnail),
+            }
+        elif result:
+            image_ref = image_store.put(result)
+            images[key] = {"image_ref": image_ref, "image_hash": image_ref}
+    return images
+
+
+def _write_product_batch(
+    products: Collection,
+    batch: Mapping[str, tuple[Mapping[str, Any], dict[str, Any]]],
+    *,
+    base_dir: Path,
+    image_store: ImageStore,
+    pipeline: Optional[ImagePipeline],
+    result: ProductImportResult,
+) -> None:
+    """Upsert one batch of products keyed on ``code``.
+
+    Images are processed only for new products and for products whose image
+    source changed since the previous import. Images of new products are
+    stored only after the product itself was saved, so a write rejected by a
+    unique index leaves no unreferenced image behind; such writes are logged
+    and counted in ``result.failed`` instead of aborting the import.
+    """
+
+    existing = {
+        str(doc.get("code", "")).strip().lower(): doc
+        for doc in products.find(
+            {"code": {"$in": [fields["code"] for _, fields in batch.values()]}},
+            {"_id": 0, "code": 1, "image_ref": 1, "image_source": 1},
+            collation=CODE_COLLATION,
+        )
+    }
+
+    options = pipeline.options if pipeline is not None else None
+    sources = {
+        key: _image_source(raw, base_dir=base_dir, options=options)
+        for key, (raw, _) in batch.items()
+    }
+    # Изображения читаются только для записей, прошедших проверку, и только
+    # если источник изображения изменился с прошлого импорта
+    kept = {
+        key
+        for key, source in sources.items()
+        if source
+        and key in existing
+        and existing[key].get("image_ref")
+        and existing[key].get("image_source") == source
+    }
+    # Изображения существующих продуктов сохраняются сразу: их запись не
+    # добавляет документов и не может нарушить уникальные индексы
+    images = _store_product_images(
+        {key: item for key, item in batch.items() if key in existing and key not in kept},
+        base_dir=base_dir,
+        image_store=image_store,
+        pipeline=pipeline,
+    )
+
+    new_keys = [key for key in batch if key not in existing]
+    # Идентификаторы новых продуктов резервируются одним запросом на пачку
+    next_id = allocate_ids(products, len(new_keys)) if new_keys else 0
+
+    operations = []
+    keys = []
+    for key, (raw, fields) in batch.items():
+        keys.append(key)
+        image_fields = images.get(key)
+        if image_fields:
+            fields = {**fields, **image_fields, "image_source": sources[key]}
+        elif key in existing and key not in kept:
+            logger.warning("Для продукта %s не удалось получить изображение", fields["code"])
+
+        update: dict[str, Any] = {"$set": fields}
+        if key not in existing:
+            update["$setOnInsert"] = {"id": next_id, "image_ref": "", "image_hash": ""}
+            next_id += 1
+        operations.append(
+            UpdateOne({"code": fields["code"]}, update, upsert=True, collation=CODE_COLLATION)
+        )
+
+    outcome, failed = _bulk_write_products(products, operations, keys, batch)
+    result.failed += len(failed)
+    result.inserted += outcome.get("nUpserted", 0)
+    result.updated += outcome.get("nModified", 0)
+    result.unchanged += outcome.get("nMatched", 0) - outcome.get("nModified", 0)
+
+    saved_new = {key: batch[key] for key in new_keys if key not in failed}
+    if not saved_new:
+        return
+    new_images = _store_product_images(
+        saved_new, base_dir=base_dir, image_store=image_store, pipeline=pipeline
+    )
+    image_keys = []
+    image_operations = []
+    for key, (_, fields) in saved_new.items():
+        image_fields = new_images.get(key)
+        if not image_fields:
+            logger.warning("Для продукта %s не удалось получить изображение", fields["code"])
+            continue
+        image_keys.append(key)
+        image_operations.append(
+            UpdateOne(
+                {"code": fields["code"]},
+                {"$set": {**image_fields, "image_source": sources[key]}},
+                collation=CODE_COLLATION,
+            )
+        )
+    if image_operations:
+        _, failed = _bulk_write_products(products, image_operations, image_keys, batch)
+        result.failed += len(failed)
+
+
+def _bulk_write_products(
+    products: Collection,
+    operations: Sequence[UpdateOne],
+    keys: Sequence[str],
+    batch: Mapping[str, tuple[Mapping[str, Any], dict[str, Any]]],
+) -> Tuple[Mapping[str, Any], set[str]]:
+    """Run an unordered bulk write and return its counters and the failed keys."""
+
+    try:
+        return products.bulk_write(list(operations), ordered=False).bulk_api_result, set()
+    except BulkWriteError as exc:
+        # Остальные операции неупорядоченной пачки всё равно выполнены
+        outcome = exc.details
+        failed = set()
+        for error in outcome.get("writeErrors", []):
+            key = keys[error["index"]]
+            failed.add(key)
+            logger.warning(
+                "Продукт %s не сохранён: %s", batch[key][1]["code"], error.get("errmsg")
+            )
+        return outcome, failed
+
+
 def load_products_from_file(
     products: Collection,
     brands: Collection,
     categories: Collection,
     file_path: Path | str,
-) -> None:
-    """Load initial products from a JSON file into the products collection."""
-
+    *,
+    image_store: ImageStore,
+    image_pipeline: Optional[ImagePipeline] = None,
+    batch_size: int = 500,
+    force: bool = False,
+) -> ProductImportResult:
+    """Import products from a JSON array or JSON Lines file.
+
+    Records are streamed and upserted by ``code`` in batches of ``batch_size``,
+    so existing products are updated and memory use does not grow with the
+    file. Images are resized and recompressed by ``image_pipeline`` in worker
+    processes; without it they are stored as is. The import is skipped when the
+    file hash matches the last successful import unless ``force`` is set.
+    """
+
+    result = ProductImportResult()
     path = Path(file_path)
     if not path.exists():
         logger.warning("Файл с продуктами %s не найден", path)
-        return
+        return result
 
+    meta = products.database["meta"]
+    source = path.name
     try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-    except (OSError, json.JSONDecodeError) as exc:
-        logger.error("Не удалось загрузить стартовые продукты: %s", exc)
-        return
-
-    if not isinstance(data, list):
-        logger.error("Формат файла с продуктами некорректен: ожидался список")
-        return
+        source_hash = file_sha256(path)
+    except OSError as exc:
+        logger.error("Не удалось прочитать файл с продуктами %s: %s", path, exc)
+        return result
+    if not force and get_import_hash(meta, source) == source_hash:
+        logger.info("Файл %s не изменился с последнего импорта", path)
+        result.up_to_date = True
+        return result
 
     brand_map = {
         str(doc.get("name", "")).strip().lower(): int(doc.get("id", 0))
@@ -152,83 +610,99 @@ def load_products_from_file(
         str(doc.get("name", "")).strip().lower(): int(doc.get("id", 0))
         for doc in categories.find({}, {"name": 1, "id": 1})
     }
+    # Ключ — код в нижнем регистре: повторы кода внутри пачки схлопываются
+    batch: dict[str, tuple[Mapping[str, Any], dict[str, Any]]] = {}
+    try:
+        for raw in iter_product_records(path):
+            if not isinstance(raw, dict):
+                result.rejected += 1
+                continue
+            fields = _product_fields(raw, brand_map=brand_map, category_map=category_map)
+            if fields is None:
+                result.rejected += 1
+                continue
+            batch[fields["code"].lower()] = (raw, fields)
+            if len(batch) >= batch_size:
+                _write_product_batch(
+                    products,
+                    batch,
+                    base_dir=path.parent,
+                    image_store=image_store,
+                    pipeline=image_pipeline,
+                    result=result,
+                )
+                batch = {}
+        if batch:
+            _write_product_batch(
+                products,
+                batch,
+                base_dir=path.parent,
+                image_store=image_store,
+                pipeline=image_pipeline,
+                result=result,
+            )
+    except (OSError, ValueError) as exc:
+        logger.error("Не удалось загрузить продукты из %s: %s", path, exc)
+        if result.changed:
+            _catalog_changed(products)
+        return result
+
+    if result.changed:
+        _catalog_changed(products)
+    if result.failed:
+        # Без сохранённого хеша следующий запуск повторит импорт несохранённых продуктов
+        logger.warning(
+            "%s продуктов из %s не сохранены, импорт будет повторён", result.failed, path
+        )
+    else:
+        set_import_hash(meta, source, source_hash)
+    logger.info(
+        "Импорт продуктов завершён: добавлено %s, обновлено %s, без изменений %s, "
+        "отклонено %s, не сохранено %s",
+        result.inserted,
+        result.updated,
+        result.unchanged,
+        result.rejected,
+        result.failed,
+    )
+    return result
 
-    existing_codes = {
-        str(doc.get("code", "")).strip().lower()
-        for doc in products.find({}, {"code": 1})
-    }
-    last_product = products.find_one(sort=[("id", -1)], projection={"id": 1})
-    next_id = int(last_product.get("id", 0)) + 1 if last_product else 1
 
-    new_documents = []
-    for raw in data:
-        if not isinstance(raw, dict):
-            continue
+def migrate_inline_images(
+    products: Collection, image_store: ImageStore, *, batch_size: int = 100
+) -> int:
+    """Move ``image_base64`` payloads into ``image_store`` and return the count."""
 
-        code = str(raw.get("code", "")).strip()
-        name = str(raw.get("name", "")).strip()
-        description = str(raw.get("description", "")).strip()
-        link = str(raw.get("link", "")).strip()
-        image_base64 = str(raw.get("image_base64", "")).strip()
-        image_path_value = raw.get("image_path")
-        if not image_base64 and image_path_value:
-            image_path = Path(str(image_path_value))
-            if not image_path.is_absolute():
-                if image_path.exists():
-                    image_path = image_path.resolve()
-                else:
-                    image_path = (path.parent / image_path).resolve()
-            try:
-                image_base64 = base64.b64encode(image_path.read_bytes()).decode()
-            except OSError as exc:
+    migrated = 0
+    query = {"image_base64": {"$exists": True}}
+    while True:
+        batch = list(
+            products.find(query, {"id": 1, "image_base64": 1}).limit(batch_size)
+        )
+        if not batch:
+            break
+        operations = []
+        for document in batch:
+            image_base64 = str(document.get("image_base64", "")).strip()
+            image_bytes = _decode_base64_image(image_base64)
+            image_ref = image_store.put(image_bytes) if image_bytes else ""
+            if image_base64 and not image_bytes:
                 logger.warning(
-                    "Не удалось прочитать изображение для продукта %s: %s", code or name, exc
+                    "Изображение продукта %s не удалось декодировать", document.get("id")
+                )
+            operations.append(
+                UpdateOne(
+                    {"_id": document["_id"]},
+                    {
+                        "$set": {"image_ref": image_ref, "image_hash": image_ref},
+                        "$unset": {"image_base64": ""},
+                    },
                 )
-                image_base64 = ""
-        brand_name = str(raw.get("brand", "")).strip().lower()
-        category_name = str(raw.get("category", "")).strip().lower()
-
-        if not code or code.lower() in existing_codes:
-            continue
-        if not name:
-            logger.warning("Пропущен продукт без названия с кодом %s", code)
-            continue
-
-        brand_id = brand_map.get(brand_name)
-        if brand_id is None:
-            logger.warning(
-                "Для продукта %s не найдена запись бренда '%s'", code, brand_name
-            )
-            continue
-
-        category_id = category_map.get(category_name)
-        if category_id is None:
-            logger.warning(
-                "Для продукта %s не найдена запись категории '%s'", code, category_name
             )
-            continue
-
-        if not image_base64:
-            logger.warning("Для продукта %s не удалось получить изображение", code)
-
-        document = {
-            "id": next_id,
-            "code": code,
-            "name": name,
-            "description": description,
-            "link": link,
-            "image_base64": image_base64,
-            "brand_id": brand_id,
-            "category_id": category_id,
-        }
-
-        new_documents.append(document)
-        existing_codes.add(code.lower())
-        next_id += 1
-
-    if not new_documents:
-        logger.info("Новые продукты для добавления отсутствуют")
-        return
+        products.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+        logger.info("Перенесено изображений: %s", migrated)
 
-    products.insert_many(new_documents)
-    logger.info("Добавлено %s продуктов", len(new_documents))
+    if migrated:
+        _catalog_changed(products)
+    return migrated
@@ -0,0 +1,81 @@
+"""Bookkeeping documents stored in the ``meta`` collection."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Mapping, Optional
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+
+__all__ = [
+    "BOOTSTRAP_ID",
+    "CATALOG_VERSION_ID",
+    "bump_catalog_version",
+    "get_bootstrap_state",
+    "get_catalog_version",
+    "get_import_hash",
+    "set_bootstrap_state",
+    "set_import_hash",
+]
+
+
+CATALOG_VERSION_ID = "catalog"
+IMPORT_ID_PREFIX = "import:"
+BOOTSTRAP_ID = "bootstrap"
+
+
+def bump_catalog_version(meta: Collection) -> int:
+    """Increment the catalog version so running bots reload their snapshot."""
+
+    document = meta.find_one_and_update(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(document["version"])
+
+
+def get_catalog_version(meta: Collection) -> int:
+    """Return the current catalog version, ``0`` if the catalog was never changed."""
+
+    document = meta.find_one({"_id": CATALOG_VERSION_ID}, {"version": 1})
+    if document is None:
+        return 0
+    return int(document.get("version", 0))
+
+
+def get_import_hash(meta: Collection, source: str) -> Optional[str]:
+    """Return the hash of ``source`` recorded by its last successful import."""
+
+    document = meta.find_one({"_id": IMPORT_ID_PREFIX + source}, {"sha256": 1})
+    if document is None:
+        return None
+    return document.get("sha256")
+
+
+def set_import_hash(meta: Collection, source: str, sha256: str) -> None:
+    """Record that ``source`` with hash ``sha256`` was imported successfully."""
+
+    meta.update_one(
+        {"_id": IMPORT_ID_PREFIX + source},
+        {"$set": {"sha256": sha256, "imported_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+def get_bootstrap_state(meta: Collection) -> Mapping[str, Any]:
+    """Return the state recorded by the last completed startup bootstrap."""
+
+    document = meta.find_one({"_id": BOOTSTRAP_ID}, {"_id": 0, "completed_at": 0})
+    return document or {}
+
+
+def set_bootstrap_state(meta: Collection, state: Mapping[str, Any]) -> None:
+    """Record the state the startup bootstrap has brought the database to."""
+
+    meta.replace_one(
+        {"_id": BOOTSTRAP_ID},
+        {**state, "completed_at": datetime.now(timezone.utc)},
+        upsert=True,
+    )
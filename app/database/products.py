@@ -1,28 +1,27 @@
 """Helpers for working with product documents in MongoDB."""
 from __future__ import annotations
 
+import hashlib
 from typing import Mapping, MutableMapping
 
 from pymongo.collection import Collection
 
+from app.database.counters import allocate_ids
 from app.database.models import Product
 
-__all__ = ["create_product", "prepare_product_document"]
+__all__ = ["create_product", "image_hash", "prepare_product_document"]
 
 
-def _next_incremental_id(collection: Collection) -> int:
-    """Return the next identifier for the provided collection."""
+def image_hash(photo_bytes: bytes) -> str:
+    """Return the hash identifying the image contents."""
 
-    last_document = collection.find_one(sort=[("id", -1)], projection={"id": 1})
-    if not last_document:
-        return 1
-    return int(last_document.get("id", 0)) + 1
+    return hashlib.sha256(photo_bytes).hexdigest()
 
 
 def prepare_product_document(data: Mapping[str, object], *, collection: Collection) -> MutableMapping[str, object]:
     """Prepare a MongoDB document for insertion ensuring an incremental id."""
 
-    new_id = _next_incremental_id(collection)
+    new_id = allocate_ids(collection)
     document = dict(data)
     document["id"] = new_id
     return document
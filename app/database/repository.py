@@ -0,0 +1,233 @@
+"""Asynchronous read access to the catalog used by the bot handlers."""
+from __future__ import annotations
+
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+)
+
+from motor.motor_asyncio import AsyncIOMotorCursor
+
+from app.database import AsyncMongoCollections
+from app.database.meta import CATALOG_VERSION_ID
+
+__all__ = [
+    "CatalogRepository",
+    "CatalogSource",
+    "PRODUCT_DETAILS_PROJECTION",
+    "sort_categories",
+]
+
+
+PRODUCT_DETAILS_PROJECTION = {
+    "id": 1,
+    "name": 1,
+    "code": 1,
+    "description": 1,
+    "link": 1,
+    "image_ref": 1,
+    "image_hash": 1,
+    "telegram_file_id": 1,
+    "telegram_file_hash": 1,
+    "brand_id": 1,
+    "category_id": 1,
+}
+
+
+async def _collect_named_items(cursor: AsyncIOMotorCursor) -> List[Tuple[int, str]]:
+    """Return ``(id, name)`` pairs from the cursor skipping malformed documents."""
+
+    items: List[Tuple[int, str]] = []
+    async for document in cursor:
+        try:
+            item_id = int(document.get("id"))
+        except (TypeError, ValueError):
+            continue
+        name = str(document.get("name", "")).strip()
+        if not name:
+            continue
+        items.append((item_id, name))
+    return items
+
+
+def sort_categories(categories: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Sort categories by name keeping the «прочее» category last."""
+
+    # Переносим категорию «прочее» в конец списка независимо от алфавитного порядка
+    categories.sort(
+        key=lambda item: (item[1].strip().lower() == "прочее", item[1].strip().lower())
+    )
+    return categories
+
+
+class CatalogSource(Protocol):
+    """Queries :class:`~app.database.catalog.CatalogCache` loads the catalog with."""
+
+    async def get_catalog_version(self) -> int:
+        ...
+
+    async def list_brands(self) -> Sequence[Tuple[int, str]]:
+        ...
+
+    async def list_categories(self) -> Sequence[Tuple[int, str]]:
+        ...
+
+    async def list_product_summaries(self) -> Sequence[Mapping[str, Any]]:
+        ...
+
+    def iter_product_documents(
+        self, *, batch_size: int = 200
+    ) -> AsyncIterator[Mapping[str, Any]]:
+        ...
+
+    def watch_catalog(
+        self, pipeline: Sequence[Mapping[str, Any]]
+    ) -> AsyncContextManager[Any]:
+        """Return a change stream over the catalog collections.
+
+        Raises :class:`pymongo.errors.OperationFailure` when change streams are
+        not supported, so the caller falls back to polling.
+        """
+        ...
+
+
+class CatalogRepository:
+    """Awaitable queries over brands, categories and products.
+
+    Implements :class:`CatalogSource` over MongoDB.
+    """
+
+    def __init__(self, collections: AsyncMongoCollections) -> None:
+        self._collections = collections
+
+    @property
+    def collections(self) -> AsyncMongoCollections:
+        """Return the underlying asynchronous collections."""
+
+        return self._collections
+
+    async def list_brands(self) -> Sequence[Tuple[int, str]]:
+        """Return all brands sorted by name."""
+
+        cursor = self._collections.brands.find({}, {"id": 1, "name": 1}).sort("name", 1)
+        return await _collect_named_items(cursor)
+
+    async def list_categories(self) -> Sequence[Tuple[int, str]]:
+        """Return all categories sorted by name with «прочее» last."""
+
+        cursor = self._collections.categories.find({}, {"id": 1, "name": 1}).sort(
+            "name", 1
+        )
+        return sort_categories(await _collect_named_items(cursor))
+
+    async def list_product_summaries(self) -> Sequence[Mapping[str, Any]]:
+        """Return lightweight documents of all products used for navigation."""
+
+        cursor = self._collections.products.find(
+            {}, {"_id": 0, "id": 1, "name": 1, "brand_id": 1, "category_id": 1}
+        )
+        return await cursor.to_list(length=None)
+
+    async def get_catalog_version(self) -> int:
+        """Return the catalog version counter bumped by catalog writers."""
+
+        document = await self._collections.meta.find_one(
+            {"_id": CATALOG_VERSION_ID}, {"version": 1}
+        )
+        if not document:
+            return 0
+        try:
+            return int(document.get("version", 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def watch_catalog(
+        self, pipeline: Sequence[Mapping[str, Any]]
+    ) -> AsyncContextManager[Any]:
+        """Return a change stream over the whole catalog database."""
+
+        return self._collections.database.watch(list(pipeline))
+
+    async def get_product(self, product_id: int) -> Optional[Mapping[str, Any]]:
+        """Return the product document with the fields needed for its card."""
+
+        return await self._collections.products.find_one(
+            {"id": product_id}, PRODUCT_DETAILS_PROJECTION
+        )
+
+    async def get_products(
+        self, product_ids: Sequence[int]
+    ) -> Dict[int, Mapping[str, Any]]:
+        """Return card documents of the given products keyed by id in one query."""
+
+        if not product_ids:
+            return {}
+        cursor = self._collections.products.find(
+            {"id": {"$in": list(product_ids)}}, PRODUCT_DETAILS_PROJECTION
+        )
+        return {int(document["id"]): document async for document in cursor}
+
+    async def get_product_image(self, product_id: int) -> str:
+        """Return the legacy inline base64 image or an empty string.
+
+        Products imported after the move to :mod:`app.database.images` keep
+        only ``image_ref``; this is used for documents not migrated yet.
+        """
+
+        document = await self._collections.products.find_one(
+            {"id": product_id}, {"image_base64": 1}
+        )
+        if not document:
+            return ""
+        return str(document.get("image_base64", "")).strip()
+
+    async def remember_photo_file_id(
+        self,
+        product_id: int,
+        *,
+        file_id: str,
+        image_hash: str,
+        store_image_hash: bool = False,
+    ) -> None:
+        """Persist the Telegram ``file_id`` obtained for the product image."""
+
+        fields = {"telegram_file_id": file_id, "telegram_file_hash": image_hash}
+        if store_image_hash:
+            fields["image_hash"] = image_hash
+        await self._collections.products.update_one(
+            {"id": product_id}, {"$set": fields}
+        )
+
+    async def iter_products_with_images(self) -> AsyncIterator[Mapping[str, Any]]:
+        """Yield products that have an image, without the image payload itself."""
+
+        cursor = self._collections.products.find(
+            {
+                "$or": [
+                    {"image_ref": {"$nin": ["", None]}},
+                    {"image_base64": {"$nin": ["", None]}},
+                ]
+            },
+            PRODUCT_DETAILS_PROJECTION,
+        ).sort("id", 1)
+        async for document in cursor:
+            yield document
+
+    async def iter_product_documents(
+        self, *, batch_size: int = 200
+    ) -> AsyncIterator[Mapping[str, Any]]:
+        """Yield every product with the fields used by the search and product cards."""
+
+        cursor = self._collections.products.find(
+            {}, {**PRODUCT_DETAILS_PROJECTION, "_id": 0}, batch_size=batch_size
+        )
+        async for document in cursor:
+            yield document
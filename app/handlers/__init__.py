@@ -1,6 +1,9 @@
 """Helpers for registering bot handlers."""
 from telegram.ext import Application
 
+from app.handlers.admin import register_admin_handlers
+from app.handlers.inline import register_inline_handlers
+from app.handlers.search import register_search_handlers
 from app.handlers.start import register_start_handlers
 
 __all__ = ["register_handlers"]
@@ -10,3 +13,6 @@ def register_handlers(application: Application) -> None:
     """Register all handlers used by the bot."""
 
     register_start_handlers(application)
+    register_admin_handlers(application)
+    register_inline_handlers(application)
+    register_search_handlers(application)
@@ -0,0 +1,114 @@
+"""Administrative commands of the bot."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Mapping, Optional
+
+from telegram import Message, Update
+from telegram.constants import ChatType
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from app.database.repository import CatalogRepository
+from app.handlers.media import cached_photo_file_id, send_product_photo
+
+logger = logging.getLogger(__name__)
+
+WARMUP_COMMAND = "warmup_photos"
+WARMUP_PRIVATE_ONLY_MESSAGE = "Команда доступна только в личном чате с ботом."
+WARMUP_STARTED_MESSAGE = "Загружаю фотографии каталога…"
+WARMUP_FINISHED_TEMPLATE = (
+    "Фотографии каталога загружены.\n"
+    "Загружено: {uploaded}, уже в кэше: {cached}, с ошибками: {failed}."
+)
+
+_WARMUP_MAX_ATTEMPTS = 3
+
+
+def _get_catalog(context: ContextTypes.DEFAULT_TYPE) -> CatalogRepository:
+    return context.application.bot_data["catalog"]
+
+
+async def _is_admin(context: ContextTypes.DEFAULT_TYPE, telegram_id: int) -> bool:
+    admins = _get_catalog(context).collections.admins
+    document = await admins.find_one({"telegram_id": telegram_id}, {"_id": 1})
+    return document is not None
+
+
+async def _upload_photo(
+    context: ContextTypes.DEFAULT_TYPE, chat_id: int, product: Mapping[str, Any]
+) -> Optional[Message]:
+    for attempt in range(1, _WARMUP_MAX_ATTEMPTS + 1):
+        try:
+            return await send_product_photo(
+                context.bot,
+                _get_catalog(context),
+                context.application.bot_data["images"],
+                chat_id,
+                product,
+                cards=context.application.bot_data["catalog_cache"].cards,
+                disable_notification=True,
+            )
+        except RetryAfter as exc:
+            if attempt == _WARMUP_MAX_ATTEMPTS:
+                raise
+            await asyncio.sleep(exc.retry_after)
+    return None
+
+
+async def warmup_photos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Upload every catalog image once so later views are sent by ``file_id``."""
+
+    message = update.effective_message
+    chat = update.effective_chat
+    user = update.effective_user
+    if message is None or chat is None or user is None:
+        return
+
+    if not await _is_admin(context, user.id):
+        return
+
+    if chat.type != ChatType.PRIVATE:
+        await message.reply_text(WARMUP_PRIVATE_ONLY_MESSAGE)
+        return
+
+    status = await message.reply_text(WARMUP_STARTED_MESSAGE)
+    uploaded = cached = failed = 0
+
+    async for product in _get_catalog(context).iter_products_with_images():
+        if cached_photo_file_id(product):
+            cached += 1
+            continue
+        try:
+            sent = await _upload_photo(context, chat.id, product)
+        except TelegramError as exc:
+            logger.warning(
+                "Не удалось загрузить фото продукта %s: %s", product.get("id"), exc
+            )
+            failed += 1
+            continue
+        if sent is None:
+            failed += 1
+            continue
+        uploaded += 1
+        try:
+            await sent.delete()
+        except TelegramError:
+            pass
+
+    logger.info(
+        "Прогрев фотографий завершён: загружено %s, в кэше %s, ошибок %s",
+        uploaded,
+        cached,
+        failed,
+    )
+    await status.edit_text(
+        WARMUP_FINISHED_TEMPLATE.format(uploaded=uploaded, cached=cached, failed=failed)
+    )
+
+
+def register_admin_handlers(application: Application) -> None:
+    """Register commands available to administrators."""
+
+    application.add_handler(CommandHandler(WARMUP_COMMAND, warmup_photos, block=False))
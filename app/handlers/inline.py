@@ -0,0 +1,150 @@
+"""Inline mode: product cards found by ``@bot <query>`` in any chat."""
+from __future__ import annotations
+
+import logging
+import time
+from typing import List
+
+from telegram import (
+    InlineQueryResult,
+    InlineQueryResultArticle,
+    InlineQueryResultCachedPhoto,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+    Update,
+)
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.ext import Application, ContextTypes, InlineQueryHandler
+
+from app.cards import ProductCard
+from app.config import Settings
+from app.database.catalog import CatalogCache
+from app.database.repository import CatalogRepository
+from app.handlers.media import cached_photo_file_id
+
+logger = logging.getLogger(__name__)
+
+# Telegram принимает не больше 50 результатов в одном ответе
+INLINE_RESULTS_LIMIT = 20
+INLINE_CATALOG_BUTTON_TEXT = "Открыть каталог в боте"
+INLINE_START_PARAMETER = "catalog"
+
+_MAX_QUERY_LENGTH = 64
+# Дальше этой позиции результаты не листаются: нужное уже должно найтись
+_MAX_OFFSET = 200
+
+
+def _parse_offset(offset: str) -> int:
+    try:
+        value = int(offset)
+    except (TypeError, ValueError):
+        return 0
+    return min(max(value, 0), _MAX_OFFSET)
+
+
+def _build_result(card: ProductCard) -> InlineQueryResult:
+    product_id = str(card.product_id)
+    name = card.name
+    caption = card.caption
+    code = str(card.product.get("code", "")).strip()
+    description = f"Артикул: {code}" if code else None
+
+    file_id = cached_photo_file_id(card.product)
+    if file_id:
+        return InlineQueryResultCachedPhoto(
+            product_id,
+            file_id,
+            title=name,
+            description=description,
+            caption=caption or None,
+            parse_mode=ParseMode.HTML,
+        )
+    # Без загруженного в Telegram фото отправляем карточку текстом
+    return InlineQueryResultArticle(
+        product_id,
+        title=name,
+        description=description,
+        input_message_content=InputTextMessageContent(
+            caption or name, parse_mode=ParseMode.HTML
+        ),
+    )
+
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Answer an inline query with product cards from the search index.
+
+    Results are ranked by the in-memory index and taken from the rendered
+    product cards; cards not rendered yet are fetched from MongoDB with one
+    query. Telegram caches answers for ``INLINE_CACHE_TIME`` seconds and
+    requests the next page with ``next_offset``.
+    """
+
+    query = update.inline_query
+    if query is None:
+        return
+
+    bot_data = context.application.bot_data
+    settings: Settings = bot_data["settings"]
+    cache: CatalogCache = bot_data["catalog_cache"]
+    text = " ".join(query.query.split())[:_MAX_QUERY_LENGTH]
+    offset = _parse_offset(query.offset)
+
+    results: List[InlineQueryResult] = []
+    next_offset = ""
+    cache_time = settings.inline_cache_time
+    if text and cache.search_ready:
+        started = time.perf_counter()
+        end = offset + INLINE_RESULTS_LIMIT
+        hits = cache.search_index.search(text, limit=end + 1)
+        page = hits[offset:end]
+        cards = [cache.cards.get(hit.product_id) for hit in page]
+        missing = [hit.product_id for hit, card in zip(page, cards) if card is None]
+        if missing:
+            # Карточки ещё не отрисованы в фоне: догружаем их одним запросом
+            catalog: CatalogRepository = bot_data["catalog"]
+            products = await catalog.get_products(missing)
+            for position, hit in enumerate(page):
+                if cards[position] is None and hit.product_id in products:
+                    cards[position] = cache.cards.put(products[hit.product_id])
+        results = [_build_result(card) for card in cards if card is not None]
+        if len(hits) > end and end < _MAX_OFFSET:
+            next_offset = str(end)
+        logger.debug(
+            "Inline-запрос «%s» (offset %s): %s результатов за %.2f мс",
+            text,
+            offset,
+            len(results),
+            (time.perf_counter() - started) * 1000,
+        )
+    elif text:
+        # Индекс ещё строится: пустой ответ не должен попасть в кэш Telegram
+        cache_time = 0
+
+    button = None
+    if offset == 0 and not results:
+        button = InlineQueryResultsButton(
+            INLINE_CATALOG_BUTTON_TEXT, start_parameter=INLINE_START_PARAMETER
+        )
+
+    try:
+        await query.answer(
+            results,
+            cache_time=cache_time,
+            is_personal=False,
+            next_offset=next_offset,
+            button=button,
+        )
+    except BadRequest as exc:
+        # Пользователь успел изменить запрос, и этот уже никому не нужен
+        logger.debug("Не удалось ответить на inline-запрос «%s»: %s", text, exc)
+
+
+def register_inline_handlers(application: Application) -> None:
+    """Register the inline query handler.
+
+    Inline mode must also be enabled for the bot with ``/setinline`` in
+    @BotFather.
+    """
+
+    application.add_handler(InlineQueryHandler(inline_query))
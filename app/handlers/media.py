@@ -0,0 +1,101 @@
+"""Sending product photos with Telegram ``file_id`` reuse."""
+from __future__ import annotations
+
+import base64
+import binascii
+import logging
+from typing import Any, Mapping, Optional
+
+from telegram import Bot, InputFile, Message
+from telegram.error import BadRequest
+
+from app.cards import ProductCardStore
+from app.database.images import ImageStore
+from app.database.products import image_hash
+from app.database.repository import CatalogRepository
+from app.tracing import span
+
+__all__ = ["cached_photo_file_id", "send_product_photo"]
+
+logger = logging.getLogger(__name__)
+
+
+def cached_photo_file_id(product: Mapping[str, Any]) -> Optional[str]:
+    """Return the stored ``file_id`` if it still matches the product image."""
+
+    file_id = str(product.get("telegram_file_id") or "").strip()
+    if not file_id:
+        return None
+    if product.get("telegram_file_hash") != product.get("image_hash"):
+        return None
+    return file_id
+
+
+def _decode_image(image_base64: str) -> bytes:
+    try:
+        return base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        return b""
+
+
+async def send_product_photo(
+    bot: Bot,
+    catalog: CatalogRepository,
+    images: ImageStore,
+    chat_id: int,
+    product: Mapping[str, Any],
+    *,
+    cards: Optional[ProductCardStore] = None,
+    **kwargs: Any,
+) -> Optional[Message]:
+    """Send the product photo, uploading it only when no valid ``file_id`` is known.
+
+    The image is read from ``images`` by the product ``image_ref`` or,
+    for documents not migrated yet, decoded from the inline base64 payload.
+    Returns ``None`` when the product has no usable image. The new
+    ``file_id`` is also written to the rendered card in ``cards``. Extra
+    keyword arguments are passed to :meth:`telegram.Bot.send_photo`.
+    """
+
+    product_id = int(product["id"])
+    file_id = cached_photo_file_id(product)
+    if file_id:
+        try:
+            return await bot.send_photo(chat_id, photo=file_id, **kwargs)
+        except BadRequest as exc:
+            logger.info(
+                "Сохранённый file_id продукта %s недействителен: %s", product_id, exc
+            )
+
+    image_ref = str(product.get("image_ref") or "").strip()
+    if image_ref:
+        with span("image.read", image_ref=image_ref):
+            content = await images.read(image_ref)
+        if content is None:
+            logger.warning(
+                "Изображение %s продукта %s не найдено в хранилище", image_ref, product_id
+            )
+            return None
+        photo = InputFile(content, filename=f"product_{product_id}.jpg")
+        uploaded_hash = image_ref
+    else:
+        image_base64 = await catalog.get_product_image(product_id)
+        with span("image.decode", size=len(image_base64)):
+            photo_bytes = _decode_image(image_base64)
+        if not photo_bytes:
+            return None
+        photo = InputFile(photo_bytes, filename=f"product_{product_id}.jpg")
+        uploaded_hash = image_hash(photo_bytes)
+
+    message = await bot.send_photo(chat_id, photo=photo, **kwargs)
+    if message.photo:
+        file_id = message.photo[-1].file_id
+        await catalog.remember_photo_file_id(
+            product_id,
+            file_id=file_id,
+            image_hash=uploaded_hash,
+            store_image_hash=uploaded_hash != product.get("image_hash"),
+        )
+        if cards is not None:
+            cards.remember_file_id(product_id, file_id=file_id, image_hash=uploaded_hash)
+    return message
@@ -0,0 +1,104 @@
+"""Product search by name, code and description."""
+from __future__ import annotations
+
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+
+from app.database.catalog import CatalogCache
+from app.handlers.start import show_menu
+from app.keyboards.main import BACK_BUTTON_KEYBOARD, build_search_results_keyboard
+
+logger = logging.getLogger(__name__)
+
+SEARCH_COMMAND = "search"
+SEARCH_RESULTS_LIMIT = 10
+SEARCH_USAGE_MESSAGE = (
+    "Напишите, что вы ищете: название, артикул или слово из описания.\n"
+    "Например: /search шампунь"
+)
+SEARCH_NOT_READY_MESSAGE = "Поиск ещё готовится, попробуйте через несколько секунд."
+SEARCH_RESULTS_TEMPLATE = "Результаты поиска по запросу «{query}»:"
+SEARCH_EMPTY_TEMPLATE = "По запросу «{query}» ничего не найдено."
+
+_MAX_QUERY_LENGTH = 64
+
+
+async def _run_search(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, query: str
+) -> None:
+    query = " ".join(query.split())[:_MAX_QUERY_LENGTH]
+    if not query:
+        await show_menu(
+            update,
+            context,
+            text=SEARCH_USAGE_MESSAGE,
+            reply_markup=BACK_BUTTON_KEYBOARD,
+            message_type="search",
+        )
+        return
+
+    cache: CatalogCache = context.application.bot_data["catalog_cache"]
+    if not cache.search_ready:
+        await show_menu(
+            update,
+            context,
+            text=SEARCH_NOT_READY_MESSAGE,
+            reply_markup=BACK_BUTTON_KEYBOARD,
+            message_type="search",
+        )
+        return
+
+    started = time.perf_counter()
+    hits = cache.search_index.search(query, limit=SEARCH_RESULTS_LIMIT)
+    logger.debug(
+        "Поиск «%s»: найдено %s за %.2f мс",
+        query,
+        len(hits),
+        (time.perf_counter() - started) * 1000,
+    )
+
+    template = SEARCH_RESULTS_TEMPLATE if hits else SEARCH_EMPTY_TEMPLATE
+    await show_menu(
+        update,
+        context,
+        text=template.format(query=query),
+        reply_markup=build_search_results_keyboard(
+            [(hit.product_id, hit.name, hit.brand_id, hit.category_id) for hit in hits]
+        ),
+        message_type="search",
+    )
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle ``/search <query>``."""
+
+    if update.effective_message is None:
+        return
+    await _run_search(update, context, " ".join(context.args or ()))
+
+
+async def search_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Treat any other text written in a private chat as a search query."""
+
+    message = update.effective_message
+    if message is None or not message.text:
+        return
+    await _run_search(update, context, message.text)
+
+
+def register_search_handlers(application: Application) -> None:
+    """Register the search command and free-text search.
+
+    Must be called after the other message handlers so that texts they handle
+    (such as the «Старт» button) are not treated as queries.
+    """
+
+    application.add_handler(CommandHandler(SEARCH_COMMAND, search_command))
+    application.add_handler(
+        MessageHandler(
+            filters.TEXT & ~filters.COMMAND & filters.ChatType.PRIVATE, search_text
+        )
+    )
@@ -1,41 +1,44 @@
 """Handlers for the bot start interaction."""
 from __future__ import annotations
 
-import base64
-import binascii
-import html
-import io
-from typing import List, Sequence, Tuple
-
-from telegram import InputFile, Message, Update
-from telegram.error import TelegramError
-from telegram.ext import (
-    Application,
-    CallbackQueryHandler,
-    CommandHandler,
-    ContextTypes,
-    MessageHandler,
-    filters,
-)
+import contextlib
+import logging
+from typing import AsyncIterator, Callable, Tuple
+
+from telegram import CallbackQuery, InlineKeyboardMarkup, InputMediaPhoto, Message, Update
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
 from telegram.constants import ParseMode
 
-from app.database import MongoCollections
+from app.background import BackgroundTasks
+from app.cards import ProductCard, ProductCardStore
+from app.config import NAVIGATION_MODE_EDIT, Settings
+from app.database.catalog import CatalogCache, CatalogSnapshot, Page
+from app.database.repository import CatalogRepository
+from app.handlers.media import cached_photo_file_id, send_product_photo
+from app.keyboards.cache import KeyboardCache
+from app.keyboards.callbacks import (
+    BrandSelected,
+    BrandsPage,
+    CategoriesBack,
+    CategorySelected,
+    GoBack,
+    OpenCatalog,
+    OpenHelp,
+    ProductSelected,
+    ProductsPage,
+)
 from app.keyboards.main import (
     BACK_BUTTON_KEYBOARD,
-    BACK_CALLBACK,
-    BRAND_CALLBACK_PREFIX,
-    CATALOG_CALLBACK,
-    CATEGORY_BACK_CALLBACK_PREFIX,
-    CATEGORY_CALLBACK_PREFIX,
-    HELP_CALLBACK,
     MAIN_MENU_KEYBOARD,
     build_brands_keyboard,
     build_categories_keyboard,
-    build_product_details_keyboard,
     build_products_keyboard,
-    PRODUCT_CALLBACK_PREFIX,
 )
+from app.routing import CallbackRouter
+
+logger = logging.getLogger(__name__)
 
 MAIN_MENU_MESSAGE = "Мы рады видеть вас в нашем онлайн помошнике по подбору косметики"
 CATALOG_MESSAGE = "Выберите бренд из списка ниже:"
@@ -57,8 +60,9 @@ async def _safe_delete_message(
 ) -> None:
     try:
         await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
-    except TelegramError:
-        pass
+    except TelegramError as exc:
+        # Сообщение могло быть удалено пользователем или устареть (старше 48 часов)
+        logger.debug("Не удалось удалить сообщение %s в чате %s: %s", message_id, chat_id, exc)
 
 
 def _is_start_trigger_message(message: Message | None) -> bool:
@@ -76,38 +80,68 @@ def _is_start_trigger_message(message: Message | None) -> bool:
     return normalized.startswith("/start") or normalized == "старт"
 
 
-async def _cleanup_previous_messages(
+def _take_stale_messages(
     update: Update, context: ContextTypes.DEFAULT_TYPE, *, delete_trigger: bool
-) -> None:
-    chat = update.effective_chat
-    if chat is None:
-        return
+) -> list[int]:
+    """Forget the previous bot menu and return ids of the messages to delete."""
 
     stored_id = context.user_data.pop(_LAST_BOT_MESSAGE_KEY, None)
     if stored_id is not None:
         context.user_data.pop(_LAST_BOT_MESSAGE_TYPE_KEY, None)
-    trigger_message_id = None
-
-    if stored_id is not None:
-        await _safe_delete_message(context, chat.id, stored_id)
-
-    trigger_message: Message | None = None
+    stale = [stored_id] if stored_id is not None else []
 
     if delete_trigger:
+        trigger_message: Message | None = None
         if update.message is not None:
             trigger_message = update.message
         elif update.callback_query is not None and update.callback_query.message:
             trigger_message = update.callback_query.message
 
-        if trigger_message is not None:
-            trigger_message_id = trigger_message.message_id
-
         if (
-            trigger_message_id is not None
-            and trigger_message_id != stored_id
+            trigger_message is not None
+            and trigger_message.message_id != stored_id
             and not _is_start_trigger_message(trigger_message)
         ):
-            await _safe_delete_message(context, chat.id, trigger_message_id)
+            stale.append(trigger_message.message_id)
+    return stale
+
+
+@contextlib.asynccontextmanager
+async def _replacing_previous_messages(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, *, delete_trigger: bool
+) -> AsyncIterator[None]:
+    """Delete the previous menu once the body has sent the new one.
+
+    The new message is sent first, so the user waits for one round trip; the
+    deletions run in the background, each as its own request.
+    """
+
+    chat = update.effective_chat
+    stale = _take_stale_messages(update, context, delete_trigger=delete_trigger)
+    try:
+        yield
+    finally:
+        if chat is not None:
+            background = _get_background(context)
+            for message_id in stale:
+                await background.spawn(
+                    _safe_delete_message(context, chat.id, message_id),
+                    name="deleteMessage",
+                )
+
+
+async def _safe_answer(query: CallbackQuery) -> None:
+    try:
+        await query.answer()
+    except TelegramError as exc:
+        # Запрос мог устареть, пока обновление ждало своей очереди
+        logger.debug("Не удалось ответить на callback-запрос %s: %s", query.id, exc)
+
+
+async def _acknowledge(context: ContextTypes.DEFAULT_TYPE, query: CallbackQuery) -> None:
+    """Answer the button press in the background, in parallel with the response."""
+
+    await _get_background(context).spawn(_safe_answer(query), name="answerCallbackQuery")
 
 
 def _store_last_message(
@@ -117,229 +151,373 @@ def _store_last_message(
     context.user_data[_LAST_BOT_MESSAGE_TYPE_KEY] = message_type
 
 
-def _get_mongo_collections(context: ContextTypes.DEFAULT_TYPE) -> MongoCollections:
-    return context.application.bot_data["mongo"]
+def _editable_message(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+) -> Message | None:
+    """Return the menu message the pressed button belongs to if it may be edited."""
 
+    settings: Settings = context.application.bot_data["settings"]
+    if settings.navigation_mode != NAVIGATION_MODE_EDIT:
+        return None
+
+    query = update.callback_query
+    if query is None or query.message is None:
+        return None
+
+    message = query.message
+    if message.message_id != context.user_data.get(_LAST_BOT_MESSAGE_KEY):
+        return None
+    return message
+
+
+async def _edit_message(
+    context: ContextTypes.DEFAULT_TYPE,
+    message: Message,
+    *,
+    text: str | None = None,
+    media: InputMediaPhoto | None = None,
+    reply_markup: InlineKeyboardMarkup | None = None,
+    parse_mode: str | None = None,
+) -> Message | None:
+    """Edit ``message`` in place returning ``None`` when it cannot be edited."""
+
+    try:
+        if media is not None:
+            edited = await context.bot.edit_message_media(
+                media,
+                chat_id=message.chat_id,
+                message_id=message.message_id,
+                reply_markup=reply_markup,
+            )
+        else:
+            edited = await context.bot.edit_message_text(
+                text or "",
+                chat_id=message.chat_id,
+                message_id=message.message_id,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+            )
+    except BadRequest as exc:
+        if "message is not modified" in exc.message.lower():
+            return message
+        return None
+    except TelegramError:
+        return None
+    return edited if isinstance(edited, Message) else message
+
+
+async def show_menu(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    *,
+    text: str,
+    reply_markup: InlineKeyboardMarkup,
+    message_type: str,
+    parse_mode: str | None = None,
+) -> None:
+    """Show a text menu editing the current one in place whenever possible."""
 
-async def _send_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat = update.effective_chat
     if chat is None:
         return
 
-    await _cleanup_previous_messages(update, context, delete_trigger=True)
-    message = await context.bot.send_message(
-        chat.id,
-        MAIN_MENU_MESSAGE,
-        reply_markup=MAIN_MENU_KEYBOARD,
-    )
-    _store_last_message(context, message, message_type="main_menu")
+    message: Message | None = None
+    editable = _editable_message(update, context)
+    # Сообщение с фото нельзя превратить в текстовое, его приходится пересоздавать
+    if editable is not None and not editable.photo:
+        message = await _edit_message(
+            context,
+            editable,
+            text=text,
+            reply_markup=reply_markup,
+            parse_mode=parse_mode,
+        )
+
+    if message is None:
+        async with _replacing_previous_messages(update, context, delete_trigger=False):
+            message = await context.bot.send_message(
+                chat.id,
+                text,
+                reply_markup=reply_markup,
+                parse_mode=parse_mode,
+            )
+    _store_last_message(context, message, message_type=message_type)
 
 
-def _load_brands(context: ContextTypes.DEFAULT_TYPE) -> Sequence[Tuple[int, str]]:
-    mongo = _get_mongo_collections(context)
-    cursor = mongo.brands.find({}, {"id": 1, "name": 1}).sort("name", 1)
-    brands: List[Tuple[int, str]] = []
-    for document in cursor:
-        try:
-            brand_id = int(document.get("id"))
-        except (TypeError, ValueError):
-            continue
-        name = str(document.get("name", "")).strip()
-        if not name:
-            continue
-        brands.append((brand_id, name))
-    return brands
-
-
-def _load_categories(context: ContextTypes.DEFAULT_TYPE) -> Sequence[Tuple[int, str]]:
-    mongo = _get_mongo_collections(context)
-    cursor = mongo.categories.find({}, {"id": 1, "name": 1}).sort("name", 1)
-    categories: List[Tuple[int, str]] = []
-    for document in cursor:
-        try:
-            category_id = int(document.get("id"))
-        except (TypeError, ValueError):
-            continue
-        name = str(document.get("name", "")).strip()
-        if not name:
-            continue
-        categories.append((category_id, name))
-
-    # Переносим категорию «прочее» в конец списка независимо от алфавитного порядка
-    categories.sort(
-        key=lambda item: (item[1].strip().lower() == "прочее", item[1].strip().lower())
-    )
-    return categories
-
-
-def _load_products(
-    context: ContextTypes.DEFAULT_TYPE, *, brand_id: int, category_id: int
-) -> Sequence[Tuple[int, str]]:
-    mongo = _get_mongo_collections(context)
-    cursor = mongo.products.find(
-        {"brand_id": brand_id, "category_id": category_id},
-        {"id": 1, "name": 1},
-    ).sort("name", 1)
-    products: List[Tuple[int, str]] = []
-    for document in cursor:
-        try:
-            product_id = int(document.get("id"))
-        except (TypeError, ValueError):
-            continue
-        name = str(document.get("name", "")).strip()
-        if not name:
-            continue
-        products.append((product_id, name))
-    return products
+def _get_background(context: ContextTypes.DEFAULT_TYPE) -> BackgroundTasks:
+    return context.application.bot_data["background"]
+
+
+def _get_catalog(context: ContextTypes.DEFAULT_TYPE) -> CatalogRepository:
+    return context.application.bot_data["catalog"]
+
+
+async def _get_snapshot(context: ContextTypes.DEFAULT_TYPE) -> CatalogSnapshot:
+    cache: CatalogCache = context.application.bot_data["catalog_cache"]
+    return await cache.get()
+
+
+def _get_card_store(context: ContextTypes.DEFAULT_TYPE) -> ProductCardStore:
+    cache: CatalogCache = context.application.bot_data["catalog_cache"]
+    return cache.cards
+
+
+async def _get_product_card(
+    context: ContextTypes.DEFAULT_TYPE, product_id: int
+) -> ProductCard | None:
+    """Return the rendered card, loading the product only if it is not rendered yet."""
+
+    cards = _get_card_store(context)
+    card = cards.get(product_id)
+    if card is None:
+        # Карточки отрисовываются в фоне после обновления каталога
+        product = await _get_catalog(context).get_product(product_id)
+        if product:
+            card = cards.put(product)
+    return card
+
+
+def _cached_keyboard(
+    context: ContextTypes.DEFAULT_TYPE,
+    snapshot: CatalogSnapshot,
+    key: Tuple[object, ...],
+    build: Callable[[], InlineKeyboardMarkup],
+) -> InlineKeyboardMarkup:
+    """Return the keyboard built for ``key`` from the current catalog version."""
+
+    cache: KeyboardCache = context.application.bot_data["keyboards"]
+    return cache.get(snapshot.version, key, build)
+
+
+def _page_key(page: Page) -> Tuple[int | None, int]:
+    # В пределах одной версии каталога страница однозначно задаётся первым id и длиной
+    return (page.items[0][0] if page.items else None, len(page.items))
+
+
+def _page_size(context: ContextTypes.DEFAULT_TYPE) -> int:
+    settings: Settings = context.application.bot_data["settings"]
+    return settings.catalog_page_size
+
+
+async def _send_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    chat = update.effective_chat
+    if chat is None:
+        return
+
+    if update.callback_query is not None:
+        await show_menu(
+            update,
+            context,
+            text=MAIN_MENU_MESSAGE,
+            reply_markup=MAIN_MENU_KEYBOARD,
+            message_type="main_menu",
+        )
+        return
+
+    async with _replacing_previous_messages(update, context, delete_trigger=True):
+        message = await context.bot.send_message(
+            chat.id,
+            MAIN_MENU_MESSAGE,
+            reply_markup=MAIN_MENU_KEYBOARD,
+        )
+    _store_last_message(context, message, message_type="main_menu")
 
 
 async def _send_categories_menu(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
     *,
+    snapshot: CatalogSnapshot,
     brand_id: int,
     brand_name: str,
-    categories: Sequence[Tuple[int, str]],
 ) -> None:
-    await _cleanup_previous_messages(update, context, delete_trigger=False)
-
-    chat = update.effective_chat
-    if chat is None:
-        return
-
-    keyboard = build_categories_keyboard(categories, brand_id=brand_id)
-    message = await context.bot.send_message(
-        chat.id,
-        CATEGORIES_MESSAGE_TEMPLATE.format(brand=brand_name),
+    keyboard = _cached_keyboard(
+        context,
+        snapshot,
+        ("categories", brand_id),
+        lambda: build_categories_keyboard(
+            snapshot.categories_for(brand_id), brand_id=brand_id
+        ),
+    )
+    await show_menu(
+        update,
+        context,
+        text=CATEGORIES_MESSAGE_TEMPLATE.format(brand=brand_name),
         reply_markup=keyboard,
+        message_type=f"categories:{brand_id}",
     )
-    _store_last_message(context, message, message_type=f"categories:{brand_id}")
 
 
-async def _show_catalog(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _show_catalog(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: OpenCatalog
+) -> None:
     query = update.callback_query
     if query is None:
         return
-    await query.answer()
-
-    await _cleanup_previous_messages(update, context, delete_trigger=False)
+    await _acknowledge(context, query)
+    await _send_brands_menu(update, context)
 
-    chat = update.effective_chat
-    if chat is None:
-        return
 
-    brands = _load_brands(context)
-    keyboard = build_brands_keyboard(brands)
-    message = await context.bot.send_message(
-        chat.id,
-        CATALOG_MESSAGE,
+async def _send_brands_menu(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    *,
+    after: int | None = None,
+    before: int | None = None,
+) -> None:
+    snapshot = await _get_snapshot(context)
+    page = snapshot.brands_page(limit=_page_size(context), after=after, before=before)
+    keyboard = _cached_keyboard(
+        context,
+        snapshot,
+        ("brands", *_page_key(page)),
+        lambda: build_brands_keyboard(
+            page.items,
+            previous_anchor=page.previous_anchor,
+            next_anchor=page.next_anchor,
+        ),
+    )
+    await show_menu(
+        update,
+        context,
+        text=CATALOG_MESSAGE,
         reply_markup=keyboard,
+        message_type="catalog",
     )
-    _store_last_message(context, message, message_type="catalog")
 
 
-async def _show_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _brands_page(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: BrandsPage
+) -> None:
     query = update.callback_query
     if query is None:
         return
-    await query.answer()
 
-    await _cleanup_previous_messages(update, context, delete_trigger=False)
+    after, before = action.bounds
+    await _acknowledge(context, query)
+    await _send_brands_menu(update, context, after=after, before=before)
 
-    chat = update.effective_chat
-    if chat is None:
+
+async def _show_help(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: OpenHelp
+) -> None:
+    query = update.callback_query
+    if query is None:
         return
+    await _acknowledge(context, query)
 
-    message = await context.bot.send_message(
-        chat.id,
-        HELP_MESSAGE,
+    await show_menu(
+        update,
+        context,
+        text=HELP_MESSAGE,
         reply_markup=BACK_BUTTON_KEYBOARD,
+        message_type="help",
     )
-    _store_last_message(context, message, message_type="help")
 
 
-async def _go_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _go_back(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: GoBack
+) -> None:
     query = update.callback_query
     if query is not None:
-        await query.answer()
+        await _acknowledge(context, query)
     await _send_main_menu(update, context)
 
 
-async def _brand_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _brand_selected(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: BrandSelected
+) -> None:
     query = update.callback_query
-    if query is None or query.data is None:
-        return
-
-    try:
-        brand_id = int(query.data.split(":", 1)[1])
-    except (IndexError, ValueError):
-        await query.answer("Бренд не найден", show_alert=True)
+    if query is None:
         return
 
-    mongo = _get_mongo_collections(context)
-    brand = mongo.brands.find_one({"id": brand_id}, {"name": 1})
-    brand_name = str(brand.get("name")) if brand and brand.get("name") else None
+    brand_id = action.brand_id
+    snapshot = await _get_snapshot(context)
+    brand_name = snapshot.brand_names.get(brand_id)
     if not brand_name:
         await query.answer("Бренд не найден", show_alert=True)
         return
 
-    categories = _load_categories(context)
-    if not categories:
-        await query.answer("Категории не найдены", show_alert=True)
+    if not snapshot.categories_for(brand_id):
+        await query.answer("У этого бренда пока нет продуктов", show_alert=True)
         return
 
-    await query.answer()
+    await _acknowledge(context, query)
     await _send_categories_menu(
         update,
         context,
+        snapshot=snapshot,
         brand_id=brand_id,
         brand_name=brand_name,
-        categories=categories,
     )
 
 
-async def _category_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    if query is None or query.data is None:
-        return
-
-    data = query.data.split(":", 1)[1]
-    try:
-        brand_part, category_part = data.split(":", 1)
-        brand_id = int(brand_part)
-        category_id = int(category_part)
-    except (ValueError, IndexError):
-        await query.answer("Категория не найдена", show_alert=True)
-        return
+async def _category_selected(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: CategorySelected
+) -> None:
+    await _send_products_menu(
+        update, context, brand_id=action.brand_id, category_id=action.category_id
+    )
 
-    mongo = _get_mongo_collections(context)
-    brand = mongo.brands.find_one({"id": brand_id}, {"name": 1})
-    category = mongo.categories.find_one({"id": category_id}, {"name": 1})
 
-    brand_name = str(brand.get("name")) if brand and brand.get("name") else None
-    category_name = (
-        str(category.get("name")) if category and category.get("name") else None
+async def _products_page(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: ProductsPage
+) -> None:
+    after, before = action.bounds
+    await _send_products_menu(
+        update,
+        context,
+        brand_id=action.brand_id,
+        category_id=action.category_id,
+        after=after,
+        before=before,
     )
 
-    if not brand_name or not category_name:
-        await query.answer("Категория не найдена", show_alert=True)
-        return
 
-    products = _load_products(context, brand_id=brand_id, category_id=category_id)
+async def _send_products_menu(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    *,
+    brand_id: int,
+    category_id: int,
+    after: int | None = None,
+    before: int | None = None,
+) -> None:
+    query = update.callback_query
+    if query is None:
+        return
 
-    await query.answer()
+    snapshot = await _get_snapshot(context)
+    brand_name = snapshot.brand_names.get(brand_id)
+    category_name = snapshot.category_names.get(category_id)
 
-    chat = update.effective_chat
-    if chat is None:
+    if not brand_name or not category_name:
+        await query.answer("Категория не найдена", show_alert=True)
         return
 
-    await _cleanup_previous_messages(update, context, delete_trigger=False)
+    await _acknowledge(context, query)
 
-    keyboard = build_products_keyboard(
-        products, brand_id=brand_id, category_id=category_id
+    page = snapshot.products_page(
+        brand_id=brand_id,
+        category_id=category_id,
+        limit=_page_size(context),
+        after=after,
+        before=before,
+    )
+    keyboard = _cached_keyboard(
+        context,
+        snapshot,
+        ("products", brand_id, category_id, *_page_key(page)),
+        lambda: build_products_keyboard(
+            page.items,
+            brand_id=brand_id,
+            category_id=category_id,
+            previous_anchor=page.previous_anchor,
+            next_anchor=page.next_anchor,
+        ),
     )
 
-    if products:
+    if page.items:
         text = PRODUCTS_MESSAGE_TEMPLATE.format(
             brand=brand_name, category=category_name
         )
@@ -348,145 +526,101 @@ async def _category_selected(update: Update, context: ContextTypes.DEFAULT_TYPE)
             brand=brand_name, category=category_name
         )
 
-    message = await context.bot.send_message(
-        chat.id,
-        text,
-        reply_markup=keyboard,
-    )
-    _store_last_message(
+    await show_menu(
+        update,
         context,
-        message,
+        text=text,
+        reply_markup=keyboard,
         message_type=f"products:{brand_id}:{category_id}",
     )
 
 
-async def _categories_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _categories_back(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: CategoriesBack
+) -> None:
     query = update.callback_query
-    if query is None or query.data is None:
-        return
-
-    try:
-        brand_id = int(query.data.split(":", 1)[1])
-    except (IndexError, ValueError):
-        await query.answer("Бренд не найден", show_alert=True)
+    if query is None:
         return
 
-    mongo = _get_mongo_collections(context)
-    brand = mongo.brands.find_one({"id": brand_id}, {"name": 1})
-    brand_name = str(brand.get("name")) if brand and brand.get("name") else None
+    brand_id = action.brand_id
+    snapshot = await _get_snapshot(context)
+    brand_name = snapshot.brand_names.get(brand_id)
     if not brand_name:
         await query.answer("Бренд не найден", show_alert=True)
         return
 
-    categories = _load_categories(context)
-    if not categories:
-        await query.answer("Категории не найдены", show_alert=True)
+    if not snapshot.categories_for(brand_id):
+        await query.answer("У этого бренда пока нет продуктов", show_alert=True)
         return
 
-    await query.answer()
+    await _acknowledge(context, query)
     await _send_categories_menu(
         update,
         context,
+        snapshot=snapshot,
         brand_id=brand_id,
         brand_name=brand_name,
-        categories=categories,
     )
 
 
-async def _product_selected(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _product_selected(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, action: ProductSelected
+) -> None:
     query = update.callback_query
-    if query is None or query.data is None:
-        return
-
-    try:
-        data = query.data.split(":", 1)[1]
-        brand_part, category_part, product_part = data.split(":", 2)
-        brand_id = int(brand_part)
-        category_id = int(category_part)
-        product_id = int(product_part)
-    except (IndexError, ValueError):
-        await query.answer("Продукт не найден", show_alert=True)
+    if query is None:
         return
 
-    mongo = _get_mongo_collections(context)
-    product = mongo.products.find_one(
-        {"id": product_id},
-        {
-            "name": 1,
-            "code": 1,
-            "description": 1,
-            "link": 1,
-            "image_base64": 1,
-            "brand_id": 1,
-            "category_id": 1,
-        },
-    )
+    brand_id = action.brand_id
+    category_id = action.category_id
+    product_id = action.product_id
+    card = await _get_product_card(context, product_id)
 
-    if (
-        not product
-        or int(product.get("brand_id", -1)) != brand_id
-        or int(product.get("category_id", -1)) != category_id
-    ):
+    if card is None or card.brand_id != brand_id or card.category_id != category_id:
         await query.answer("Продукт не найден", show_alert=True)
         return
 
-    await query.answer()
+    await _acknowledge(context, query)
 
     chat = update.effective_chat
     if chat is None:
         return
 
-    await _cleanup_previous_messages(update, context, delete_trigger=False)
-
-    name = html.escape(str(product.get("name", "")).strip())
-    code = html.escape(str(product.get("code", "")).strip())
-    description = html.escape(str(product.get("description", "")).strip())
-    link = str(product.get("link", "")).strip()
-
-    caption_parts: list[str] = []
-    if name:
-        caption_parts.append(f"<b>{name}</b>")
-    if code:
-        caption_parts.extend(["", f"<i>Артикул: {code}</i>"])
-    if description:
-        caption_parts.extend(["", f"<blockquote>{description}</blockquote>"])
-    if link:
-        caption_parts.extend(
-            ["", f'<a href="{html.escape(link, quote=True)}">подробнее о продукте</a>']
-        )
-
-    caption = "\n".join(caption_parts) if caption_parts else ""
-
-    image_base64 = str(product.get("image_base64", "")).strip()
+    caption = card.caption
+    keyboard = card.keyboard
     message: Message | None = None
 
-    if image_base64:
-        try:
-            photo_bytes = base64.b64decode(image_base64)
-        except (binascii.Error, ValueError):
-            photo_bytes = b""
-        if photo_bytes:
-            photo_io = io.BytesIO(photo_bytes)
-            photo_io.name = f"product_{product_id}.jpg"
-            message = await context.bot.send_photo(
+    editable = _editable_message(update, context)
+    file_id = cached_photo_file_id(card.product)
+    if editable is not None and editable.photo and file_id:
+        message = await _edit_message(
+            context,
+            editable,
+            media=InputMediaPhoto(
+                file_id, caption=caption or None, parse_mode=ParseMode.HTML
+            ),
+            reply_markup=keyboard,
+        )
+
+    if message is None:
+        async with _replacing_previous_messages(update, context, delete_trigger=False):
+            message = await send_product_photo(
+                context.bot,
+                _get_catalog(context),
+                context.application.bot_data["images"],
                 chat.id,
-                photo=InputFile(photo_io),
+                card.product,
+                cards=_get_card_store(context),
                 caption=caption or None,
                 parse_mode=ParseMode.HTML,
-                reply_markup=build_product_details_keyboard(
-                    brand_id=brand_id, category_id=category_id
-                ),
+                reply_markup=keyboard,
             )
-
-    if message is None:
-        message = await context.bot.send_message(
-            chat.id,
-            caption or "Информация о продукте недоступна",
-            parse_mode=ParseMode.HTML,
-            reply_markup=build_product_details_keyboard(
-                brand_id=brand_id, category_id=category_id
-            ),
-        )
+            if message is None:
+                message = await context.bot.send_message(
+                    chat.id,
+                    caption or "Информация о продукте недоступна",
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=keyboard,
+                )
 
     _store_last_message(
         context,
@@ -511,35 +645,15 @@ def register_start_handlers(application: Application) -> None:
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.Regex("^Старт$"), start))
-    application.add_handler(
-        CallbackQueryHandler(_show_catalog, pattern=f"^{CATALOG_CALLBACK}$")
-    )
-    application.add_handler(
-        CallbackQueryHandler(_show_help, pattern=f"^{HELP_CALLBACK}$")
-    )
-    application.add_handler(
-        CallbackQueryHandler(_go_back, pattern=f"^{BACK_CALLBACK}$")
-    )
-    application.add_handler(
-        CallbackQueryHandler(
-            _brand_selected, pattern=f"^{BRAND_CALLBACK_PREFIX}\\d+$"
-        )
-    )
-    application.add_handler(
-        CallbackQueryHandler(
-            _category_selected,
-            pattern=f"^{CATEGORY_CALLBACK_PREFIX}\\d+:\\d+$",
-        )
-    )
-    application.add_handler(
-        CallbackQueryHandler(
-            _categories_back,
-            pattern=f"^{CATEGORY_BACK_CALLBACK_PREFIX}\\d+$",
-        )
-    )
-    application.add_handler(
-        CallbackQueryHandler(
-            _product_selected,
-            pattern=f"^{PRODUCT_CALLBACK_PREFIX}\\d+:\\d+:\\d+$",
-        )
-    )
+
+    router = CallbackRouter()
+    router.route(OpenCatalog, _show_catalog)
+    router.route(OpenHelp, _show_help)
+    router.route(GoBack, _go_back)
+    router.route(BrandsPage, _brands_page)
+    router.route(BrandSelected, _brand_selected)
+    router.route(CategorySelected, _category_selected)
+    router.route(ProductsPage, _products_page)
+    router.route(CategoriesBack, _categories_back)
+    router.route(ProductSelected, _product_selected)
+    application.add_handler(router)
@@ -0,0 +1,62 @@
+"""Memoization of inline keyboards between catalog updates."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from telegram import InlineKeyboardMarkup
+
+__all__ = ["KeyboardCache"]
+
+
+class KeyboardCache:
+    """LRU cache of ready :class:`InlineKeyboardMarkup` objects.
+
+    Entries are tied to the catalog snapshot version they were built from:
+    the first lookup with a newer version drops everything built earlier.
+    Markups are immutable, so one object is safely shared by all requests.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._items: OrderedDict[Hashable, InlineKeyboardMarkup] = OrderedDict()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(
+        self,
+        version: int,
+        key: Hashable,
+        build: Callable[[], InlineKeyboardMarkup],
+    ) -> InlineKeyboardMarkup:
+        """Return the cached keyboard for ``key`` building it on a miss."""
+
+        if version > self._version:
+            self._items.clear()
+            self._version = version
+        elif version < self._version:
+            # Обработчик ещё держит старый снимок: не кладём его клавиатуры в кэш
+            self.misses += 1
+            return build()
+
+        markup = self._items.get(key)
+        if markup is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return markup
+
+        self.misses += 1
+        markup = build()
+        self._items[key] = markup
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return markup
+
+    def clear(self) -> None:
+        """Drop every cached keyboard."""
+
+        self._items.clear()
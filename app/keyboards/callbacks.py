@@ -0,0 +1,263 @@
+"""Compact encoding of inline button ``callback_data``.
+
+Every button action is a small frozen dataclass. It is encoded as a
+one-character tag followed by its integer fields packed as unsigned varints
+in unpadded URL-safe base64, so even a product button with three large ids
+stays far below Telegram's 64 byte limit. Decoding looks the tag up in a
+table and unpacks the payload in one pass.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import dataclasses
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+__all__ = [
+    "BACK_CALLBACK",
+    "BRANDS_PAGE_CALLBACK_PREFIX",
+    "BRAND_CALLBACK_PREFIX",
+    "CALLBACK_DATA_MAX_LENGTH",
+    "CATALOG_CALLBACK",
+    "CATEGORY_BACK_CALLBACK_PREFIX",
+    "CATEGORY_CALLBACK_PREFIX",
+    "HELP_CALLBACK",
+    "PRODUCTS_PAGE_CALLBACK_PREFIX",
+    "PRODUCT_CALLBACK_PREFIX",
+    "BrandSelected",
+    "BrandsPage",
+    "CategoriesBack",
+    "CategorySelected",
+    "GoBack",
+    "OpenCatalog",
+    "OpenHelp",
+    "ProductSelected",
+    "ProductsPage",
+    "decode_callback",
+    "encode_callback",
+]
+
+CALLBACK_DATA_MAX_LENGTH = 64
+
+# Теги кнопок; base64 не содержит ":", поэтому старый текстовый формат не путается с новым
+CATALOG_CALLBACK_PREFIX = "c"
+HELP_CALLBACK_PREFIX = "h"
+BACK_CALLBACK_PREFIX = "m"
+BRAND_CALLBACK_PREFIX = "b"
+BRANDS_PAGE_CALLBACK_PREFIX = "B"
+CATEGORY_CALLBACK_PREFIX = "k"
+CATEGORY_BACK_CALLBACK_PREFIX = "K"
+PRODUCTS_PAGE_CALLBACK_PREFIX = "P"
+PRODUCT_CALLBACK_PREFIX = "p"
+
+_T = TypeVar("_T")
+
+_TYPES: Dict[str, type] = {}
+_TAGS: Dict[type, str] = {}
+# Для каждого типа: имена полей в порядке объявления и их конструкторы из int
+_FIELDS: Dict[type, Tuple[Tuple[str, Callable[[int], object]], ...]] = {}
+
+
+def _callback(tag: str) -> Callable[[Type[_T]], Type[_T]]:
+    def register(cls: Type[_T]) -> Type[_T]:
+        if tag in _TYPES:
+            raise ValueError(f"callback tag {tag!r} is already used by {_TYPES[tag].__name__}")
+        _TYPES[tag] = cls
+        _TAGS[cls] = tag
+        _FIELDS[cls] = tuple(
+            (item.name, bool if item.type == "bool" else int)
+            for item in dataclasses.fields(cls)
+        )
+        return cls
+
+    return register
+
+
+@_callback(CATALOG_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class OpenCatalog:
+    """Show the first page of brands."""
+
+
+@_callback(HELP_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class OpenHelp:
+    """Show the help message."""
+
+
+@_callback(BACK_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class GoBack:
+    """Return to the main menu."""
+
+
+@_callback(BRAND_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class BrandSelected:
+    """Show the categories of a brand."""
+
+    brand_id: int
+
+
+@_callback(BRANDS_PAGE_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class BrandsPage:
+    """Switch the brands page after (``forward``) or before ``anchor``."""
+
+    anchor: int
+    forward: bool
+
+    @property
+    def bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        """Return ``(after, before)`` for the page query."""
+
+        return (self.anchor, None) if self.forward else (None, self.anchor)
+
+
+@_callback(CATEGORY_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class CategorySelected:
+    """Show the first page of products of a brand category."""
+
+    brand_id: int
+    category_id: int
+
+
+@_callback(CATEGORY_BACK_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class CategoriesBack:
+    """Return from the product list to the categories of a brand."""
+
+    brand_id: int
+
+
+@_callback(PRODUCTS_PAGE_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class ProductsPage:
+    """Switch the products page after (``forward``) or before ``anchor``."""
+
+    brand_id: int
+    category_id: int
+    anchor: int
+    forward: bool
+
+    @property
+    def bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        """Return ``(after, before)`` for the page query."""
+
+        return (self.anchor, None) if self.forward else (None, self.anchor)
+
+
+@_callback(PRODUCT_CALLBACK_PREFIX)
+@dataclass(frozen=True, slots=True)
+class ProductSelected:
+    """Show the card of a product opened from a brand category."""
+
+    brand_id: int
+    category_id: int
+    product_id: int
+
+
+def _pack(values: List[int]) -> str:
+    buffer = bytearray()
+    for value in values:
+        if value < 0:
+            raise ValueError(f"callback values must not be negative: {value}")
+        while value > 0x7F:
+            buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        buffer.append(value)
+    return base64.urlsafe_b64encode(bytes(buffer)).rstrip(b"=").decode("ascii")
+
+
+def _unpack(payload: str) -> List[int]:
+    raw = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+    values: List[int] = []
+    value = shift = 0
+    for byte in raw:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    if shift:
+        raise ValueError("truncated callback payload")
+    return values
+
+
+def encode_callback(data: object) -> str:
+    """Return ``callback_data`` for a button performing ``data``."""
+
+    cls = type(data)
+    tag = _TAGS[cls]
+    values = [int(getattr(data, name)) for name, _ in _FIELDS[cls]]
+    encoded = tag + _pack(values) if values else tag
+    if len(encoded.encode("utf-8")) > CALLBACK_DATA_MAX_LENGTH:
+        raise ValueError(f"callback data is too long: {encoded!r}")
+    return encoded
+
+
+# Кнопки, отправленные до перехода на компактный формат, остаются в истории чатов
+_LEGACY_CONSTANTS: Dict[str, object] = {
+    "main:catalog": OpenCatalog(),
+    "main:help": OpenHelp(),
+    "main:back": GoBack(),
+}
+_LEGACY_PREFIXES: Dict[str, type] = {
+    "brand": BrandSelected,
+    "brands_page": BrandsPage,
+    "category": CategorySelected,
+    "categories_back": CategoriesBack,
+    "products_page": ProductsPage,
+    "product": ProductSelected,
+}
+
+
+def _decode_legacy(data: str) -> Optional[object]:
+    constant = _LEGACY_CONSTANTS.get(data)
+    if constant is not None:
+        return constant
+    prefix, _, rest = data.partition(":")
+    cls = _LEGACY_PREFIXES.get(prefix)
+    if cls is None:
+        return None
+    parts = rest.split(":")
+    values: List[object] = []
+    if cls in (BrandsPage, ProductsPage):
+        # Последняя часть — направление и якорь страницы, например "n42"
+        anchor = parts.pop()
+        if anchor[:1] not in ("n", "p"):
+            return None
+        values = [*map(int, parts), int(anchor[1:]), anchor[:1] == "n"]
+    else:
+        values = [int(part) for part in parts]
+    if len(values) != len(_FIELDS[cls]):
+        return None
+    return cls(*values)
+
+
+def decode_callback(data: Optional[str]) -> Optional[object]:
+    """Return the action encoded in ``callback_data`` or ``None`` if it is unknown."""
+
+    if not data:
+        return None
+    try:
+        if ":" in data:
+            return _decode_legacy(data)
+        cls = _TYPES.get(data[0])
+        if cls is None:
+            return None
+        fields = _FIELDS[cls]
+        values = _unpack(data[1:]) if len(data) > 1 else []
+        if len(values) != len(fields):
+            return None
+        return cls(*(convert(value) for (_, convert), value in zip(fields, values)))
+    except (ValueError, binascii.Error):
+        return None
+
+
+CATALOG_CALLBACK = encode_callback(OpenCatalog())
+HELP_CALLBACK = encode_callback(OpenHelp())
+BACK_CALLBACK = encode_callback(GoBack())
@@ -1,17 +1,47 @@
 """Definitions of inline keyboards used by the bot."""
 from __future__ import annotations
 
-from typing import Sequence, Tuple
+from typing import Callable, Optional, Sequence, Tuple
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-CATALOG_CALLBACK = "main:catalog"
-HELP_CALLBACK = "main:help"
-BACK_CALLBACK = "main:back"
-BRAND_CALLBACK_PREFIX = "brand:"
-CATEGORY_CALLBACK_PREFIX = "category:"
-CATEGORY_BACK_CALLBACK_PREFIX = "categories_back:"
-PRODUCT_CALLBACK_PREFIX = "product:"
+from app.keyboards.callbacks import (
+    BACK_CALLBACK,
+    BRAND_CALLBACK_PREFIX,
+    BRANDS_PAGE_CALLBACK_PREFIX,
+    CATALOG_CALLBACK,
+    CATEGORY_BACK_CALLBACK_PREFIX,
+    CATEGORY_CALLBACK_PREFIX,
+    HELP_CALLBACK,
+    PRODUCT_CALLBACK_PREFIX,
+    PRODUCTS_PAGE_CALLBACK_PREFIX,
+    BrandSelected,
+    BrandsPage,
+    CategoriesBack,
+    CategorySelected,
+    ProductSelected,
+    ProductsPage,
+    encode_callback,
+)
+
+__all__ = [
+    "BACK_BUTTON_KEYBOARD",
+    "BACK_CALLBACK",
+    "BRAND_CALLBACK_PREFIX",
+    "BRANDS_PAGE_CALLBACK_PREFIX",
+    "CATALOG_CALLBACK",
+    "CATEGORY_BACK_CALLBACK_PREFIX",
+    "CATEGORY_CALLBACK_PREFIX",
+    "HELP_CALLBACK",
+    "MAIN_MENU_KEYBOARD",
+    "PRODUCT_CALLBACK_PREFIX",
+    "PRODUCTS_PAGE_CALLBACK_PREFIX",
+    "build_brands_keyboard",
+    "build_categories_keyboard",
+    "build_product_details_keyboard",
+    "build_products_keyboard",
+    "build_search_results_keyboard",
+]
 
 MAIN_MENU_KEYBOARD = InlineKeyboardMarkup(
     [
@@ -27,60 +57,109 @@ BACK_BUTTON_KEYBOARD = InlineKeyboardMarkup(
 )
 
 
-def build_brands_keyboard(brands: Sequence[Tuple[int, str]]) -> InlineKeyboardMarkup:
-    """Return an inline keyboard with a button for every provided brand."""
+def _pagination_row(
+    page: Callable[[int, bool], object],
+    *,
+    previous_anchor: Optional[int],
+    next_anchor: Optional[int],
+) -> list[InlineKeyboardButton]:
+    """Return the row of page switching buttons, empty when there is one page.
+
+    ``page(anchor, forward)`` builds the action of a button.
+    """
+
+    row: list[InlineKeyboardButton] = []
+    if previous_anchor is not None:
+        row.append(
+            InlineKeyboardButton(
+                "◀️", callback_data=encode_callback(page(previous_anchor, False))
+            )
+        )
+    if next_anchor is not None:
+        row.append(
+            InlineKeyboardButton("▶️", callback_data=encode_callback(page(next_anchor, True)))
+        )
+    return row
+
+
+def build_brands_keyboard(
+    brands: Sequence[Tuple[int, str]],
+    *,
+    previous_anchor: Optional[int] = None,
+    next_anchor: Optional[int] = None,
+) -> InlineKeyboardMarkup:
+    """Return an inline keyboard with a button for every brand of the page."""
 
     rows: list[list[InlineKeyboardButton]] = [
         [
             InlineKeyboardButton(
-                name, callback_data=f"{BRAND_CALLBACK_PREFIX}{brand_id}"
+                name, callback_data=encode_callback(BrandSelected(brand_id))
             )
         ]
         for brand_id, name in brands
     ]
+    pagination = _pagination_row(
+        BrandsPage,
+        previous_anchor=previous_anchor,
+        next_anchor=next_anchor,
+    )
+    if pagination:
+        rows.append(pagination)
     rows.append([InlineKeyboardButton("⬅️ НАЗАД", callback_data=BACK_CALLBACK)])
     return InlineKeyboardMarkup(rows)
 
 
 def build_categories_keyboard(
-    categories: Sequence[Tuple[int, str]], *, brand_id: int
+    categories: Sequence[Tuple[int, str, int]], *, brand_id: int
 ) -> InlineKeyboardMarkup:
-    """Return an inline keyboard with a button for each category."""
+    """Return an inline keyboard with a button for each category and its product count."""
 
     rows: list[list[InlineKeyboardButton]] = [
         [
             InlineKeyboardButton(
-                name,
-                callback_data=f"{CATEGORY_CALLBACK_PREFIX}{brand_id}:{category_id}",
+                f"{name} ({count})",
+                callback_data=encode_callback(CategorySelected(brand_id, category_id)),
             )
         ]
-        for category_id, name in categories
+        for category_id, name, count in categories
     ]
     rows.append([InlineKeyboardButton("⬅️ НАЗАД", callback_data=CATALOG_CALLBACK)])
     return InlineKeyboardMarkup(rows)
 
 
 def build_products_keyboard(
-    products: Sequence[Tuple[int, str]], *, brand_id: int, category_id: int
+    products: Sequence[Tuple[int, str]],
+    *,
+    brand_id: int,
+    category_id: int,
+    previous_anchor: Optional[int] = None,
+    next_anchor: Optional[int] = None,
 ) -> InlineKeyboardMarkup:
-    """Return an inline keyboard with a button for each product."""
+    """Return an inline keyboard with a button for each product of the page."""
 
     rows: list[list[InlineKeyboardButton]] = [
         [
             InlineKeyboardButton(
                 name,
-                callback_data=(
-                    f"{PRODUCT_CALLBACK_PREFIX}{brand_id}:{category_id}:{product_id}"
+                callback_data=encode_callback(
+                    ProductSelected(brand_id, category_id, product_id)
                 ),
             )
         ]
         for product_id, name in products
     ]
+    pagination = _pagination_row(
+        lambda anchor, forward: ProductsPage(brand_id, category_id, anchor, forward),
+        previous_anchor=previous_anchor,
+        next_anchor=next_anchor,
+    )
+    if pagination:
+        rows.append(pagination)
     rows.append(
         [
             InlineKeyboardButton(
                 "⬅️ НАЗАД",
-                callback_data=f"{CATEGORY_BACK_CALLBACK_PREFIX}{brand_id}",
+                callback_data=encode_callback(CategoriesBack(brand_id)),
             )
         ]
     )
@@ -97,10 +176,30 @@ def build_product_details_keyboard(
             [
                 InlineKeyboardButton(
                     "⬅️ НАЗАД",
-                    callback_data=(
-                        f"{CATEGORY_CALLBACK_PREFIX}{brand_id}:{category_id}"
+                    callback_data=encode_callback(
+                        CategorySelected(brand_id, category_id)
                     ),
                 )
             ]
         ]
     )
+
+
+def build_search_results_keyboard(
+    results: Sequence[Tuple[int, str, int, int]]
+) -> InlineKeyboardMarkup:
+    """Return a keyboard with a button for every product found by the search."""
+
+    rows: list[list[InlineKeyboardButton]] = [
+        [
+            InlineKeyboardButton(
+                name,
+                callback_data=encode_callback(
+                    ProductSelected(brand_id, category_id, product_id)
+                ),
+            )
+        ]
+        for product_id, name, brand_id, category_id in results
+    ]
+    rows.append([InlineKeyboardButton("⬅️ НАЗАД", callback_data=BACK_CALLBACK)])
+    return InlineKeyboardMarkup(rows)
@@ -0,0 +1,363 @@
+"""Prometheus metrics of handlers, MongoDB, the Bot API and in-process caches."""
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, Coroutine, Dict, Iterator, Optional, Tuple, Union
+
+from aiohttp import web
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.exposition import CONTENT_TYPE_LATEST
+from pymongo import monitoring
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from app.background import BackgroundTasks
+from app.concurrency import PerChatUpdateProcessor
+from app.config import Settings
+from app.ratelimit import TokenBucketRateLimiter
+from app.routing import wrap_handler_callbacks
+from app.tracing import span
+
+__all__ = [
+    "METRICS_PATH",
+    "BotStatsCollector",
+    "InstrumentedRequest",
+    "MetricsServer",
+    "MongoCommandMetrics",
+    "create_metrics_server",
+    "instrument_handlers",
+]
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = "/metrics"
+
+# Границы подобраны под обработчики и запросы длительностью от миллисекунд до секунд
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds",
+    "Time spent in update handler callbacks.",
+    ["handler"],
+    buckets=_LATENCY_BUCKETS,
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total",
+    "Update handler callbacks that raised an exception.",
+    ["handler"],
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "bot_mongo_command_duration_seconds",
+    "Duration of MongoDB commands reported by pymongo command monitoring.",
+    ["collection", "command"],
+    buckets=_LATENCY_BUCKETS,
+)
+MONGO_COMMAND_ERRORS = Counter(
+    "bot_mongo_command_errors_total",
+    "MongoDB commands that failed.",
+    ["collection", "command"],
+)
+TELEGRAM_REQUEST_DURATION = Histogram(
+    "bot_telegram_request_duration_seconds",
+    "Duration of Bot API HTTP requests.",
+    ["method"],
+    buckets=_LATENCY_BUCKETS,
+)
+TELEGRAM_REQUEST_ERRORS = Counter(
+    "bot_telegram_request_errors_total",
+    "Bot API requests answered with an error status or failed in transport.",
+    ["method", "error"],
+)
+
+
+def _timed(
+    name: str, callback: Callable[..., Coroutine[Any, Any, Any]]
+) -> Callable[..., Coroutine[Any, Any, Any]]:
+    duration = HANDLER_DURATION.labels(name)
+    errors = HANDLER_ERRORS.labels(name)
+
+    @functools.wraps(callback)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+
+    wrapper.__metrics_timed__ = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+def instrument_handlers(application: Application) -> None:
+    """Measure the duration of every registered handler callback.
+
+    Must be called after all handlers have been added.
+    """
+
+    def wrap(
+        name: str, callback: Callable[..., Coroutine[Any, Any, Any]]
+    ) -> Callable[..., Coroutine[Any, Any, Any]]:
+        if getattr(callback, "__metrics_timed__", False):
+            return callback
+        return _timed(name, callback)
+
+    wrap_handler_callbacks(application, wrap)
+
+
+_CommandEvent = Union[
+    monitoring.CommandStartedEvent,
+    monitoring.CommandSucceededEvent,
+    monitoring.CommandFailedEvent,
+]
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener recording command durations per collection.
+
+    Only the started event names the collection, so it is remembered by
+    request id until the command completes.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[Tuple[Any, int], str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event: _CommandEvent) -> Tuple[Any, int]:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else ""
+        with self._lock:
+            self._pending[self._key(event)] = collection
+
+    def _finish(self, event: _CommandEvent) -> str:
+        with self._lock:
+            return self._pending.pop(self._key(event), "")
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        collection = self._finish(event)
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(
+            event.duration_micros / 1_000_000
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        collection = self._finish(event)
+        MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(
+            event.duration_micros / 1_000_000
+        )
+        MONGO_COMMAND_ERRORS.labels(collection, event.command_name).inc()
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """:class:`HTTPXRequest` recording duration and errors of every Bot API call.
+
+    Time spent waiting in the rate limiter is not included. Inside a traced
+    update every call also gets its own span.
+    """
+
+    async def do_request(
+        self, url: str, method: str, *args: Any, **kwargs: Any
+    ) -> Tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            with span(f"telegram.{endpoint}") as request_span:
+                code, payload = await super().do_request(url, method, *args, **kwargs)
+                if request_span is not None:
+                    request_span.attributes["http.status_code"] = code
+        except Exception as exc:
+            TELEGRAM_REQUEST_ERRORS.labels(endpoint, type(exc).__name__).inc()
+            raise
+        finally:
+            TELEGRAM_REQUEST_DURATION.labels(endpoint).observe(time.perf_counter() - started)
+        if code >= 400:
+            TELEGRAM_REQUEST_ERRORS.labels(endpoint, str(code)).inc()
+        return code, payload
+
+
+class BotStatsCollector:
+    """Collector exposing counters that the bot components keep themselves.
+
+    The values are read on every scrape, so the hot paths only increment plain
+    attributes.
+    """
+
+    def __init__(self, application: Application) -> None:
+        self._application = application
+
+    def collect(self) -> Iterator[Metric]:
+        application = self._application
+        yield GaugeMetricFamily(
+            "bot_update_queue_size",
+            "Updates received but not yet taken by the application.",
+            value=application.update_queue.qsize(),
+        )
+
+        processor = application.update_processor
+        if isinstance(processor, PerChatUpdateProcessor):
+            stats = processor.stats
+            yield GaugeMetricFamily(
+                "bot_updates_waiting",
+                "Updates waiting for their chat or for a free processing slot.",
+                value=stats.queue_depth,
+            )
+            yield GaugeMetricFamily(
+                "bot_updates_in_progress",
+                "Updates being processed right now.",
+                value=stats.in_progress,
+            )
+            yield CounterMetricFamily(
+                "bot_updates_processed",
+                "Updates processed since start.",
+                value=stats.finished,
+            )
+            yield CounterMetricFamily(
+                "bot_update_wait_seconds",
+                "Total time updates spent waiting for processing.",
+                value=stats.total_wait,
+            )
+
+        background = application.bot_data.get("background")
+        if isinstance(background, BackgroundTasks):
+            yield GaugeMetricFamily(
+                "bot_background_tasks_pending",
+                "Background Bot API calls still running.",
+                value=background.stats.pending,
+            )
+            yield CounterMetricFamily(
+                "bot_background_tasks_failed",
+                "Background Bot API calls that raised an exception.",
+                value=background.stats.failed,
+            )
+
+        rate_limiter = application.bot.rate_limiter
+        if isinstance(rate_limiter, TokenBucketRateLimiter):
+            stats = rate_limiter.stats
+            yield CounterMetricFamily(
+                "bot_rate_limiter_throttled",
+                "Bot API requests delayed by the rate limiter.",
+                value=stats.throttled,
+            )
+            yield CounterMetricFamily(
+                "bot_rate_limiter_throttled_seconds",
+                "Total delay added by the rate limiter.",
+                value=stats.throttled_seconds,
+            )
+            yield CounterMetricFamily(
+                "bot_rate_limiter_retried",
+                "Bot API requests retried after RetryAfter.",
+                value=stats.retried,
+            )
+
+        hits = CounterMetricFamily(
+            "bot_cache_hits", "Lookups served from an in-process cache.", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "bot_cache_misses", "Lookups missing an in-process cache.", labels=["cache"]
+        )
+        bot_data = application.bot_data
+        caches = {"keyboards": bot_data.get("keyboards")}
+        catalog_cache = bot_data.get("catalog_cache")
+        if catalog_cache is not None:
+            caches["product_cards"] = catalog_cache.cards
+            yield GaugeMetricFamily(
+                "bot_search_index_products",
+                "Products in the in-memory search index.",
+                value=len(catalog_cache.search_index),
+            )
+        for name, cache in caches.items():
+            if cache is not None:
+                hits.add_metric([name], cache.hits)
+                misses.add_metric([name], cache.misses)
+        yield hits
+        yield misses
+
+
+_REGISTRY_KEY = web.AppKey("registry", CollectorRegistry)
+
+
+async def _serve_metrics(request: web.Request) -> web.Response:
+    registry = request.app[_REGISTRY_KEY]
+    return web.Response(
+        body=generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+class MetricsServer:
+    """Local HTTP server answering ``GET /metrics`` in the Prometheus text format."""
+
+    def __init__(
+        self,
+        application: Application,
+        *,
+        listen: str,
+        port: int,
+        registry: CollectorRegistry = REGISTRY,
+    ) -> None:
+        self._listen = listen
+        self._port = port
+        self._registry = registry
+        self._collector = BotStatsCollector(application)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        """Register the bot collector and start listening.
+
+        If the port cannot be bound (for example another replica on the same
+        host already uses it) the error is logged and the bot runs without
+        metrics.
+        """
+
+        if self._runner is not None:
+            return
+        web_app = web.Application()
+        web_app[_REGISTRY_KEY] = self._registry
+        web_app.router.add_get(METRICS_PATH, _serve_metrics)
+        runner = web.AppRunner(web_app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self._listen, self._port).start()
+        except OSError as exc:
+            await runner.cleanup()
+            logger.error(
+                "Не удалось запустить сервер метрик на %s:%s, бот работает без метрик: %s",
+                self._listen,
+                self._port,
+                exc,
+            )
+            return
+        self._registry.register(self._collector)  # type: ignore[arg-type]
+        self._runner = runner
+        logger.info(
+            "Метрики доступны на http://%s:%s%s", self._listen, self._port, METRICS_PATH
+        )
+
+    async def stop(self) -> None:
+        """Stop the server and unregister the bot collector."""
+
+        if self._runner is None:
+            return
+        await self._runner.cleanup()
+        self._runner = None
+        self._registry.unregister(self._collector)  # type: ignore[arg-type]
+
+
+def create_metrics_server(
+    application: Application, settings: Settings
+) -> Optional[MetricsServer]:
+    """Return the server configured by ``METRICS_*`` or ``None`` if metrics are off."""
+
+    if not settings.metrics_port:
+        return None
+    return MetricsServer(
+        application, listen=settings.metrics_listen, port=settings.metrics_port
+    )
@@ -0,0 +1,351 @@
+"""Shared storage of per-user navigation state for :mod:`telegram.ext`."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from telegram.ext import Application, BasePersistence, PersistenceInput
+
+from app.config import (
+    PERSISTENCE_BACKEND_MEMORY,
+    PERSISTENCE_BACKEND_REDIS,
+    Settings,
+)
+from app.database import AsyncMongoCollections
+
+__all__ = [
+    "InMemoryUserDataStore",
+    "MongoUserDataStore",
+    "NavigationPersistence",
+    "RedisUserDataStore",
+    "UserDataStore",
+    "create_persistence",
+]
+
+logger = logging.getLogger(__name__)
+
+UserData = Dict[str, Any]
+
+
+class UserDataStore(ABC):
+    """Backend holding ``user_data`` of every user with idle expiry."""
+
+    def __init__(self, *, ttl: float) -> None:
+        self.ttl = ttl
+
+    async def initialize(self) -> None:
+        """Prepare the backend before the first request."""
+
+    @abstractmethod
+    async def load(self, user_id: int) -> Optional[UserData]:
+        """Return the stored data or ``None`` if it is missing or expired."""
+
+    @abstractmethod
+    async def save_many(self, items: Mapping[int, UserData]) -> None:
+        """Store data of several users in one round trip."""
+
+    @abstractmethod
+    async def delete(self, user_id: int) -> None:
+        """Forget the data of the user."""
+
+    async def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+class InMemoryUserDataStore(UserDataStore):
+    """Process-local store used in tests and single-instance deployments."""
+
+    def __init__(self, *, ttl: float) -> None:
+        super().__init__(ttl=ttl)
+        self._items: Dict[int, tuple[float, UserData]] = {}
+
+    async def load(self, user_id: int) -> Optional[UserData]:
+        item = self._items.get(user_id)
+        if item is None:
+            return None
+        expires_at, data = item
+        if expires_at <= time.monotonic():
+            del self._items[user_id]
+            return None
+        return json.loads(json.dumps(data))
+
+    async def save_many(self, items: Mapping[int, UserData]) -> None:
+        expires_at = time.monotonic() + self.ttl
+        for user_id, data in items.items():
+            self._items[user_id] = (expires_at, json.loads(json.dumps(data)))
+
+    async def delete(self, user_id: int) -> None:
+        self._items.pop(user_id, None)
+
+
+class MongoUserDataStore(UserDataStore):
+    """Store in a MongoDB collection expired by a TTL index on ``updated_at``."""
+
+    TTL_INDEX_NAME = "updated_at_ttl"
+
+    def __init__(self, collection: AsyncIOMotorCollection, *, ttl: float) -> None:
+        super().__init__(ttl=ttl)
+        self._collection = collection
+
+    async def initialize(self) -> None:
+        try:
+            await self._collection.create_index(
+                "updated_at", name=self.TTL_INDEX_NAME, expireAfterSeconds=int(self.ttl)
+            )
+        except OperationFailure:
+            # Индекс уже есть с другим сроком жизни: меняем срок без пересоздания
+            await self._collection.database.command(
+                "collMod",
+                self._collection.name,
+                index={"name": self.TTL_INDEX_NAME, "expireAfterSeconds": int(self.ttl)},
+            )
+
+    async def load(self, user_id: int) -> Optional[UserData]:
+        document = await self._collection.find_one({"_id": user_id}, {"data": 1})
+        if document is None:
+            return None
+        return dict(document.get("data") or {})
+
+    async def save_many(self, items: Mapping[int, UserData]) -> None:
+        if not items:
+            return
+        now = datetime.now(timezone.utc)
+        await self._collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": user_id},
+                    {"$set": {"data": data, "updated_at": now}},
+                    upsert=True,
+                )
+                for user_id, data in items.items()
+            ],
+            ordered=False,
+        )
+
+    async def delete(self, user_id: int) -> None:
+        await self._collection.delete_one({"_id": user_id})
+
+
+class RedisUserDataStore(UserDataStore):
+    """Store in Redis or a compatible server (KeyDB, Dragonfly) using key expiry."""
+
+    def __init__(self, url: str, *, ttl: float, prefix: str = "tg_cosmetics:user:") -> None:
+        super().__init__(ttl=ttl)
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as exc:  # pragma: no cover - depends on the environment
+            raise RuntimeError(
+                "PERSISTENCE_BACKEND=redis requires the redis package to be installed."
+            ) from exc
+        self._client = redis_asyncio.from_url(url)
+        self._prefix = prefix
+
+    def _key(self, user_id: int) -> str:
+        return f"{self._prefix}{user_id}"
+
+    async def load(self, user_id: int) -> Optional[UserData]:
+        raw = await self._client.get(self._key(user_id))
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def save_many(self, items: Mapping[int, UserData]) -> None:
+        if not items:
+            return
+        async with self._client.pipeline(transaction=False) as pipeline:
+            for user_id, data in items.items():
+                pipeline.set(self._key(user_id), json.dumps(data), ex=int(self.ttl))
+            await pipeline.execute()
+
+    async def delete(self, user_id: int) -> None:
+        await self._client.delete(self._key(user_id))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class NavigationPersistence(BasePersistence[UserData, Dict[str, Any], Dict[str, Any]]):
+    """Persistence of ``user_data`` shared by all bot replicas.
+
+    ``user_data`` is loaded lazily: before an update the data of the user is
+    re-read from the store unless this replica itself served the user within
+    the last persistence interval or still has writes of the user pending (its
+    local copy is then the newest one and may not have reached the store yet).
+    Users idle for longer than the store TTL are evicted from the application
+    once it is :meth:`attach`-ed, so the local copies do not grow without
+    bound. Writes are buffered and sent to the store in batches shortly after
+    the application hands them over, keeping one round trip per batch instead
+    of one per user.
+    """
+
+    def __init__(
+        self,
+        store: UserDataStore,
+        *,
+        update_interval: float = 1,
+        flush_delay: float = 0.05,
+        batch_size: int = 500,
+    ) -> None:
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, user_data=True, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self._flush_delay = flush_delay
+        self._batch_size = batch_size
+        self._pending: Dict[int, UserData] = {}
+        self._in_flight: Dict[int, UserData] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task[None]] = None
+        # Когда пользователь последний раз обслуживался этим экземпляром
+        self._served_at: Dict[int, float] = {}
+        self._local_window = 2 * update_interval + flush_delay + 1
+        self._application: Optional[Application] = None
+        # Вытесненные из памяти пользователи: их данные в хранилище не удаляются
+        self._evicted: Set[int] = set()
+
+    def attach(self, application: Application) -> None:
+        """Let the persistence evict idle users from ``application.user_data``."""
+
+        self._application = application
+
+    async def get_user_data(self) -> Dict[int, UserData]:
+        await self.store.initialize()
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: UserData) -> None:
+        now = time.monotonic()
+        served_at = self._served_at.get(user_id)
+        self._served_at[user_id] = now
+        # Не затираем локальные изменения, которые ещё могут быть не записаны
+        if served_at is not None and now - served_at < self._local_window:
+            return
+        if user_id in self._pending or user_id in self._in_flight:
+            return
+        try:
+            stored = await self.store.load(user_id)
+        except Exception as exc:  # noqa: BLE001 - сбой хранилища не должен ронять обработку
+            logger.warning("Не удалось прочитать состояние пользователя %s: %s", user_id, exc)
+            return
+        user_data.clear()
+        if stored:
+            user_data.update(stored)
+
+    async def update_user_data(self, user_id: int, data: UserData) -> None:
+        self._served_at[user_id] = time.monotonic()
+        self._pending[user_id] = data
+        if len(self._pending) >= self._batch_size:
+            await self._write_pending()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def drop_user_data(self, user_id: int) -> None:
+        if user_id in self._evicted:
+            self._evicted.discard(user_id)
+            return
+        self._served_at.pop(user_id, None)
+        self._pending.pop(user_id, None)
+        await self.store.delete(user_id)
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        await self._write_pending()
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._flush_delay)
+        await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            self._forget_idle_users()
+            self._in_flight = batch
+            try:
+                await self.store.save_many(batch)
+            except Exception as exc:  # noqa: BLE001 - повторим при следующей записи
+                logger.warning("Не удалось сохранить состояние пользователей: %s", exc)
+                # Возвращаем в очередь всё, что не перезаписали более новые данные
+                for user_id, data in batch.items():
+                    self._pending.setdefault(user_id, data)
+            finally:
+                self._in_flight = {}
+
+    def _forget_idle_users(self) -> None:
+        if self._application is None:
+            return
+        threshold = time.monotonic() - self.store.ttl
+        idle = [user_id for user_id, seen in self._served_at.items() if seen < threshold]
+        for user_id in idle:
+            # В хранилище данные к этому времени уже истекли
+            del self._served_at[user_id]
+            self._evicted.add(user_id)
+            self._application.drop_user_data(user_id)
+
+    async def get_chat_data(self) -> Dict[int, Dict[str, Any]]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[str, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Any, Any]:
+        return {}
+
+    async def update_conversation(self, name: str, key: Any, new_state: Any) -> None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: Dict[str, Any]) -> None:
+        return None
+
+    async def update_bot_data(self, data: Dict[str, Any]) -> None:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        return None
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        return None
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[str, Any]) -> None:
+        return None
+
+    async def refresh_bot_data(self, bot_data: Dict[str, Any]) -> None:
+        return None
+
+
+def create_persistence(
+    settings: Settings, collections: AsyncMongoCollections
+) -> NavigationPersistence:
+    """Return the persistence backed by the store selected in the settings."""
+
+    store: UserDataStore
+    if settings.persistence_backend == PERSISTENCE_BACKEND_MEMORY:
+        store = InMemoryUserDataStore(ttl=settings.user_data_ttl)
+    elif settings.persistence_backend == PERSISTENCE_BACKEND_REDIS:
+        store = RedisUserDataStore(settings.redis_url, ttl=settings.user_data_ttl)
+    else:
+        store = MongoUserDataStore(
+            collections.database["user_data"], ttl=settings.user_data_ttl
+        )
+    return NavigationPersistence(
+        store, update_interval=settings.persistence_update_interval
+    )
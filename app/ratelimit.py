@@ -0,0 +1,251 @@
+"""Throttling of outgoing Bot API requests below Telegram's flood limits."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Dict, Hashable, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from app.config import Settings
+from app.tracing import span
+
+__all__ = ["RateLimiterStats", "TokenBucket", "TokenBucketRateLimiter", "create_rate_limiter"]
+
+logger = logging.getLogger(__name__)
+
+JSONDict = Dict[str, Any]
+RequestResult = Union[bool, JSONDict, List[JSONDict]]
+
+# Методы, отправляющие новые сообщения: на них действуют общий лимит и лимит чата.
+# Редактирование учитывается только в лимите чата, а удаление и ответы на
+# callback-запросы не ограничиваются, но так же повторяются после RetryAfter
+_MESSAGE_ENDPOINTS = frozenset(
+    {"copyMessage", "copyMessages", "forwardMessage", "forwardMessages"}
+)
+_EDIT_ENDPOINTS = frozenset({"stopMessageLiveLocation", "stopPoll"})
+
+# После скольких корзин чатов начинать удалять неиспользуемые
+_MAX_IDLE_BUCKETS = 1024
+
+
+class TokenBucket:
+    """Token bucket allowing ``rate`` calls per ``period`` seconds with bursts up to ``rate``.
+
+    Tokens are reserved immediately, so concurrent callers are served in the
+    order they asked and each of them learns how long it has to wait.
+    """
+
+    def __init__(self, rate: int, period: float) -> None:
+        if rate < 1 or period <= 0:
+            raise ValueError("rate and period must be positive")
+        self.capacity = float(rate)
+        self.fill_rate = rate / period
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.fill_rate
+        )
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """Take a token and return the delay in seconds before it may be used."""
+
+        self._refill(time.monotonic())
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.fill_rate
+
+    @property
+    def idle(self) -> bool:
+        """Return ``True`` if the bucket is full, i.e. it can be dropped."""
+
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
+
+
+@dataclass
+class RateLimiterStats:
+    """Counters of :class:`TokenBucketRateLimiter`."""
+
+    requests: int = 0
+    throttled: int = 0
+    throttled_seconds: float = 0.0
+    retried: int = 0
+    failed: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the counters as a JSON-serialisable mapping."""
+
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+def _chat_key(data: JSONDict) -> Optional[Hashable]:
+    chat_id = data.get("chat_id")
+    if chat_id is None:
+        return None
+    with contextlib.suppress(TypeError, ValueError):
+        return int(chat_id)
+    # Строковые идентификаторы (@username) бывают только у каналов и супергрупп
+    return str(chat_id)
+
+
+def _is_group(chat_key: Hashable) -> bool:
+    return isinstance(chat_key, str) or (isinstance(chat_key, int) and chat_key < 0)
+
+
+def _is_message_endpoint(endpoint: str) -> bool:
+    return endpoint.startswith("send") or endpoint in _MESSAGE_ENDPOINTS
+
+
+def _is_edit_endpoint(endpoint: str) -> bool:
+    return endpoint.startswith("editMessage") or endpoint in _EDIT_ENDPOINTS
+
+
+class TokenBucketRateLimiter(BaseRateLimiter[int]):
+    """Rate limiter with a global bucket and a bucket per chat.
+
+    Messages are limited to ``overall_rate`` per second across all chats,
+    ``chat_rate`` per second in a private chat and ``group_rate`` per minute in
+    a group or channel; a rate of ``0`` disables the corresponding bucket.
+    Message edits share the bucket of their chat but not the global one. When
+    Telegram still answers with ``RetryAfter`` the request is retried after the
+    requested delay, and other requests to the same chat (or all requests, if
+    the flood control is not bound to a chat) wait as well.
+
+    ``rate_limit_args`` of a single call overrides ``max_retries``.
+    """
+
+    def __init__(
+        self,
+        *,
+        overall_rate: int = 30,
+        chat_rate: int = 1,
+        group_rate: int = 20,
+        max_retries: int = 3,
+    ) -> None:
+        self._overall = TokenBucket(overall_rate, 1) if overall_rate else None
+        self._chat_rate = chat_rate
+        self._group_rate = group_rate
+        self._max_retries = max_retries
+        self._chats: Dict[Hashable, TokenBucket] = {}
+        # До какого момента (time.monotonic) запросы ждут после RetryAfter
+        self._blocked_until: Dict[Optional[Hashable], float] = {}
+        self.stats = RateLimiterStats()
+
+    async def initialize(self) -> None:
+        return None
+
+    async def shutdown(self) -> None:
+        return None
+
+    def _chat_bucket(self, chat_key: Hashable) -> Optional[TokenBucket]:
+        if _is_group(chat_key):
+            rate, period = self._group_rate, 60
+        else:
+            rate, period = self._chat_rate, 1
+        if not rate:
+            return None
+        bucket = self._chats.get(chat_key)
+        if bucket is None:
+            if len(self._chats) >= _MAX_IDLE_BUCKETS:
+                self._drop_idle_buckets()
+            bucket = self._chats[chat_key] = TokenBucket(rate, period)
+        return bucket
+
+    def _drop_idle_buckets(self) -> None:
+        for key in [key for key, bucket in self._chats.items() if bucket.idle]:
+            del self._chats[key]
+
+    def _reserve(self, endpoint: str, chat_key: Optional[Hashable]) -> float:
+        now = time.monotonic()
+        delay = max(
+            self._blocked_until.get(None, now) - now,
+            self._blocked_until.get(chat_key, now) - now if chat_key is not None else 0.0,
+            0.0,
+        )
+        is_message = _is_message_endpoint(endpoint)
+        if not is_message and not _is_edit_endpoint(endpoint):
+            return delay
+        if is_message and self._overall is not None:
+            delay = max(delay, self._overall.reserve())
+        if chat_key is not None:
+            bucket = self._chat_bucket(chat_key)
+            if bucket is not None:
+                delay = max(delay, bucket.reserve())
+        return delay
+
+    def _block(self, chat_key: Optional[Hashable], seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if self._blocked_until.get(chat_key, 0.0) < until:
+            self._blocked_until[chat_key] = until
+        # Прошедшие блокировки больше не нужны
+        now = time.monotonic()
+        for key in [key for key, value in self._blocked_until.items() if value <= now]:
+            del self._blocked_until[key]
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, RequestResult]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> RequestResult:
+        max_retries = self._max_retries if rate_limit_args is None else rate_limit_args
+        chat_key = _chat_key(data)
+        self.stats.requests += 1
+
+        attempt = 0
+        while True:
+            delay = self._reserve(endpoint, chat_key)
+            if delay > 0:
+                self.stats.throttled += 1
+                self.stats.throttled_seconds += delay
+                with span("ratelimit.wait", endpoint=endpoint):
+                    await asyncio.sleep(delay)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                if attempt >= max_retries:
+                    self.stats.failed += 1
+                    logger.warning(
+                        "Telegram ограничил %s, попытки исчерпаны (%s)", endpoint, max_retries
+                    )
+                    raise
+                attempt += 1
+                self.stats.retried += 1
+                retry_after = float(exc.retry_after) + 0.1
+                logger.info(
+                    "Telegram ограничил %s, повтор через %.1f с (попытка %s из %s)",
+                    endpoint,
+                    retry_after,
+                    attempt,
+                    max_retries,
+                )
+                self._block(chat_key, retry_after)
+
+
+def create_rate_limiter(settings: Settings) -> TokenBucketRateLimiter:
+    """Return the rate limiter configured by the ``RATE_LIMIT_*`` settings."""
+
+    return TokenBucketRateLimiter(
+        overall_rate=settings.rate_limit_overall,
+        chat_rate=settings.rate_limit_chat,
+        group_rate=settings.rate_limit_group,
+        max_retries=settings.rate_limit_max_retries,
+    )
@@ -0,0 +1,87 @@
+"""Dispatch of inline button presses by the type of their decoded ``callback_data``."""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application, BaseHandler, ContextTypes
+
+from app.keyboards.callbacks import decode_callback
+
+__all__ = ["CallbackRouter", "RouteCallback", "wrap_handler_callbacks"]
+
+RouteCallback = Callable[[Update, ContextTypes.DEFAULT_TYPE, Any], Awaitable[Any]]
+
+
+async def _unrouted(update: object, context: Any) -> None:
+    return None
+
+
+class CallbackRouter(BaseHandler[Update, ContextTypes.DEFAULT_TYPE]):
+    """Single handler for every inline button of the bot.
+
+    Instead of trying a regular expression per button kind, ``callback_data``
+    is decoded once with :func:`decode_callback` and the route is found by the
+    type of the result. Route callbacks receive the decoded action as the
+    third argument.
+    """
+
+    def __init__(self, *, block: bool = True) -> None:
+        super().__init__(_unrouted, block=block)
+        self.routes: Dict[type, RouteCallback] = {}
+
+    def route(self, action: type, callback: RouteCallback) -> None:
+        """Call ``callback`` for buttons encoding an ``action`` instance."""
+
+        if action in self.routes:
+            raise ValueError(f"route for {action.__name__} is already registered")
+        self.routes[action] = callback
+
+    def check_update(self, update: object) -> Optional[Tuple[RouteCallback, Any]]:
+        if not isinstance(update, Update) or update.callback_query is None:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        action = decode_callback(data)
+        if action is None:
+            return None
+        callback = self.routes.get(type(action))
+        if callback is None:
+            return None
+        return callback, action
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Application,
+        check_result: Tuple[RouteCallback, Any],
+        context: ContextTypes.DEFAULT_TYPE,
+    ) -> Any:
+        self.collect_additional_context(context, update, application, check_result)
+        callback, action = check_result
+        return await callback(update, context, action)
+
+
+Wrapper = Callable[[str, Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]
+
+
+def _callback_name(callback: Callable[..., Any]) -> str:
+    return getattr(callback, "__qualname__", None) or repr(callback)
+
+
+def wrap_handler_callbacks(application: Application, wrap: Wrapper) -> None:
+    """Replace every handler callback with ``wrap(name, callback)``.
+
+    Routes of :class:`CallbackRouter` are wrapped one by one so that they keep
+    their own names. Wrappers must pass extra positional arguments through.
+    Must be called after all handlers have been added.
+    """
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, CallbackRouter):
+                for action, callback in handler.routes.items():
+                    handler.routes[action] = wrap(_callback_name(callback), callback)
+            else:
+                handler.callback = wrap(_callback_name(handler.callback), handler.callback)
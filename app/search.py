@@ -0,0 +1,345 @@
+"""In-memory full-text and fuzzy search over the product catalog."""
+from __future__ import annotations
+
+import hashlib
+import heapq
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+__all__ = ["SearchHit", "SearchIndex", "normalize", "tokenize", "trigrams"]
+
+
+# Поля продукта в порядке убывания веса в ранжировании
+_FIELD_CODE = 0
+_FIELD_NAME = 1
+_FIELD_DESCRIPTION = 2
+_FIELD_WEIGHTS = (4.0, 2.0, 0.5)
+
+# Описания длинные: индексируем только первые уникальные слова, чтобы индекс
+# каталога на десятки тысяч продуктов оставался компактным
+_MAX_DESCRIPTION_TOKENS = 64
+_MIN_TOKEN_LENGTH = 2
+_MIN_SIMILARITY = 0.5
+_MAX_FUZZY_CANDIDATES = 32
+# Сколько продуктов ранжировать по самому редкому слову запроса
+_MAX_CANDIDATES = 500
+
+_WORD_RE = re.compile(r"\w+")
+_CODE_PART_RE = re.compile(r"[^\W\d_]+|\d+")
+
+
+def normalize(text: str) -> str:
+    """Return ``text`` case-folded with «ё» folded to «е» and compatible forms unified."""
+
+    # NFKC, а не NFKD: «й» не должна распадаться на «и» и бреве
+    return unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split normalized ``text`` into words of at least two characters."""
+
+    return [
+        token
+        for token in _WORD_RE.findall(normalize(text).replace("_", " "))
+        if len(token) >= _MIN_TOKEN_LENGTH
+    ]
+
+
+def trigrams(token: str) -> Set[str]:
+    """Return padded character trigrams of ``token``."""
+
+    padded = f"  {token} "
+    return {padded[index : index + 3] for index in range(len(padded) - 2)}
+
+
+def _code_tokens(code: str) -> List[str]:
+    normalized = normalize(code)
+    # Артикул ищем целиком без разделителей и по частям из букв и цифр:
+    # «ART-119» и «ART119» дают «art119», «art» и «119»
+    compact = "".join(_WORD_RE.findall(normalized))
+    parts = _CODE_PART_RE.findall(normalized)
+    return _unique(token for token in [compact, *parts] if len(token) >= _MIN_TOKEN_LENGTH)
+
+
+def _unique(tokens: Iterable[str], limit: Optional[int] = None) -> List[str]:
+    result = list(dict.fromkeys(tokens))
+    return result if limit is None else result[:limit]
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """Product found by :meth:`SearchIndex.search`."""
+
+    product_id: int
+    name: str
+    brand_id: int
+    category_id: int
+    score: float
+
+
+@dataclass(frozen=True)
+class _Entry:
+    product_id: int
+    docno: int
+    name: str
+    brand_id: int
+    category_id: int
+    signature: str
+    postings: int
+
+
+def _contains(postings: Optional[array], docno: int) -> bool:
+    if not postings:
+        return False
+    index = bisect_left(postings, docno)
+    return index < len(postings) and postings[index] == docno
+
+
+class SearchIndex:
+    """Inverted index of product code, name and description with fuzzy matching.
+
+    Every indexed version of a product gets a new document number, and each
+    word maps to one ascending array of document numbers per field, so checking
+    whether a product contains a word is a binary search. A trigram index over
+    the vocabulary finds words similar to a misspelled or truncated query word.
+
+    Products are added, replaced and removed one at a time, so the index
+    follows catalog changes without being rebuilt: unchanged products are
+    recognised by a signature and skipped, and postings of removed versions are
+    dropped in bulk once they outnumber the live ones.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[int, _Entry] = {}
+        self._documents: Dict[int, _Entry] = {}
+        self._postings: Dict[str, List[Optional[array]]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._next_docno = 0
+        self._live_postings = 0
+        self._dead_postings = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, product_id: object) -> bool:
+        return product_id in self._entries
+
+    @staticmethod
+    def _signature(document: Mapping[str, Any]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for field in ("name", "code", "description", "brand_id", "category_id"):
+            digest.update(str(document.get(field, "")).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def upsert(self, document: Mapping[str, Any]) -> bool:
+        """Index or re-index a product document; return ``False`` if it is unchanged."""
+
+        try:
+            product_id = int(document["id"])
+            brand_id = int(document.get("brand_id"))
+            category_id = int(document.get("category_id"))
+        except (KeyError, TypeError, ValueError):
+            return False
+        name = str(document.get("name", "")).strip()
+        if not name:
+            self.remove(product_id)
+            return False
+
+        signature = self._signature(document)
+        current = self._entries.get(product_id)
+        if current is not None and current.signature == signature:
+            return False
+        self.remove(product_id)
+
+        tokens: Dict[str, int] = {}
+        description = tokenize(str(document.get("description", "")))
+        for token in _unique(description, _MAX_DESCRIPTION_TOKENS):
+            tokens[token] = _FIELD_DESCRIPTION
+        # Более весомые поля перезаписывают менее весомые
+        for token in tokenize(name):
+            tokens[token] = _FIELD_NAME
+        for token in _code_tokens(str(document.get("code", ""))):
+            tokens[token] = _FIELD_CODE
+
+        docno = self._next_docno
+        self._next_docno += 1
+        for token, field in tokens.items():
+            fields = self._postings.get(token)
+            if fields is None:
+                fields = self._postings[token] = [None, None, None]
+                for trigram in trigrams(token):
+                    self._trigrams.setdefault(trigram, set()).add(token)
+            postings = fields[field]
+            if postings is None:
+                postings = fields[field] = array("q")
+            postings.append(docno)
+
+        entry = _Entry(
+            product_id=product_id,
+            docno=docno,
+            name=name,
+            brand_id=brand_id,
+            category_id=category_id,
+            signature=signature,
+            postings=len(tokens),
+        )
+        self._entries[product_id] = entry
+        self._documents[docno] = entry
+        self._live_postings += len(tokens)
+        return True
+
+    def remove(self, product_id: int) -> None:
+        """Remove the product from the index if it is indexed."""
+
+        entry = self._entries.pop(product_id, None)
+        if entry is None:
+            return
+        del self._documents[entry.docno]
+        self._live_postings -= entry.postings
+        self._dead_postings += entry.postings
+        if self._dead_postings > max(self._live_postings, 4096):
+            self._compact()
+
+    def retain(self, product_ids: Set[int]) -> int:
+        """Remove every product not in ``product_ids`` and return how many were removed."""
+
+        stale = [product_id for product_id in self._entries if product_id not in product_ids]
+        for product_id in stale:
+            self.remove(product_id)
+        return len(stale)
+
+    def _compact(self) -> None:
+        """Drop postings of removed documents and words no longer used."""
+
+        documents = self._documents
+        for token in list(self._postings):
+            fields = self._postings[token]
+            for field, postings in enumerate(fields):
+                if postings is not None:
+                    live = array("q", (docno for docno in postings if docno in documents))
+                    fields[field] = live or None
+            if not any(fields):
+                del self._postings[token]
+                for trigram in trigrams(token):
+                    words = self._trigrams.get(trigram)
+                    if words is not None:
+                        words.discard(token)
+                        if not words:
+                            del self._trigrams[trigram]
+        self._dead_postings = 0
+
+    def _similar_words(self, token: str) -> Dict[str, float]:
+        """Return vocabulary words matching ``token`` with their similarity.
+
+        A word present in the vocabulary matches only itself; otherwise the
+        closest words by trigram Dice coefficient are returned, which covers
+        typos and truncated words («шамп» → «шампунь»).
+        """
+
+        if token in self._postings:
+            return {token: 1.0}
+        query_trigrams = trigrams(token)
+        overlaps: Counter[str] = Counter()
+        for trigram in query_trigrams:
+            overlaps.update(self._trigrams.get(trigram, ()))
+
+        scored: List[Tuple[float, str]] = []
+        for word, overlap in overlaps.items():
+            similarity = 2 * overlap / (len(query_trigrams) + len(word) + 1)
+            if similarity >= _MIN_SIMILARITY:
+                scored.append((similarity, word))
+        return {
+            word: similarity
+            for similarity, word in heapq.nlargest(_MAX_FUZZY_CANDIDATES, scored)
+        }
+
+    def _postings_size(self, words: Mapping[str, float]) -> int:
+        return sum(
+            len(postings)
+            for word in words
+            for postings in self._postings[word]
+            if postings is not None
+        )
+
+    def _candidates(self, words: Mapping[str, float]) -> Dict[int, float]:
+        """Return up to ``_MAX_CANDIDATES`` documents containing one of ``words``.
+
+        Documents are taken from the heaviest fields of the most similar words
+        first, so a cut-off keeps the best matches.
+        """
+
+        candidates: Dict[int, float] = {}
+        ordered = sorted(
+            (
+                (similarity * _FIELD_WEIGHTS[field], word, field)
+                for word, similarity in words.items()
+                for field in range(len(_FIELD_WEIGHTS))
+            ),
+            reverse=True,
+        )
+        for score, word, field in ordered:
+            postings = self._postings[word][field]
+            if postings is None:
+                continue
+            for docno in postings:
+                if docno in self._documents and docno not in candidates:
+                    candidates[docno] = score
+                    if len(candidates) >= _MAX_CANDIDATES:
+                        return candidates
+        return candidates
+
+    def _score(self, words: Mapping[str, float], docno: int) -> float:
+        best = 0.0
+        for word, similarity in words.items():
+            for field, postings in enumerate(self._postings[word]):
+                score = similarity * _FIELD_WEIGHTS[field]
+                if score > best and _contains(postings, docno):
+                    best = score
+        return best
+
+    def search(self, query: str, *, limit: int = 10) -> List[SearchHit]:
+        """Return the best matching products ordered by relevance.
+
+        Candidates come from the rarest query word; the other words are checked
+        by binary search in their postings, so the cost depends on the number of
+        candidates rather than on the size of the catalog.
+        """
+
+        expanded = [self._similar_words(token) for token in _unique(tokenize(query))]
+        expanded = [words for words in expanded if words]
+        if not expanded:
+            return []
+        expanded.sort(key=self._postings_size)
+
+        rarest, others = expanded[0], expanded[1:]
+        ranked: List[Tuple[int, float, int]] = []
+        for docno, score in self._candidates(rarest).items():
+            matched = 1
+            for words in others:
+                word_score = self._score(words, docno)
+                if word_score:
+                    matched += 1
+                    score += word_score
+            ranked.append((matched, score, docno))
+
+        # Продукты, в которых нашлись все слова запроса, всегда выше остальных
+        best = heapq.nsmallest(limit, ranked, key=lambda item: (-item[0], -item[1], item[2]))
+        hits: List[SearchHit] = []
+        for _, score, docno in best:
+            entry = self._documents[docno]
+            hits.append(
+                SearchHit(
+                    product_id=entry.product_id,
+                    name=entry.name,
+                    brand_id=entry.brand_id,
+                    category_id=entry.category_id,
+                    score=round(score, 4),
+                )
+            )
+        return hits
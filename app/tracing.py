@@ -0,0 +1,413 @@
+"""Opt-in per-update tracing of handlers, MongoDB commands and Bot API requests."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import Context, ContextVar, copy_context
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+from pymongo import monitoring
+from telegram import Update
+from telegram.ext import Application
+
+from app.config import TRACING_EXPORTER_JSONL, TRACING_EXPORTER_OTLP, Settings
+from app.keyboards.callbacks import decode_callback
+from app.routing import wrap_handler_callbacks
+
+__all__ = [
+    "JsonLinesExporter",
+    "MongoTraceListener",
+    "OtlpHttpExporter",
+    "Span",
+    "SpanExporter",
+    "Tracer",
+    "create_tracer",
+    "detached_context",
+    "span",
+    "trace_handlers",
+]
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "tg-cosmetics-bot"
+
+# Сколько завершённых спанов держать в памяти, если экспорт не успевает
+_MAX_BUFFERED_SPANS = 20000
+_EXPORT_BATCH_SIZE = 512
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+@dataclass
+class Span:
+    """Timed operation within the processing of one update."""
+
+    name: str
+    trace_id: str
+    parent: Optional["Span"] = field(default=None, repr=False)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    span_id: str = field(default_factory=lambda: _new_id(64))
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    error: Optional[str] = None
+    children: List["Span"] = field(default_factory=list, repr=False)
+
+    @property
+    def duration_ms(self) -> float:
+        """Return the duration in milliseconds, up to now if the span is open."""
+
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1_000_000
+
+    def child(self, name: str, **attributes: Any) -> "Span":
+        """Create and attach a child span starting now."""
+
+        child = Span(name, self.trace_id, parent=self, attributes=attributes)
+        # list.append атомарен: дочерние спаны добавляются и из потоков Motor
+        self.children.append(child)
+        return child
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Close the span recording ``error`` if the operation failed."""
+
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def walk(self, depth: int = 0) -> Iterator[Tuple[int, "Span"]]:
+        """Yield the span and its descendants with their depth, in start order."""
+
+        yield depth, self
+        for child in sorted(self.children, key=lambda item: item.start_ns):
+            yield from child.walk(depth + 1)
+
+    def render(self) -> str:
+        """Return the span tree as indented text."""
+
+        lines = []
+        for depth, item in self.walk():
+            details = " ".join(f"{key}={value}" for key, value in item.attributes.items())
+            error = f" ОШИБКА {item.error}" if item.error else ""
+            lines.append(
+                f"{'  ' * depth}{item.name} {item.duration_ms:.1f} мс"
+                f"{' ' + details if details else ''}{error}"
+            )
+        return "\n".join(lines)
+
+
+def detached_context() -> Context:
+    """Return a copy of the current context outside of any traced update.
+
+    Tasks that outlive the update, such as background deletions, run in it so
+    that their spans are not attached to a trace that is already exported.
+    """
+
+    context = copy_context()
+    context.run(_current_span.set, None)
+    return context
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Open a child of the current span; does nothing outside a traced update."""
+
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.finish(exc)
+        raise
+    else:
+        child.finish()
+    finally:
+        _current_span.reset(token)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(item: Span) -> Dict[str, Any]:
+    """Return the span in the OTLP/JSON representation."""
+
+    document: Dict[str, Any] = {
+        "traceId": item.trace_id,
+        "spanId": item.span_id,
+        "name": item.name,
+        "kind": 1,
+        "startTimeUnixNano": str(item.start_ns),
+        "endTimeUnixNano": str(item.end_ns),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()
+        ],
+        "status": {"code": 2, "message": item.error} if item.error else {"code": 1},
+    }
+    if item.parent is not None:
+        document["parentSpanId"] = item.parent.span_id
+    return document
+
+
+class SpanExporter(ABC):
+    """Destination of finished spans in the OTLP/JSON representation."""
+
+    @abstractmethod
+    async def export(self, spans: List[Dict[str, Any]]) -> None:
+        """Send a batch of spans."""
+
+    async def close(self) -> None:
+        """Release the resources of the exporter."""
+
+        return None
+
+
+class JsonLinesExporter(SpanExporter):
+    """Append every span as one JSON line to a local file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def _write(self, lines: str) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as file:
+            file.write(lines)
+
+    async def export(self, spans: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in spans)
+        await asyncio.to_thread(self._write, lines)
+
+
+class OtlpHttpExporter(SpanExporter):
+    """Send spans to an OpenTelemetry collector over OTLP/HTTP with JSON encoding."""
+
+    def __init__(self, endpoint: str, *, timeout: float = 5) -> None:
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def export(self, spans: List[Dict[str, Any]]) -> None:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=self._timeout)
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {"key": "service.name", "value": {"stringValue": SERVICE_NAME}}
+                        ]
+                    },
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+                }
+            ]
+        }
+        async with self._session.post(self.url, json=payload) as response:
+            response.raise_for_status()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class Tracer:
+    """Collects the span tree of every update and exports it in the background.
+
+    Updates taking longer than ``slow_update_ms`` (``0`` disables the check)
+    are logged with their whole span tree.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[SpanExporter] = None,
+        *,
+        slow_update_ms: int = 1000,
+        flush_interval: float = 2.0,
+    ) -> None:
+        self.exporter = exporter
+        self.slow_update_ms = slow_update_ms
+        self._flush_interval = flush_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._dropped = 0
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @contextlib.contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Open the root span of an update."""
+
+        root = Span(name, _new_id(128), attributes=attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as exc:
+            root.finish(exc)
+            raise
+        else:
+            root.finish()
+        finally:
+            _current_span.reset(token)
+            self._finished(root)
+
+    def _finished(self, root: Span) -> None:
+        if self.slow_update_ms and root.duration_ms >= self.slow_update_ms:
+            logger.warning(
+                "Медленное обновление: %.1f мс\n%s", root.duration_ms, root.render()
+            )
+        if self.exporter is None:
+            return
+        # Незавершённые спаны (например, команда Mongo, прерванная отменой) не экспортируются
+        spans = [_otlp_span(item) for _, item in root.walk() if item.end_ns]
+        if len(self._buffer) + len(spans) > _MAX_BUFFERED_SPANS:
+            self._dropped += len(spans)
+            return
+        self._buffer.extend(spans)
+
+    def start(self) -> None:
+        """Start exporting spans in a background task."""
+
+        if self.exporter is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._export_periodically(), name="Tracer")
+
+    async def stop(self) -> None:
+        """Export the remaining spans and stop the background task."""
+
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+        if self.exporter is not None:
+            await self.exporter.close()
+
+    async def flush(self) -> None:
+        """Export buffered spans."""
+
+        if self.exporter is None:
+            return
+        if self._dropped:
+            logger.warning("Экспорт трассировки не успевает: пропущено %s спанов", self._dropped)
+            self._dropped = 0
+        while self._buffer:
+            batch = self._buffer[:_EXPORT_BATCH_SIZE]
+            del self._buffer[:_EXPORT_BATCH_SIZE]
+            try:
+                await self.exporter.export(batch)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as exc:
+                logger.warning("Не удалось экспортировать %s спанов: %s", len(batch), exc)
+
+    async def _export_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+
+def _update_attributes(update: object) -> Dict[str, Any]:
+    if not isinstance(update, Update):
+        return {}
+    attributes: Dict[str, Any] = {"update.id": update.update_id}
+    if update.effective_chat is not None:
+        attributes["chat.id"] = update.effective_chat.id
+    if update.effective_user is not None:
+        attributes["user.id"] = update.effective_user.id
+    if update.callback_query is not None and update.callback_query.data:
+        attributes["callback.data"] = update.callback_query.data
+        action = decode_callback(update.callback_query.data)
+        if action is not None:
+            attributes["callback.action"] = repr(action)
+    return attributes
+
+
+def _traced(
+    tracer: Tracer, name: str, callback: Callable[..., Awaitable[Any]]
+) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(callback)
+    async def wrapper(update: object, context: Any, *args: Any) -> Any:
+        with tracer.trace(f"update {name}", **_update_attributes(update)):
+            return await callback(update, context, *args)
+
+    return wrapper
+
+
+def trace_handlers(application: Application, tracer: Tracer) -> None:
+    """Open a root span around every registered handler callback.
+
+    Must be called after all handlers have been added.
+    """
+
+    wrap_handler_callbacks(application, functools.partial(_traced, tracer))
+
+
+class MongoTraceListener(monitoring.CommandListener):
+    """pymongo command listener adding a span per command to the current update.
+
+    Motor runs pymongo in threads with a copy of the caller's context, so the
+    current span is visible here.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[Tuple[Any, int], Span] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        parent = _current_span.get()
+        if parent is None:
+            return
+        target = event.command.get(event.command_name)
+        attributes: Dict[str, Any] = {"db.operation": event.command_name}
+        if isinstance(target, str):
+            attributes["db.collection"] = target
+        child = parent.child(f"mongo.{event.command_name}", **attributes)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = child
+
+    def _finish(self, event: Any) -> Optional[Span]:
+        with self._lock:
+            child = self._pending.pop((event.connection_id, event.request_id), None)
+        if child is not None:
+            child.end_ns = child.start_ns + event.duration_micros * 1000
+        return child
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        child = self._finish(event)
+        if child is not None:
+            child.error = str(event.failure.get("errmsg", "command failed"))
+
+
+def create_tracer(settings: Settings) -> Optional[Tracer]:
+    """Return the tracer configured by ``TRACING_*`` or ``None`` if tracing is off."""
+
+    if not settings.tracing_enabled:
+        return None
+    exporter: Optional[SpanExporter] = None
+    if settings.tracing_exporter == TRACING_EXPORTER_JSONL:
+        exporter = JsonLinesExporter(settings.tracing_file)
+    elif settings.tracing_exporter == TRACING_EXPORTER_OTLP:
+        exporter = OtlpHttpExporter(settings.tracing_otlp_endpoint)
+    return Tracer(exporter, slow_update_ms=settings.tracing_slow_update_ms)
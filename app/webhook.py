@@ -0,0 +1,133 @@
+"""Serving Telegram updates over an aiohttp webhook instead of long polling."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hmac
+import logging
+import signal
+from typing import Any
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from app.concurrency import PerChatUpdateProcessor
+from app.config import Settings
+from app.ratelimit import TokenBucketRateLimiter
+
+__all__ = ["HEALTH_PATH", "create_web_app", "run_webhook"]
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = "/healthz"
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+_APPLICATION_KEY = web.AppKey("application", Application)
+_SETTINGS_KEY = web.AppKey("settings", Settings)
+
+
+async def _receive_update(request: web.Request) -> web.Response:
+    application = request.app[_APPLICATION_KEY]
+    settings = request.app[_SETTINGS_KEY]
+
+    if settings.webhook_secret_token:
+        received = request.headers.get(SECRET_TOKEN_HEADER, "")
+        if not hmac.compare_digest(received, settings.webhook_secret_token):
+            return web.Response(status=403)
+
+    try:
+        payload: Any = await request.json()
+    except ValueError:
+        return web.Response(status=400)
+    if not isinstance(payload, dict):
+        return web.Response(status=400)
+
+    update = Update.de_json(payload, application.bot)
+    if update is None:
+        return web.Response(status=400)
+    await application.update_queue.put(update)
+    return web.Response()
+
+
+async def _health(request: web.Request) -> web.Response:
+    application = request.app[_APPLICATION_KEY]
+    if not application.running:
+        return web.json_response({"status": "starting"}, status=503)
+    payload: dict[str, Any] = {
+        "status": "ok",
+        "pending_updates": application.update_queue.qsize(),
+    }
+    processor = application.update_processor
+    if isinstance(processor, PerChatUpdateProcessor):
+        payload["processing"] = processor.stats.as_dict()
+    rate_limiter = application.bot.rate_limiter
+    if isinstance(rate_limiter, TokenBucketRateLimiter):
+        payload["rate_limiter"] = rate_limiter.stats.as_dict()
+    return web.json_response(payload)
+
+
+def create_web_app(application: Application, settings: Settings) -> web.Application:
+    """Return the aiohttp application receiving updates and answering health checks."""
+
+    web_app = web.Application(client_max_size=1024 * 1024)
+    web_app[_APPLICATION_KEY] = application
+    web_app[_SETTINGS_KEY] = settings
+    web_app.router.add_post(settings.webhook_path, _receive_update)
+    web_app.router.add_get(HEALTH_PATH, _health)
+    return web_app
+
+
+def _webhook_url(settings: Settings) -> str:
+    return settings.webhook_url.rstrip("/") + settings.webhook_path
+
+
+async def _serve(application: Application, settings: Settings) -> None:
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+
+        if settings.webhook_register:
+            await application.bot.set_webhook(
+                url=_webhook_url(settings),
+                secret_token=settings.webhook_secret_token or None,
+                max_connections=settings.webhook_max_connections,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            logger.info("Вебхук зарегистрирован: %s", _webhook_url(settings))
+
+        await application.start()
+        runner = web.AppRunner(create_web_app(application, settings))
+        await runner.setup()
+        site = web.TCPSite(runner, settings.webhook_listen, settings.webhook_port)
+        await site.start()
+        logger.info(
+            "Webhook-сервер слушает %s:%s%s",
+            settings.webhook_listen,
+            settings.webhook_port,
+            settings.webhook_path,
+        )
+        try:
+            await stop_event.wait()
+        finally:
+            await runner.cleanup()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+    finally:
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def run_webhook(application: Application, settings: Settings) -> None:
+    """Run the bot receiving updates over HTTP until SIGINT or SIGTERM."""
+
+    asyncio.run(_serve(application, settings))
@@ -0,0 +1,165 @@
+"""In-memory stand-in for MongoDB serving a generated catalog."""
+from __future__ import annotations
+
+import asyncio
+import random
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from pymongo.errors import OperationFailure
+
+from app.database.repository import sort_categories
+
+__all__ = ["InMemoryCatalogRepository", "generate_catalog"]
+
+_WORDS = (
+    "шампунь кондиционер маска бальзам сыворотка крем лосьон тоник гель пенка масло "
+    "спрей мусс эликсир флюид увлажняющий питательный восстанавливающий укрепляющий "
+    "мягкий интенсивный ежедневный объём блеск кератин аргана алоэ ромашка"
+).split()
+_CATEGORIES = ("Уход за волосами", "Уход за лицом", "Уход за телом", "Макияж", "Парфюмерия", "Прочее")
+
+
+def generate_catalog(
+    *, brands: int, products: int, seed: int = 1, photos: bool = True
+) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]], List[Dict[str, Any]]]:
+    """Return brands, categories and products of a synthetic catalog.
+
+    With ``photos`` every product gets a Telegram ``file_id``, as after
+    ``/warmup_photos``; otherwise product cards are sent as text.
+    """
+
+    rng = random.Random(seed)
+    brand_items = [(brand_id, f"Brand {brand_id:03d}") for brand_id in range(1, brands + 1)]
+    category_items = [(index, name) for index, name in enumerate(_CATEGORIES, start=1)]
+    product_items: List[Dict[str, Any]] = []
+    for product_id in range(1, products + 1):
+        product: Dict[str, Any] = {
+            "id": product_id,
+            "name": " ".join(rng.sample(_WORDS, 3)).capitalize() + f" {product_id}",
+            "code": f"ART-{product_id}",
+            "description": " ".join(rng.choices(_WORDS, k=40)),
+            "link": f"https://example.com/products/{product_id}",
+            "brand_id": rng.randint(1, brands),
+            "category_id": rng.randint(1, len(category_items)),
+        }
+        if photos:
+            product.update(
+                image_hash=f"hash-{product_id}",
+                telegram_file_id=f"file-{product_id}",
+                telegram_file_hash=f"hash-{product_id}",
+            )
+        product_items.append(product)
+    return brand_items, category_items, product_items
+
+
+class InMemoryCatalogRepository:
+    """Catalog over Python lists with an optional per-call delay.
+
+    Implements :class:`~app.database.repository.CatalogSource` and the
+    :class:`~app.database.repository.CatalogRepository` queries used by the
+    navigation handlers. ``latency`` seconds are slept in every call to model
+    the round trip to MongoDB. Change streams are not available, so
+    :class:`CatalogCache` falls back to polling the catalog version.
+    """
+
+    def __init__(
+        self,
+        brands: Sequence[Tuple[int, str]],
+        categories: Sequence[Tuple[int, str]],
+        products: Sequence[Mapping[str, Any]],
+        *,
+        latency: float = 0.0,
+    ) -> None:
+        self._brands = sorted(brands, key=lambda item: item[1])
+        self._categories = sort_categories(list(categories))
+        self._products = {int(product["id"]): dict(product) for product in products}
+        self.latency = latency
+        self.queries = 0
+
+    async def _round_trip(self) -> None:
+        self.queries += 1
+        await asyncio.sleep(self.latency)
+
+    async def list_brands(self) -> Sequence[Tuple[int, str]]:
+        await self._round_trip()
+        return list(self._brands)
+
+    async def list_categories(self) -> Sequence[Tuple[int, str]]:
+        await self._round_trip()
+        return list(self._categories)
+
+    async def list_product_summaries(self) -> Sequence[Mapping[str, Any]]:
+        await self._round_trip()
+        return [
+            {name: product[name] for name in ("id", "name", "brand_id", "category_id")}
+            for product in self._products.values()
+        ]
+
+    async def get_catalog_version(self) -> int:
+        await self._round_trip()
+        return 0
+
+    def watch_catalog(
+        self, pipeline: Sequence[Mapping[str, Any]]
+    ) -> AsyncContextManager[Any]:
+        raise OperationFailure("change streams are not supported by the in-memory catalog")
+
+    async def get_product(self, product_id: int) -> Optional[Mapping[str, Any]]:
+        await self._round_trip()
+        product = self._products.get(product_id)
+        return dict(product) if product is not None else None
+
+    async def get_products(
+        self, product_ids: Sequence[int]
+    ) -> Dict[int, Mapping[str, Any]]:
+        await self._round_trip()
+        return {
+            product_id: dict(self._products[product_id])
+            for product_id in product_ids
+            if product_id in self._products
+        }
+
+    async def get_product_image(self, product_id: int) -> str:
+        await self._round_trip()
+        return ""
+
+    async def remember_photo_file_id(
+        self,
+        product_id: int,
+        *,
+        file_id: str,
+        image_hash: str,
+        store_image_hash: bool = False,
+    ) -> None:
+        await self._round_trip()
+        product = self._products.get(product_id)
+        if product is None:
+            return
+        product.update(telegram_file_id=file_id, telegram_file_hash=image_hash)
+        if store_image_hash:
+            product["image_hash"] = image_hash
+
+    async def iter_products_with_images(self) -> AsyncIterator[Mapping[str, Any]]:
+        await self._round_trip()
+        for product_id in sorted(self._products):
+            product = self._products[product_id]
+            if product.get("image_hash"):
+                yield dict(product)
+
+    async def iter_product_documents(
+        self, *, batch_size: int = 200
+    ) -> AsyncIterator[Mapping[str, Any]]:
+        for index, product in enumerate(list(self._products.values())):
+            if index % batch_size == 0:
+                await self._round_trip()
+            yield dict(product)
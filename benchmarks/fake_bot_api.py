@@ -0,0 +1,259 @@
+"""Local stand-in for the Telegram Bot API used by the benchmarks."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+__all__ = ["BOT_USER", "FakeBotApi"]
+
+BOT_USER = {
+    "id": 1000000001,
+    "is_bot": True,
+    "first_name": "Benchmark",
+    "username": "benchmark_bot",
+}
+
+# Поля запросов, которые PTB передаёт строкой JSON
+_JSON_FIELDS = frozenset({"reply_markup", "media", "results", "button", "allowed_updates"})
+_MESSAGE_NOT_FOUND = "Bad Request: message to edit not found"
+
+
+@dataclass
+class _Chat:
+    messages: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    last_markup: Optional[Dict[str, Any]] = None
+    last_markup_message_id: Optional[int] = None
+
+
+def _ok(result: Any) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(code: int, description: str) -> web.Response:
+    return web.json_response(
+        {"ok": False, "error_code": code, "description": description}, status=code
+    )
+
+
+class FakeBotApi:
+    """aiohttp server answering Bot API methods the bot uses.
+
+    Sent messages are kept per chat so that simulated users can press the
+    buttons of the last inline keyboard they received, and every call is
+    counted by method. Updates are handed to the bot either by long polling
+    (:meth:`push_update` + ``getUpdates``) or by the caller posting them to a
+    webhook.
+    """
+
+    def __init__(self, *, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.calls_by_chat: Counter[int] = Counter()
+        self._chats: Dict[int, _Chat] = {}
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self._updates: List[Dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._updates_available = asyncio.Condition()
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start the server and return its base URL for ``ApplicationBuilder.base_url``."""
+
+        web_app = web.Application(client_max_size=20 * 1024 * 1024)
+        web_app.router.add_post("/bot{token}/{method}", self._dispatch)
+        runner = web.AppRunner(web_app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        self._runner = runner
+        self.url = f"http://{host}:{bound_port}/bot"
+        return self.url
+
+    async def stop(self) -> None:
+        """Stop the server."""
+
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def new_update_id(self) -> int:
+        """Return the next ``update_id``."""
+
+        return next(self._update_ids)
+
+    async def push_update(self, update: Dict[str, Any]) -> None:
+        """Queue an update for the next ``getUpdates`` call."""
+
+        async with self._updates_available:
+            self._updates.append(update)
+            self._updates_available.notify_all()
+
+    def user_message(
+        self, chat_id: int, user: Dict[str, Any], text: str
+    ) -> Dict[str, Any]:
+        """Record a message written by a user and return it."""
+
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": user,
+            "text": text,
+        }
+        self._chat(chat_id).messages[message["message_id"]] = message
+        return dict(message)
+
+    def message(self, chat_id: int, message_id: int) -> Dict[str, Any]:
+        """Return the message as Telegram would attach it to a callback query."""
+
+        message = self._chat(chat_id).messages.get(message_id)
+        if message is None:
+            # Сообщение уже удалено: Telegram всё равно присылает его заголовок
+            return {
+                "message_id": message_id,
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+            }
+        return dict(message)
+
+    def last_keyboard(self, chat_id: int) -> tuple[Optional[int], List[Dict[str, Any]]]:
+        """Return the id and inline buttons of the last message with a keyboard."""
+
+        chat = self._chats.get(chat_id)
+        if chat is None or chat.last_markup is None:
+            return None, []
+        buttons = [
+            button
+            for row in chat.last_markup.get("inline_keyboard", ())
+            for button in row
+        ]
+        return chat.last_markup_message_id, buttons
+
+    def _chat(self, chat_id: int) -> _Chat:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat()
+        return chat
+
+    async def _dispatch(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params: Dict[str, Any] = await request.json()
+        else:
+            form = await request.post()
+            params = {key: value for key, value in form.items() if isinstance(value, str)}
+        for key in _JSON_FIELDS.intersection(params):
+            if isinstance(params[key], str):
+                params[key] = json.loads(params[key])
+
+        self.calls[method] += 1
+        chat_id = params.get("chat_id")
+        if chat_id is not None:
+            self.calls_by_chat[int(chat_id)] += 1
+        if method != "getUpdates" and self.latency:
+            await asyncio.sleep(self.latency)
+
+        handler = getattr(self, f"_api_{method}", None)
+        if handler is None:
+            return _ok(True)
+        return await handler(params)
+
+    async def _api_getMe(self, params: Dict[str, Any]) -> web.Response:
+        return _ok(BOT_USER)
+
+    async def _api_getUpdates(self, params: Dict[str, Any]) -> web.Response:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + timeout
+        async with self._updates_available:
+            # Подтверждённые ботом обновления больше не нужны
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return _ok([])
+                try:
+                    await asyncio.wait_for(self._updates_available.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return _ok([])
+            return _ok(self._updates[:limit])
+
+    def _store_message(
+        self, chat_id: int, message_id: int, params: Dict[str, Any], **content: Any
+    ) -> Dict[str, Any]:
+        message: Dict[str, Any] = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            **content,
+        }
+        markup = params.get("reply_markup")
+        if isinstance(markup, dict) and "inline_keyboard" in markup:
+            message["reply_markup"] = markup
+        chat = self._chat(chat_id)
+        chat.messages[message_id] = message
+        if "reply_markup" in message:
+            chat.last_markup = markup
+            chat.last_markup_message_id = message_id
+        return message
+
+    def _photo(self, photo: Any) -> List[Dict[str, Any]]:
+        file_id = photo if isinstance(photo, str) and photo else f"photo-{next(self._file_ids)}"
+        return [{"file_id": file_id, "file_unique_id": file_id, "width": 800, "height": 800}]
+
+    async def _api_sendMessage(self, params: Dict[str, Any]) -> web.Response:
+        chat_id = int(params["chat_id"])
+        return _ok(
+            self._store_message(
+                chat_id, next(self._message_ids), params, text=str(params.get("text", ""))
+            )
+        )
+
+    async def _api_sendPhoto(self, params: Dict[str, Any]) -> web.Response:
+        chat_id = int(params["chat_id"])
+        content: Dict[str, Any] = {"photo": self._photo(params.get("photo"))}
+        if params.get("caption"):
+            content["caption"] = str(params["caption"])
+        return _ok(self._store_message(chat_id, next(self._message_ids), params, **content))
+
+    def _edited(self, params: Dict[str, Any], **content: Any) -> web.Response:
+        chat_id = int(params["chat_id"])
+        message_id = int(params["message_id"])
+        existing = self._chat(chat_id).messages.get(message_id)
+        if existing is None:
+            return _error(400, _MESSAGE_NOT_FOUND)
+        return _ok(self._store_message(chat_id, message_id, params, **content))
+
+    async def _api_editMessageText(self, params: Dict[str, Any]) -> web.Response:
+        return self._edited(params, text=str(params.get("text", "")))
+
+    async def _api_editMessageMedia(self, params: Dict[str, Any]) -> web.Response:
+        media = params.get("media") or {}
+        content: Dict[str, Any] = {"photo": self._photo(media.get("media"))}
+        if media.get("caption"):
+            content["caption"] = str(media["caption"])
+        return self._edited(params, **content)
+
+    async def _api_editMessageCaption(self, params: Dict[str, Any]) -> web.Response:
+        return self._edited(params, caption=str(params.get("caption", "")))
+
+    async def _api_editMessageReplyMarkup(self, params: Dict[str, Any]) -> web.Response:
+        return self._edited(params)
+
+    async def _api_deleteMessage(self, params: Dict[str, Any]) -> web.Response:
+        chat = self._chat(int(params["chat_id"]))
+        if chat.messages.pop(int(params["message_id"]), None) is None:
+            return _error(400, "Bad Request: message to delete not found")
+        return _ok(True)
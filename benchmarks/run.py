@@ -0,0 +1,418 @@
+"""Replay scripted user journeys against the bot and report its throughput.
+
+The real :class:`telegram.ext.Application` with the handlers from
+:func:`app.handlers.register_handlers` talks to :class:`FakeBotApi` instead
+of Telegram and reads the catalog from :class:`InMemoryCatalogRepository`
+instead of MongoDB::
+
+    python -m benchmarks.run --users 200 --journeys 3
+    python -m benchmarks.run --mode webhook --api-latency-ms 40 --mongo-latency-ms 2
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+from aiohttp import web
+from telegram.ext import Application, ApplicationBuilder
+from telegram.request import HTTPXRequest
+
+from app.background import BackgroundTasks
+from app.concurrency import PerChatUpdateProcessor
+from app.config import NAVIGATION_MODE_EDIT, NAVIGATION_MODE_RESEND, Settings
+from app.database.catalog import CatalogCache
+from app.handlers import register_handlers
+from app.keyboards.cache import KeyboardCache
+from app.keyboards.callbacks import (
+    BrandSelected,
+    CategorySelected,
+    OpenCatalog,
+    ProductSelected,
+    decode_callback,
+)
+from app.persistence import InMemoryUserDataStore, NavigationPersistence
+from app.ratelimit import TokenBucketRateLimiter
+from app.routing import wrap_handler_callbacks
+from app.webhook import create_web_app
+from benchmarks.catalog import InMemoryCatalogRepository, generate_catalog
+from benchmarks.fake_bot_api import FakeBotApi
+
+logger = logging.getLogger(__name__)
+
+BOT_TOKEN = "123456:benchmark"
+WEBHOOK_PATH = "/telegram"
+BACK_BUTTON_TEXT = "НАЗАД"
+# Сколько ждать обработки одного обновления, прежде чем считать его потерянным
+_STEP_TIMEOUT = 30.0
+
+
+@dataclass(frozen=True)
+class Step:
+    """One user action: a text message or a press of a matching inline button."""
+
+    name: str
+    text: Optional[str] = None
+    action: Optional[type] = None
+    button_text: Optional[str] = None
+
+    def choose(self, buttons: Sequence[Dict[str, Any]], rng: random.Random) -> Optional[str]:
+        """Return ``callback_data`` of a random button this step may press."""
+
+        candidates = [
+            str(button["callback_data"])
+            for button in buttons
+            if "callback_data" in button
+            and (
+                self.action is None
+                or isinstance(decode_callback(str(button["callback_data"])), self.action)
+            )
+            and (self.button_text is None or self.button_text in str(button.get("text", "")))
+        ]
+        return rng.choice(candidates) if candidates else None
+
+
+JOURNEY = (
+    Step("start", text="/start"),
+    Step("catalog", action=OpenCatalog),
+    Step("brand", action=BrandSelected),
+    Step("category", action=CategorySelected),
+    Step("product", action=ProductSelected),
+    Step("back to products", button_text=BACK_BUTTON_TEXT),
+    Step("back to categories", button_text=BACK_BUTTON_TEXT),
+    Step("back to brands", button_text=BACK_BUTTON_TEXT),
+)
+
+
+@dataclass
+class Results:
+    """Measurements collected during a run."""
+
+    handler_seconds: List[float] = field(default_factory=list)
+    response_seconds: List[float] = field(default_factory=list)
+    interactions: int = 0
+    skipped: int = 0
+    timeouts: int = 0
+    handler_errors: int = 0
+    elapsed: float = 0.0
+
+
+class HandlerTimer:
+    """Wraps handler callbacks to time them and to signal processed updates."""
+
+    def __init__(self, results: Results) -> None:
+        self._results = results
+        self._waiters: Dict[int, asyncio.Future[None]] = {}
+
+    def expect(self, update_id: int) -> asyncio.Future[None]:
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters[update_id] = future
+        return future
+
+    def cancel(self, update_id: int) -> None:
+        self._waiters.pop(update_id, None)
+
+    def wrap(
+        self, name: str, callback: Callable[..., Awaitable[Any]]
+    ) -> Callable[..., Awaitable[Any]]:
+        async def timed(update: Any, context: Any, *args: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await callback(update, context, *args)
+            except Exception:
+                self._results.handler_errors += 1
+                raise
+            finally:
+                self._results.handler_seconds.append(time.perf_counter() - started)
+                waiter = self._waiters.pop(getattr(update, "update_id", -1), None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+
+        return timed
+
+    def install(self, application: Application) -> None:
+        wrap_handler_callbacks(application, self.wrap)
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "language_code": "ru"}
+
+
+class SimulatedUser:
+    """Walks through :data:`JOURNEY` in a private chat, waiting for every answer."""
+
+    def __init__(
+        self,
+        user_id: int,
+        api: FakeBotApi,
+        timer: HandlerTimer,
+        deliver: Callable[[Dict[str, Any]], Awaitable[None]],
+        results: Results,
+        rng: random.Random,
+    ) -> None:
+        self.user_id = user_id
+        self._api = api
+        self._timer = timer
+        self._deliver = deliver
+        self._results = results
+        self._rng = rng
+
+    def _message_update(self, update_id: int, text: str) -> Dict[str, Any]:
+        message = self._api.user_message(self.user_id, _user(self.user_id), text)
+        if text.startswith("/"):
+            command_length = len(text.split()[0])
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": command_length}]
+        return {"update_id": update_id, "message": message}
+
+    def _callback_update(
+        self, update_id: int, message_id: int, data: str
+    ) -> Dict[str, Any]:
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": f"{self.user_id}-{update_id}",
+                "from": _user(self.user_id),
+                "chat_instance": str(self.user_id),
+                "data": data,
+                "message": self._api.message(self.user_id, message_id),
+            },
+        }
+
+    async def _perform(self, step: Step) -> None:
+        update_id = self._api.new_update_id()
+        if step.text is not None:
+            update = self._message_update(update_id, step.text)
+        else:
+            message_id, buttons = self._api.last_keyboard(self.user_id)
+            data = step.choose(buttons, self._rng)
+            if message_id is None or data is None:
+                self._results.skipped += 1
+                return
+            update = self._callback_update(update_id, message_id, data)
+
+        processed = self._timer.expect(update_id)
+        started = time.perf_counter()
+        await self._deliver(update)
+        try:
+            await asyncio.wait_for(processed, _STEP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._timer.cancel(update_id)
+            self._results.timeouts += 1
+            return
+        self._results.response_seconds.append(time.perf_counter() - started)
+        self._results.interactions += 1
+
+    async def run(self, journeys: int) -> None:
+        for _ in range(journeys):
+            for step in JOURNEY:
+                await self._perform(step)
+
+
+def _percentile(values: Sequence[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _latency_summary(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "mean_ms": round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(_percentile(values, 50) * 1000, 3),
+        "p95_ms": round(_percentile(values, 95) * 1000, 3),
+        "p99_ms": round(_percentile(values, 99) * 1000, 3),
+    }
+
+
+def _build_application(args: argparse.Namespace, api_url: str) -> Application:
+    persistence = NavigationPersistence(InMemoryUserDataStore(ttl=3600))
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(api_url)
+        # Как в bot.py: с пулом по умолчанию из одного соединения запросы выстраиваются в очередь
+        .request(HTTPXRequest(connection_pool_size=256))
+        .persistence(persistence)
+        .concurrent_updates(PerChatUpdateProcessor(args.concurrency))
+    )
+    if args.rate_limit:
+        builder = builder.rate_limiter(TokenBucketRateLimiter())
+    if args.mode == "webhook":
+        builder = builder.updater(None)
+    application = builder.build()
+    persistence.attach(application)
+    return application
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    api = FakeBotApi(latency=args.api_latency_ms / 1000)
+    api_url = await api.start()
+
+    brands, categories, products = generate_catalog(
+        brands=args.brands, products=args.products, seed=args.seed, photos=not args.no_photos
+    )
+    repository = InMemoryCatalogRepository(
+        brands, categories, products, latency=args.mongo_latency_ms / 1000
+    )
+    settings = Settings(
+        bot_token=BOT_TOKEN,
+        mongo_uri="",
+        mongo_db_name="",
+        initial_admin_id=None,
+        navigation_mode=args.navigation_mode,
+        webhook_path=WEBHOOK_PATH,
+    )
+    application = _build_application(args, api_url)
+    cache = CatalogCache(repository, poll_interval=3600, ttl=3600)
+    background = BackgroundTasks(settings.background_tasks_limit)
+    application.bot_data.update(
+        background=background,
+        catalog=repository,
+        catalog_cache=cache,
+        images=None,
+        keyboards=KeyboardCache(settings.keyboard_cache_size),
+        settings=settings,
+    )
+    register_handlers(application)
+    results = Results()
+    timer = HandlerTimer(results)
+    timer.install(application)
+
+    await application.initialize()
+    await cache.refresh()
+    while not cache.search_ready:
+        await asyncio.sleep(0.01)
+
+    runner: Optional[web.AppRunner] = None
+    session: Optional[aiohttp.ClientSession] = None
+    deliver: Callable[[Dict[str, Any]], Awaitable[None]]
+    if args.mode == "webhook":
+        await application.start()
+        runner = web.AppRunner(create_web_app(application, settings), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        webhook_url = f"http://127.0.0.1:{port}{WEBHOOK_PATH}"
+        session = aiohttp.ClientSession()
+
+        async def deliver(update: Dict[str, Any]) -> None:
+            async with session.post(webhook_url, json=update) as response:
+                response.raise_for_status()
+
+    else:
+        assert application.updater is not None
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+        await application.start()
+        deliver = api.push_update
+
+    users = [
+        SimulatedUser(
+            100000 + index, api, timer, deliver, results, random.Random(args.seed + index)
+        )
+        for index in range(args.users)
+    ]
+    api.calls.clear()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(user.run(args.journeys) for user in users))
+    finally:
+        results.elapsed = time.perf_counter() - started
+        if session is not None:
+            await session.close()
+        if runner is not None:
+            await runner.cleanup()
+        if application.updater is not None and application.updater.running:
+            await application.updater.stop()
+        await application.stop()
+        await background.drain()
+        await application.shutdown()
+        await cache.stop()
+        await api.stop()
+
+    bot_calls = {method: count for method, count in api.calls.items() if method != "getUpdates"}
+    interactions = results.interactions or 1
+    return {
+        "mode": args.mode,
+        "users": args.users,
+        "journeys_per_user": args.journeys,
+        "interactions": results.interactions,
+        "skipped_steps": results.skipped,
+        "timeouts": results.timeouts,
+        "handler_errors": results.handler_errors,
+        "elapsed_s": round(results.elapsed, 3),
+        "updates_per_s": round(results.interactions / results.elapsed, 1) if results.elapsed else 0.0,
+        "handler_latency": _latency_summary(results.handler_seconds),
+        "response_latency": _latency_summary(results.response_seconds),
+        "api_calls_per_interaction": round(sum(bot_calls.values()) / interactions, 2),
+        "api_calls": dict(sorted(bot_calls.items())),
+        "mongo_queries_per_interaction": round(repository.queries / interactions, 3),
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"Режим {report['mode']}: пользователей {report['users']}, "
+        f"сценариев на пользователя {report['journeys_per_user']}"
+    )
+    print(
+        f"Обработано обновлений: {report['interactions']} за {report['elapsed_s']} с "
+        f"({report['updates_per_s']} в секунду); пропущено шагов {report['skipped_steps']}, "
+        f"таймаутов {report['timeouts']}, ошибок обработчиков {report['handler_errors']}"
+    )
+    for title, key in (("Обработчик", "handler_latency"), ("Ответ", "response_latency")):
+        latency = report[key]
+        print(
+            f"{title}: mean {latency['mean_ms']} мс, p50 {latency['p50_ms']} мс, "
+            f"p95 {latency['p95_ms']} мс, p99 {latency['p99_ms']} мс"
+        )
+    print(f"Вызовов Bot API на действие: {report['api_calls_per_interaction']}")
+    for method, count in report["api_calls"].items():
+        print(f"  {method}: {count}")
+    print(f"Запросов к каталогу на действие: {report['mongo_queries_per_interaction']}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Run the benchmark and print the report."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--users", type=int, default=100, help="число одновременных пользователей")
+    parser.add_argument("--journeys", type=int, default=3, help="сценариев на пользователя")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--concurrency", type=int, default=64, help="MAX_CONCURRENT_UPDATES")
+    parser.add_argument(
+        "--navigation-mode",
+        choices=(NAVIGATION_MODE_EDIT, NAVIGATION_MODE_RESEND),
+        default=NAVIGATION_MODE_EDIT,
+    )
+    parser.add_argument("--brands", type=int, default=40)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--no-photos", action="store_true", help="карточки без file_id")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0)
+    parser.add_argument("--mongo-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", action="store_true", help="включить ограничитель частоты")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="вывести отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    report = asyncio.run(_run(args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    main()
@@ -1,22 +1,35 @@
 """Entry point for the festive Telegram bot."""
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 
-from telegram.ext import ApplicationBuilder
-
-from app.config import get_settings
-from app.database import create_mongo_collections
-from app.database.management import (
-    DEFAULT_BRANDS,
-    DEFAULT_CATEGORIES,
-    DEFAULT_PRODUCTS_FILE,
-    ensure_admins_collection,
-    ensure_brands_collection,
-    ensure_categories_collection,
-    load_products_from_file,
-)
+# Отсчёт времени импорта: тяжёлые модули (telegram, pymongo, motor) загружаются ниже
+_IMPORTS_STARTED = time.perf_counter()
+
+from pymongo import monitoring
+from telegram.ext import Application, ApplicationBuilder
+
+from app.background import BackgroundTasks
+from app.bootstrap import StartupTimer, run_bootstrap
+from app.concurrency import PerChatUpdateProcessor
+from app.config import BOOTSTRAP_MODE_DEFERRED, RUN_MODE_WEBHOOK, get_settings
+from app.database import create_async_mongo_collections, create_mongo_collections
+from app.database.catalog import CatalogCache
+from app.database.images import create_image_store
+from app.database.repository import CatalogRepository
 from app.handlers import register_handlers
+from app.keyboards.cache import KeyboardCache
+from app.metrics import (
+    InstrumentedRequest,
+    MongoCommandMetrics,
+    create_metrics_server,
+    instrument_handlers,
+)
+from app.persistence import NavigationPersistence, create_persistence
+from app.ratelimit import create_rate_limiter
+from app.tracing import MongoTraceListener, create_tracer, trace_handlers
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,26 +38,149 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def _bootstrap_in_background(application: Application) -> None:
+    """Prepare the database while the bot already accepts updates."""
+
+    bot_data = application.bot_data
+    timer: StartupTimer = bot_data["startup_timer"]
+    try:
+        with timer.phase("подготовка базы"):
+            result = await asyncio.to_thread(
+                run_bootstrap,
+                bot_data["mongo"],
+                bot_data["settings"],
+                bot_data["images"],
+                timer=timer,
+            )
+        if result.catalog_changed:
+            # Не ждём опроса версии: новые бренды и продукты нужны сразу
+            await bot_data["catalog_cache"].refresh()
+    except Exception:
+        logger.exception("Не удалось подготовить базу данных")
+        return
+    logger.info("Запуск завершён за %.0f мс после загрузки модулей", timer.elapsed * 1000)
+
+
+async def _start_services(application: Application) -> None:
+    """Load the catalog snapshot and start the background services."""
+
+    bot_data = application.bot_data
+    timer: StartupTimer = bot_data["startup_timer"]
+    cache: CatalogCache = bot_data["catalog_cache"]
+    if bot_data["settings"].bootstrap_mode == BOOTSTRAP_MODE_DEFERRED:
+        # Снимок загрузится при первом обращении, а после подготовки обновится
+        bot_data["bootstrap_task"] = asyncio.create_task(
+            _bootstrap_in_background(application), name="Bootstrap"
+        )
+    else:
+        with timer.phase("загрузка каталога"):
+            await cache.refresh()
+    cache.start()
+    metrics_server = application.bot_data["metrics_server"]
+    if metrics_server is not None:
+        await metrics_server.start()
+    tracer = application.bot_data["tracer"]
+    if tracer is not None:
+        tracer.start()
+    logger.info(
+        "Приём обновлений начинается через %.0f мс после загрузки модулей",
+        timer.elapsed * 1000,
+    )
+
+
+async def _drain_background(application: Application) -> None:
+    """Let background Bot API calls finish while the bot can still send them."""
+
+    await application.bot_data["background"].drain()
+
+
+async def _stop_services(application: Application) -> None:
+    """Stop the background services and release MongoDB connection pools."""
+
+    bootstrap_task = application.bot_data.get("bootstrap_task")
+    if bootstrap_task is not None and not bootstrap_task.done():
+        # Поток подготовки нельзя прервать, а клиенты MongoDB ему ещё нужны
+        logger.info("Ожидание завершения подготовки базы данных")
+        await bootstrap_task
+    metrics_server = application.bot_data["metrics_server"]
+    if metrics_server is not None:
+        await metrics_server.stop()
+    tracer = application.bot_data["tracer"]
+    if tracer is not None:
+        await tracer.stop()
+    await application.bot_data["catalog_cache"].stop()
+    if isinstance(application.persistence, NavigationPersistence):
+        await application.persistence.store.close()
+    application.bot_data["catalog"].collections.client.close()
+    application.bot_data["mongo"].client.close()
+
+
 def main() -> None:
     """Run the Telegram bot."""
 
+    timer = StartupTimer()
+    timer.record("импорт модулей", time.perf_counter() - _IMPORTS_STARTED)
     settings = get_settings()
-    application = ApplicationBuilder().token(settings.bot_token).build()
-
+    # Слушатель регистрируется до создания клиентов, иначе они его не увидят
+    monitoring.register(MongoCommandMetrics())
+    tracer = create_tracer(settings)
+    if tracer is not None:
+        monitoring.register(MongoTraceListener())
     mongo_collections = create_mongo_collections(settings)
-    ensure_brands_collection(mongo_collections.brands, DEFAULT_BRANDS)
-    ensure_categories_collection(mongo_collections.categories, DEFAULT_CATEGORIES)
-    load_products_from_file(
-        mongo_collections.products,
-        mongo_collections.brands,
-        mongo_collections.categories,
-        DEFAULT_PRODUCTS_FILE,
+    async_collections = create_async_mongo_collections(settings)
+    persistence = create_persistence(settings, async_collections)
+    builder = (
+        ApplicationBuilder()
+        .token(settings.bot_token)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .persistence(persistence)
+        .concurrent_updates(PerChatUpdateProcessor(settings.max_concurrent_updates))
+        .rate_limiter(create_rate_limiter(settings))
+        .post_init(_start_services)
+        .post_stop(_drain_background)
+        .post_shutdown(_stop_services)
     )
-    ensure_admins_collection(mongo_collections.admins, settings.initial_admin_id)
+    if settings.run_mode == RUN_MODE_WEBHOOK:
+        # Обновления приходят через собственный HTTP-сервер, Updater не нужен
+        builder = builder.updater(None)
+    application = builder.build()
+    persistence.attach(application)
+
+    image_store = create_image_store(
+        settings, mongo_collections.database, async_collections.database
+    )
+    if settings.bootstrap_mode != BOOTSTRAP_MODE_DEFERRED:
+        with timer.phase("подготовка базы"):
+            run_bootstrap(mongo_collections, settings, image_store, timer=timer)
+    application.bot_data["startup_timer"] = timer
     application.bot_data["mongo"] = mongo_collections
+    catalog = CatalogRepository(async_collections)
+    application.bot_data["catalog"] = catalog
+    application.bot_data["images"] = image_store
+    application.bot_data["catalog_cache"] = CatalogCache(
+        catalog,
+        poll_interval=settings.catalog_poll_interval,
+        ttl=settings.catalog_ttl,
+    )
+    application.bot_data["keyboards"] = KeyboardCache(settings.keyboard_cache_size)
+    application.bot_data["background"] = BackgroundTasks(settings.background_tasks_limit)
     application.bot_data["settings"] = settings
 
+    application.bot_data["metrics_server"] = create_metrics_server(application, settings)
+    application.bot_data["tracer"] = tracer
+
     register_handlers(application)
+    instrument_handlers(application)
+    if tracer is not None:
+        trace_handlers(application, tracer)
+
+    if settings.run_mode == RUN_MODE_WEBHOOK:
+        # aiohttp.web нужен только в режиме вебхука
+        from app.webhook import run_webhook
+
+        logger.info("Bot started in webhook mode. Waiting for updates…")
+        run_webhook(application, settings)
+        return
 
     logger.info("Bot started. Waiting for updates…")
     application.run_polling()
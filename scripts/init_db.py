@@ -1,10 +1,16 @@
 """Utility script to initialise MongoDB collections for the bot."""
 from __future__ import annotations
 
+import argparse
 import logging
+from pathlib import Path
+from typing import Optional, Sequence
 
 from app.config import get_settings
 from app.database import create_mongo_collections
+from app.database.images import create_image_store
+from app.database.imaging import create_image_pipeline
+from app.database.indexes import ensure_indexes
 from app.database.management import (
     DEFAULT_BRANDS,
     DEFAULT_CATEGORIES,
@@ -16,9 +22,33 @@ from app.database.management import (
 )
 
 
-def main() -> None:
+def _parse_args(argv: Optional[Sequence[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Подготовка MongoDB и импорт каталога")
+    parser.add_argument(
+        "--products",
+        type=Path,
+        default=DEFAULT_PRODUCTS_FILE,
+        help="файл с продуктами: JSON-массив или JSON Lines",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="сколько продуктов записывать одним bulk_write",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="импортировать файл, даже если он не менялся с прошлого импорта",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
     """Initialise MongoDB collections required by the bot."""
 
+    args = _parse_args(argv)
+
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
@@ -27,14 +57,20 @@ def main() -> None:
     settings = get_settings()
     collections = create_mongo_collections(settings)
 
+    ensure_indexes(collections.database)
     ensure_brands_collection(collections.brands, DEFAULT_BRANDS)
     ensure_categories_collection(collections.categories, DEFAULT_CATEGORIES)
-    load_products_from_file(
-        collections.products,
-        collections.brands,
-        collections.categories,
-        DEFAULT_PRODUCTS_FILE,
-    )
+    with create_image_pipeline(settings) as image_pipeline:
+        load_products_from_file(
+            collections.products,
+            collections.brands,
+            collections.categories,
+            args.products,
+            image_store=create_image_store(settings, collections.database),
+            image_pipeline=image_pipeline,
+            batch_size=max(args.batch_size, 1),
+            force=args.force,
+        )
     ensure_admins_collection(collections.admins, settings.initial_admin_id)
 
     logging.getLogger(__name__).info("Инициализация базы данных завершена")
@@ -0,0 +1,32 @@
+"""Move inline ``image_base64`` product images into the configured image store."""
+from __future__ import annotations
+
+import logging
+
+from app.config import get_settings
+from app.database import create_mongo_collections
+from app.database.images import create_image_store
+from app.database.management import migrate_inline_images
+
+
+def main() -> None:
+    """Migrate product images stored inside product documents."""
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+
+    settings = get_settings()
+    collections = create_mongo_collections(settings)
+
+    migrated = migrate_inline_images(
+        collections.products, create_image_store(settings, collections.database)
+    )
+    logging.getLogger(__name__).info("Миграция изображений завершена: %s", migrated)
+
+    collections.client.close()
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    main()
@@ -0,0 +1,30 @@
+"""Reseed id counters from the documents already stored in MongoDB."""
+from __future__ import annotations
+
+import logging
+
+from app.config import get_settings
+from app.database import create_mongo_collections
+from app.database.counters import reseed_counters
+
+
+def main() -> None:
+    """Raise every id counter to the largest ``id`` of its collection."""
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+
+    settings = get_settings()
+    collections = create_mongo_collections(settings)
+
+    logger = logging.getLogger(__name__)
+    for name, value in reseed_counters(collections.database).items():
+        logger.info("Счётчик %s: %s", name, value)
+
+    collections.client.close()
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry point
+    main()